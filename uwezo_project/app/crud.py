@@ -1,9 +1,17 @@
+from sqlalchemy import case, exists, func, select
 from sqlalchemy.orm import Session
 from . import models, schemas
+from .pagination import keyset
 from datetime import datetime
 
+# Sync functions take a Session; the *_async variants at the bottom take an
+# AsyncSession (database.get_async_db) and build the same rows.
+
+def _new_user(user: schemas.UserCreate):
+    return models.User(username=user.username, role=user.role)
+
 def create_user(db: Session, user: schemas.UserCreate):
-    new_user = models.User(username=user.username, role=user.role)
+    new_user = _new_user(user)
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
@@ -12,13 +20,16 @@ def create_user(db: Session, user: schemas.UserCreate):
 def get_users(db: Session):
     return db.query(models.User).all()
 
-def create_audit(db: Session, audit: schemas.AuditTrailCreate):
-    new_audit = models.AuditTrail(
+def _new_audit(audit: schemas.AuditTrailCreate):
+    return models.AuditTrail(
         action=audit.action,
         details=audit.details,
         user_id=audit.user_id,
         timestamp=audit.timestamp or datetime.utcnow(),
     )
+
+def create_audit(db: Session, audit: schemas.AuditTrailCreate):
+    new_audit = _new_audit(audit)
     db.add(new_audit)
     db.commit()
     db.refresh(new_audit)
@@ -27,29 +38,39 @@ def create_audit(db: Session, audit: schemas.AuditTrailCreate):
 def get_audit_logs(db: Session):
     return db.query(models.AuditTrail).all()
 
-def create_upload(db: Session, filename: str, user_id: int, file_path: str, processing_purpose: str = None):
-    new_upload = models.Upload(
+def _new_upload(filename: str, user_id: int, file_path: str, processing_purpose: str = None, content_hash: str = None):
+    return models.Upload(
         filename=filename,
         uploaded_at=datetime.utcnow(),
         user_id=user_id,
         file_path=file_path,
         expires_at=None,
         processing_purpose=processing_purpose,
-        processed=False
+        processed=False,
+        content_hash=content_hash
     )
+
+def create_upload(db: Session, filename: str, user_id: int, file_path: str, processing_purpose: str = None, content_hash: str = None):
+    new_upload = _new_upload(filename, user_id, file_path, processing_purpose, content_hash)
     db.add(new_upload)
     db.commit()
     db.refresh(new_upload)
     return new_upload
 
-def log_review(db: Session, document_id: int, user_id: int, comment: str, retrain_flag: bool = False):
-    review = models.Review(
+def get_upload_by_hash(db: Session, content_hash: str):
+    return db.query(models.Upload).filter(models.Upload.content_hash == content_hash).order_by(models.Upload.id).first()
+
+def _new_review(document_id: int, user_id: int, comment: str, retrain_flag: bool = False):
+    return models.Review(
         document_id=document_id,
         user_id=user_id,
         comment=comment,
         retrain_flag=retrain_flag,
         reviewed_at=datetime.utcnow()
     )
+
+def log_review(db: Session, document_id: int, user_id: int, comment: str, retrain_flag: bool = False):
+    review = _new_review(document_id, user_id, comment, retrain_flag)
     db.add(review)
     db.commit()
     db.refresh(review)
@@ -57,3 +78,171 @@ def log_review(db: Session, document_id: int, user_id: int, comment: str, retrai
 
 def get_reviews_for_document(db: Session, document_id: int):
     return db.query(models.Review).filter(models.Review.document_id == document_id).all()
+
+def queue_retrain_task(db: Session, document_id: int):
+    """
+    The review's retrain_flag already records the request; the scheduler
+    folds pending requests into one run. Returns the scheduler's queue state.
+    """
+    from .services.retrain_scheduler import tick
+    return tick(db)
+
+def _new_job(upload_id: int, file_path: str, kind: str = "analyze"):
+    return models.Job(
+        upload_id=upload_id,
+        kind=kind,
+        status="queued",
+        file_path=file_path,
+        attempts=0,
+        created_at=datetime.utcnow()
+    )
+
+def create_job(db: Session, upload_id: int, file_path: str, kind: str = "analyze"):
+    job = _new_job(upload_id, file_path, kind)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+def get_job(db: Session, job_id: int):
+    return db.query(models.Job).filter(models.Job.id == job_id).first()
+
+
+# Async variants (AsyncSession)
+
+async def _add_async(db, obj):
+    db.add(obj)
+    await db.commit()
+    await db.refresh(obj)
+    return obj
+
+async def create_user_async(db, user: schemas.UserCreate):
+    return await _add_async(db, _new_user(user))
+
+async def list_users_async(db, page, role: str = None):
+    stmt = select(models.User)
+    if role:
+        stmt = stmt.where(models.User.role == role)
+    return (await db.scalars(keyset(stmt, models.User.id, page))).all()
+
+async def create_audit_async(db, audit: schemas.AuditTrailCreate):
+    return await _add_async(db, _new_audit(audit))
+
+def audit_page_query(page, user_id: int = None, action: str = None,
+                     since: datetime = None, until: datetime = None):
+    A = models.AuditTrail
+    stmt = select(A)
+    if user_id is not None:
+        stmt = stmt.where(A.user_id == user_id)
+    if action:
+        stmt = stmt.where(A.action == action)
+    if since is not None:
+        stmt = stmt.where(A.timestamp >= since)
+    if until is not None:
+        stmt = stmt.where(A.timestamp < until)
+    return keyset(stmt, A.id, page)
+
+async def list_audit_async(db, page, user_id: int = None, action: str = None,
+                           since: datetime = None, until: datetime = None):
+    return (await db.scalars(audit_page_query(page, user_id, action, since, until))).all()
+
+async def create_upload_async(db, filename: str, user_id: int, file_path: str, processing_purpose: str = None, content_hash: str = None):
+    return await _add_async(db, _new_upload(filename, user_id, file_path, processing_purpose, content_hash))
+
+async def get_upload_by_hash_async(db, content_hash: str):
+    stmt = select(models.Upload).where(models.Upload.content_hash == content_hash).order_by(models.Upload.id).limit(1)
+    return await db.scalar(stmt)
+
+async def log_review_async(db, document_id: int, user_id: int, comment: str, retrain_flag: bool = False):
+    return await _add_async(db, _new_review(document_id, user_id, comment, retrain_flag))
+
+async def get_reviews_for_document_async(db, document_id: int):
+    return (await db.scalars(select(models.Review).where(models.Review.document_id == document_id))).all()
+
+async def create_job_async(db, upload_id: int, file_path: str, kind: str = "analyze"):
+    return await _add_async(db, _new_job(upload_id, file_path, kind))
+
+async def get_job_async(db, job_id: int):
+    return await db.get(models.Job, job_id)
+
+
+# Upload listing and dashboard statistics (SQL-side)
+
+def _upload_filters(stmt, user_id: int = None, since: datetime = None, until: datetime = None,
+                    processed: bool = None):
+    U = models.Upload
+    if user_id is not None:
+        stmt = stmt.where(U.user_id == user_id)
+    if since is not None:
+        stmt = stmt.where(U.uploaded_at >= since)
+    if until is not None:
+        stmt = stmt.where(U.uploaded_at < until)
+    if processed is not None:
+        stmt = stmt.where(U.processed.is_(processed))
+    return stmt
+
+def _upload_flagged():
+    C = models.Case
+    return exists().where(C.upload_id == models.Upload.id, C.flagged.is_(True))
+
+def uploads_page_query(page, user_id: int = None, since: datetime = None, until: datetime = None,
+                       processed: bool = None, flagged: bool = None):
+    """One page of uploads with flagged / confidence_score derived from their cases."""
+    U, C = models.Upload, models.Case
+    is_flagged = _upload_flagged()
+    confidence = (
+        select(func.avg(C.confidence_score)).where(C.upload_id == U.id).scalar_subquery()
+    )
+    stmt = select(
+        U.id, U.filename, U.user_id, U.uploaded_at, U.processed, U.processing_purpose,
+        is_flagged.label("flagged"), confidence.label("confidence_score"),
+    )
+    stmt = _upload_filters(stmt, user_id, since, until, processed)
+    if flagged is not None:
+        stmt = stmt.where(is_flagged if flagged else ~is_flagged)
+    return keyset(stmt, U.id, page)
+
+async def list_uploads_async(db, page, user_id: int = None, since: datetime = None, until: datetime = None,
+                             processed: bool = None, flagged: bool = None):
+    return (await db.execute(uploads_page_query(page, user_id, since, until, processed, flagged))).all()
+
+def upload_stats_query(user_id: int = None, since: datetime = None, until: datetime = None):
+    """
+    Dashboard counters in one aggregate query over uploads LEFT JOIN
+    per-upload case summaries; nothing is loaded row by row.
+    """
+    U, C = models.Upload, models.Case
+    # the filters are applied inside the case summary too, so a filtered
+    # request only aggregates the cases of its own uploads
+    per_upload = _upload_filters(
+        select(
+            C.upload_id,
+            func.max(case((C.flagged.is_(True), 1), else_=0)).label("flagged"),
+            func.avg(C.confidence_score).label("confidence"),
+        ).join(U, U.id == C.upload_id),
+        user_id, since, until,
+    ).group_by(C.upload_id).subquery()
+    is_flagged = func.coalesce(per_upload.c.flagged, 0) == 1
+    is_retrain = func.coalesce(U.processing_purpose, "") == "retrain"
+    stmt = (
+        select(
+            func.count(U.id).label("total"),
+            func.sum(case((U.processed.is_(True), 1), else_=0)).label("processed"),
+            func.sum(case((is_flagged, 1), else_=0)).label("flagged"),
+            func.sum(case((is_retrain, 1), else_=0)).label("retrain"),
+            func.sum(case((is_flagged | is_retrain, 1), else_=0)).label("needs_review"),
+            func.sum(case(((U.processed.is_(True)) & ~is_flagged & ~is_retrain, 1), else_=0)).label("approved"),
+            func.count(per_upload.c.upload_id).label("with_cases"),
+            func.avg(per_upload.c.confidence).label("avg_confidence"),
+        )
+        .select_from(U)
+        .outerjoin(per_upload, per_upload.c.upload_id == U.id)
+    )
+    return _upload_filters(stmt, user_id, since, until)
+
+async def upload_stats_async(db, user_id: int = None, since: datetime = None, until: datetime = None) -> dict:
+    row = (await db.execute(upload_stats_query(user_id, since, until))).one()
+    stats = {k: int(row._mapping[k] or 0) for k in ("total", "processed", "flagged", "retrain", "needs_review", "approved", "with_cases")}
+    stats["flag_rate"] = round(stats["flagged"] / stats["with_cases"], 4) if stats["with_cases"] else 0.0
+    stats["avg_confidence"] = round(float(row.avg_confidence), 4) if row.avg_confidence is not None else None
+    return stats
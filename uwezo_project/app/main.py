@@ -1,17 +1,39 @@
-from fastapi import FastAPI, Depends, Request
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Optional
+from fastapi import FastAPI, Depends, Request, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 
 from . import models, crud, schemas
-from .database import engine, get_db
-from .routes import auth, analyze, review, pdf_report, upload, retrain, review_flag
+from .database import dispose_engines, get_async_db
+from .pagination import PageParams, split_page
+from .routes import auth, analyze, review, pdf_report, uploads, retrain, review_flag, jobs, health, stats
+from .services import audit, executor
+from .services.storage import RequestSizeLimitMiddleware
+from .services.warmup import WARMUP_ON_STARTUP, warm_up_in_background
+
+
+# Schema is managed by Alembic (`alembic upgrade head`), not at import time.
+# Heavy ML dependencies load on first use or via POST /health/warmup.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP_ON_STARTUP:
+        warm_up_in_background()
+    yield
+    audit.shutdown()  # write out buffered audit rows before the engines go
+    executor.shutdown(wait=False)
+    await dispose_engines()
+
 
 # Enable CORS for local frontend
-app = FastAPI(title="Uwezo API", version="1.0")
+app = FastAPI(title="Uwezo API", version="1.0", lifespan=lifespan)
+# Reject oversized request bodies before they are parsed (UWEZO_MAX_REQUEST_MB)
+app.add_middleware(RequestSizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Allow all for development
@@ -33,35 +55,50 @@ static_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../static"
 if os.path.isdir(static_dir):
     app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
-# Create tables
-models.Base.metadata.create_all(bind=engine)
-
 @app.get("/")
 def root():
     return {"message": "Uwezo API is running!"}
 
-# Core endpoints
+# Core endpoints (async sessions: no request thread is held while waiting on the database)
 @app.post("/users/", response_model=schemas.UserResponse)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    return crud.create_user(db, user)
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    return await crud.create_user_async(db, user)
 
 @app.get("/users/", response_model=list[schemas.UserResponse])
-def get_users(db: Session = Depends(get_db)):
-    return crud.get_users(db)
+async def get_users(
+    response: Response,
+    page: PageParams = Depends(),
+    role: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return split_page(await crud.list_users_async(db, page, role), page, response)
 
 @app.post("/audit/", response_model=schemas.AuditTrailResponse)
-def create_audit(audit: schemas.AuditTrailCreate, db: Session = Depends(get_db)):
-    return crud.create_audit(db, audit)
+async def create_audit(audit: schemas.AuditTrailCreate, db: AsyncSession = Depends(get_async_db)):
+    return await crud.create_audit_async(db, audit)
 
 @app.get("/audit/", response_model=list[schemas.AuditTrailResponse])
-def get_audit_logs(db: Session = Depends(get_db)):
-    return crud.get_audit_logs(db)
+async def get_audit_logs(
+    response: Response,
+    page: PageParams = Depends(),
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Newest first; follow X-Next-Cursor for older entries."""
+    rows = await crud.list_audit_async(db, page, user_id, action, since, until)
+    return split_page(rows, page, response)
 
 # Routers
 app.include_router(auth.router)
-app.include_router(upload.router)
+app.include_router(uploads.router)
 app.include_router(analyze.router)
 app.include_router(review.router)
 app.include_router(pdf_report.router)
 app.include_router(retrain.router)
-app.include_router(review_flag.router)
\ No newline at end of file
+app.include_router(review_flag.router)
+app.include_router(jobs.router)
+app.include_router(health.router)
+app.include_router(stats.router)
\ No newline at end of file
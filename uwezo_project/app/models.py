@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, Float, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 
@@ -23,10 +23,18 @@ class Upload(Base):
     expires_at = Column(DateTime, nullable=True)
     processing_purpose = Column(Text, nullable=True)
     processed = Column(Boolean, default=False)
+    content_hash = Column(String(64), nullable=True, index=True)
     user = relationship("User", back_populates="uploads")
     fields = relationship("ExtractedField", back_populates="upload")
     cases = relationship("Case", back_populates="upload")
     reviews = relationship("Review", back_populates="document")
+    jobs = relationship("Job", back_populates="upload")
+    # (col, id) composites serve "filter on col, keyset-paginate on id"
+    __table_args__ = (
+        Index("ix_uploads_user_id_id", "user_id", "id"),
+        Index("ix_uploads_processed_id", "processed", "id"),
+        Index("ix_uploads_uploaded_at", "uploaded_at"),
+    )
 
 class Review(Base):
     __tablename__ = "reviews"
@@ -38,6 +46,7 @@ class Review(Base):
     reviewed_at = Column(DateTime)
     user = relationship("User", back_populates="reviews")
     document = relationship("Upload", back_populates="reviews")
+    __table_args__ = (Index("ix_reviews_document_id", "document_id"),)
 
 class ExtractedField(Base):
     __tablename__ = "extractedfields"
@@ -47,6 +56,7 @@ class ExtractedField(Base):
     field_value = Column(Text)
     masked = Column(Boolean, default=False)
     upload = relationship("Upload", back_populates="fields")
+    __table_args__ = (Index("ix_extractedfields_upload_id", "upload_id"),)
 
 class Case(Base):
     __tablename__ = "cases"
@@ -62,6 +72,8 @@ class Case(Base):
     upload = relationship("Upload", back_populates="cases")
     evidence_bundles = relationship("EvidenceBundle", back_populates="case")
     decision_labels = relationship("DecisionLabel", back_populates="case")
+    # covers the per-upload flagged / confidence lookups without touching the table
+    __table_args__ = (Index("ix_cases_upload_id_flagged", "upload_id", "flagged", "confidence_score"),)
 
 class AuditTrail(Base):
     __tablename__ = "audittrail"
@@ -73,6 +85,11 @@ class AuditTrail(Base):
     model_version = Column(Text)
     dataset_snapshot = Column(Text)
     user = relationship("User", back_populates="audit_trails")
+    __table_args__ = (
+        Index("ix_audittrail_user_id_id", "user_id", "id"),
+        Index("ix_audittrail_action_id", "action", "id"),
+        Index("ix_audittrail_timestamp", "timestamp"),
+    )
 
 class EvidenceBundle(Base):
     __tablename__ = "evidencebundles"
@@ -124,3 +141,29 @@ class AccessibilityAudit(Base):
     issue = Column(Text)
     fixed = Column(Boolean)
     method = Column(Text)
+
+class Job(Base):
+    __tablename__ = "jobs"
+    id = Column(Integer, primary_key=True)
+    upload_id = Column(Integer, ForeignKey("uploads.id"))
+    kind = Column(Text, default="analyze")
+    status = Column(Text, default="queued")  # queued | running | done | failed
+    file_path = Column(Text)
+    result = Column(Text, nullable=True)  # JSON payload
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    worker_id = Column(Text, nullable=True)
+    created_at = Column(DateTime)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    upload = relationship("Upload", back_populates="jobs")
+    __table_args__ = (Index("ix_jobs_status_id", "status", "id"),)
+
+class ResultCache(Base):
+    __tablename__ = "resultcache"
+    id = Column(Integer, primary_key=True)
+    content_hash = Column(String(64), nullable=False)
+    model_version = Column(Text, nullable=False)
+    result = Column(Text)  # JSON payload
+    created_at = Column(DateTime)
+    __table_args__ = (UniqueConstraint("content_hash", "model_version", name="uq_resultcache_hash_version"),)
@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 import pandas as pd
 
 # 1. Define variants for key financial columns
@@ -10,29 +11,51 @@ COLUMN_MAPPING = {
     "description": ["description", "narration", "particulars", "details", "transaction details", "remark"]
 }
 
-def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+# 2. Precompiled matcher: cleaning regex plus (target, variant) pairs in priority order
+_NON_ALNUM = re.compile(r"[^a-zA-Z0-9 ]")
+_VARIANTS = tuple((target, v) for target, variants in COLUMN_MAPPING.items() for v in variants)
+HEADER_CACHE_SIZE = 4096
+
+@lru_cache(maxsize=HEADER_CACHE_SIZE)
+def match_header(col: str) -> str:
     """
-    Normalize column names to a consistent schema.
-    Works for both tabular (PDF) and OCR-extracted (image) DataFrames.
+    Map one raw header to its canonical name (or its cleaned form if unknown).
+    Statements reuse a small set of header spellings, so results are memoized.
     """
-    df = df.copy()
-    normalized_map = {}
+    # Clean the header text
+    clean_col = _NON_ALNUM.sub("", col).strip().lower()
 
-    for col in df.columns:
-        # Clean the header text
-        clean_col = re.sub(r"[^a-zA-Z0-9 ]", "", col).strip().lower()
-        matched = False
+    # Check if header matches any expected variant (partial matches included)
+    for target, v in _VARIANTS:
+        if clean_col in v or v in clean_col:
+            return target
 
-        # Check if header matches any expected variant (partial matches included)
-        for target, variants in COLUMN_MAPPING.items():
-            if any(clean_col in v or v in clean_col for v in variants):
-                normalized_map[col] = target
-                matched = True
-                break
+    # Keep original name if no match found
+    return clean_col
 
-        # Keep original name if no match found
-        if not matched:
-            normalized_map[col] = clean_col
+@lru_cache(maxsize=HEADER_CACHE_SIZE)
+def _normalized_index(columns: tuple) -> pd.Index:
+    # whole header rows recur too; reuse one immutable Index per layout
+    return pd.Index([match_header(col) for col in columns])
 
-    df.rename(columns=normalized_map, inplace=True)
+def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normalize column names to a consistent schema.
+    Works for both tabular (PDF) and OCR-extracted (image) DataFrames.
+    """
+    df = df.copy()
+    df.columns = _normalized_index(tuple(df.columns))
     return df
+
+def normalize_columns_many(dfs) -> list:
+    """
+    Normalize many DataFrames without copying their data. Each result is a
+    shallow view sharing the original columns' memory, with renamed headers;
+    the input frames themselves are left untouched.
+    """
+    out = []
+    for df in dfs:
+        view = df.copy(deep=False)
+        view.columns = _normalized_index(tuple(df.columns))
+        out.append(view)
+    return out
@@ -0,0 +1,43 @@
+# app/pagination.py
+"""
+Keyset (cursor) pagination on integer primary keys, newest first.
+
+The cursor is the id of the last row of the previous page, so each page is
+an index range scan of `limit` rows however deep the client pages, unlike
+OFFSET. List endpoints keep returning a plain JSON list; the cursor for the
+next page travels in the X-Next-Cursor header and is absent on the last page.
+"""
+
+from typing import Optional
+from fastapi import Query, Response
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageParams:
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        cursor: Optional[int] = Query(None, description="X-Next-Cursor from the previous page"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+
+def keyset(stmt, id_col, page: PageParams):
+    """Restrict stmt to the page after page.cursor, fetching one extra row to detect more."""
+    if page.cursor is not None:
+        stmt = stmt.where(id_col < page.cursor)
+    return stmt.order_by(id_col.desc()).limit(page.limit + 1)
+
+
+def split_page(rows, page: PageParams, response: Response, key=lambda r: r.id):
+    """Trim the look-ahead row and set the next-page cursor header."""
+    rows = list(rows)
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[CURSOR_HEADER] = str(key(rows[-1]))
+        response.headers["Access-Control-Expose-Headers"] = CURSOR_HEADER
+    return rows
@@ -0,0 +1,113 @@
+# app/retrain_worker.py
+"""
+Runs one retrain job (see services/retrain_jobs.py). Started by
+POST /trigger-retrain; can also be run by hand:
+
+    python -m app.retrain_worker <job_id>
+    python -m app.retrain_worker          # queue a new retrain and run it here
+"""
+
+import argparse
+import os
+import sys
+import traceback
+from datetime import datetime
+
+from .database import SessionLocal
+from . import models
+from .services import audit
+from .services.jobs import worker_name
+from .services.retrain_jobs import (
+    RETRAIN_THREADS, JobProgress, RetrainBusy, acquire_lock, finish_retrain, start_retrain,
+)
+
+
+def _limit_threads():
+    try:
+        import torch
+        torch.set_num_threads(RETRAIN_THREADS)
+        torch.set_num_interop_threads(max(1, RETRAIN_THREADS // 2))
+    except (ImportError, RuntimeError):
+        pass
+
+
+def run(job_id: int):
+    db = SessionLocal()
+    lock = None
+    try:
+        job = db.get(models.Job, job_id)
+        if job is None or job.kind != "retrain" or job.status != "queued":
+            print(f"[retrain {job_id}] nothing to do")
+            return
+        lock = acquire_lock()
+        if lock is None:
+            job.status = "failed"
+            job.error = "Another retrain is already running"
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            return
+
+        # conditional, like claim_next_job: a cancel that landed meanwhile wins
+        claimed = (
+            db.query(models.Job)
+            .filter(models.Job.id == job_id, models.Job.status == "queued")
+            .update(
+                {
+                    models.Job.status: "running",
+                    models.Job.worker_id: worker_name(),
+                    models.Job.started_at: datetime.utcnow(),
+                    models.Job.attempts: models.Job.attempts + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if not claimed:
+            return
+        db.refresh(job)
+        print(f"[retrain {job_id}] started with {RETRAIN_THREADS} threads (pid {os.getpid()})")
+
+        _limit_threads()
+        progress = JobProgress(db, job)
+        try:
+            from .services.retrain import retrain_model  # training stack loads in this process only
+            result = retrain_model(progress=progress)
+        except Exception:
+            result = {"success": False, "f1": None, "message": traceback.format_exc(limit=5)}
+
+        finish_retrain(db, job, result, progress.cancelled)
+        audit.log("retrain", None, f"job {job_id} {job.status}: {result.get('message')}",
+                  sync=True, model_version=(result.get("report") or {}).get("best_checkpoint"))
+        print(f"[retrain {job_id}] {job.status}")
+    finally:
+        if lock is not None:
+            lock.close()
+        db.close()
+
+
+def queue_here() -> int:
+    """Record a manual retrain job without spawning a worker; returns its id."""
+    db = SessionLocal()
+    try:
+        job = start_retrain(db, spawn=False, trigger={"reason": "cli"})
+        return job.id
+    finally:
+        db.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run one retrain job")
+    ap.add_argument("job_id", type=int, nargs="?", help="queued job to run (default: queue a new one)")
+    args = ap.parse_args()
+    job_id = args.job_id
+    if job_id is None:
+        try:
+            job_id = queue_here()
+        except RetrainBusy as busy:
+            sys.exit(str(busy))
+        audit.log("retrain", None, f"retrain job {job_id} queued from the command line", sync=True)
+    run(job_id)
+
+
+if __name__ == "__main__":
+    main()
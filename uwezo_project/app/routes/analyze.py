@@ -1,39 +1,128 @@
 # app/routes/analyze.py
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from ..database import get_db
-from ..services.extraction import extract_with_ai
+from typing import Optional
+import json
+from ..database import get_db, SessionLocal
+from ..services import audit
+from ..services.executor import run_cpu, run_io
+from ..services.persistence import persist_result
+from ..services.result_cache import get_cached_result, store_result
+from ..services.storage import save_upload
+from ..services.tasks import extract_file
 from .. import crud
-import tempfile
 
 router = APIRouter(prefix="/analyze", tags=["Model Inference"])
 
 @router.post("/")
 async def analyze_document(
     file: UploadFile = File(...),
+    user_id: Optional[int] = Form(None),
+    mode: str = Query("sync", description="'sync' runs inline; 'job' queues and returns a job id"),
     db: Session = Depends(get_db)
 ):
-    if file.content_type not in ["application/pdf", "image/png", "image/jpeg"]:
-        raise HTTPException(status_code=415, detail="File type not supported.")
+    if mode not in ("sync", "job"):
+        raise HTTPException(status_code=422, detail="mode must be 'sync' or 'job'.")
 
-    # Save upload record
-    upload = crud.create_upload(db, file.filename)
+    # Streamed to disk, hashed and type-checked (magic bytes) while receiving;
+    # identical uploads share one stored file
+    stored = await save_upload(file)
+    # database calls run on the I/O pool and extraction on the CPU pool, so
+    # the event loop keeps serving other requests meanwhile
+    upload = await run_io(
+        crud.create_upload, db, file.filename, user_id, stored.path,
+        processing_purpose="analyze", content_hash=stored.content_hash
+    )
+    cached = await run_io(get_cached_result, db, stored.content_hash)
+
+    if mode == "job":
+        if cached is not None:
+            await run_io(persist_result, db, upload.id, cached)
+            await audit.alog("analyze", user_id, f"upload {upload.id} analyzed (cached=True)")
+            return JSONResponse(
+                content={"id": upload.id, "filename": upload.filename, "cached": True, "result": cached}
+            )
+        # Hand the stored upload to the worker pool
+        job = await run_io(crud.create_job, db, upload.id, stored.path)
+        await audit.alog("analyze", user_id, f"upload {upload.id} queued as job {job.id}")
+        return JSONResponse(
+            status_code=202,
+            content={
+                "job_id": job.id,
+                "id": upload.id,
+                "filename": upload.filename,
+                "status": job.status,
+                "status_url": f"/jobs/{job.id}"
+            }
+        )
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file.filename[-4:]) as tmp:
-        tmp.write(await file.read())
-        tmp.flush()
-        # combine extraction, inference, flagging
-        result = extract_with_ai(tmp.name)
+    # combine extraction, inference, flagging (skipped on a cache hit)
+    result = cached
+    if result is None:
+        result = await run_cpu(extract_file, stored.path)
+        await run_io(store_result, db, stored.content_hash, result)
 
-    upload.processed = True
-    db.commit()
+    # fields, case scores and authenticity check in one transaction
+    await run_io(persist_result, db, upload.id, result)
+    await audit.alog("analyze", user_id, f"upload {upload.id} analyzed (cached={cached is not None})")
 
     return JSONResponse(
         content={
             "id": upload.id,
             "filename": upload.filename,
+            "cached": cached is not None,
             "result": result
         }
     )
+
+
+def _stream_analysis(upload_id: int, content_hash: str, file_path: str):
+    # a sync generator: StreamingResponse iterates it on a worker thread
+    from ..services.pdf_pipeline import iter_pdf_analysis
+
+    db = SessionLocal()
+    try:
+        cached = get_cached_result(db, content_hash)
+        if cached is not None:
+            for item in cached["pages"] + [cached["flagging"]]:
+                yield json.dumps(item, default=str) + "\n"
+            persist_result(db, upload_id, cached)
+            return
+        items = []
+        for item in iter_pdf_analysis(file_path):
+            items.append(item)
+            yield json.dumps(item, default=str) + "\n"
+        result = {
+            "pages": sorted(items[:-1], key=lambda p: p["page"]),
+            "flagging": items[-1],
+        }
+        store_result(db, content_hash, result)
+        persist_result(db, upload_id, result)
+    finally:
+        db.close()
+
+
+@router.post("/stream")
+async def analyze_pdf_stream(
+    file: UploadFile = File(...),
+    user_id: Optional[int] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Analyze a multi-page PDF statement. Streams one NDJSON line per page as
+    each page finishes, then a final line with the document-level verdict.
+    """
+    stored = await save_upload(file, allowed_types={"application/pdf"})
+    upload = await run_io(
+        crud.create_upload, db, file.filename, user_id, stored.path,
+        processing_purpose="analyze", content_hash=stored.content_hash
+    )
+    await audit.alog("analyze", user_id, f"upload {upload.id} streamed")
+
+    return StreamingResponse(
+        _stream_analysis(upload.id, stored.content_hash, stored.path),
+        media_type="application/x-ndjson",
+        headers={"X-Upload-Id": str(upload.id)}
+    )
@@ -1,15 +1,12 @@
 from fastapi import APIRouter, UploadFile, File
-from ..extraction import extract_bank_statement
-from tempfile import NamedTemporaryFile
+from ..services.executor import run_cpu
+from ..services.storage import save_upload
+from ..services.tasks import extract_statement
 
 router = APIRouter(prefix="/analyze", tags=["PDF Extraction"])
 
 @router.post("/")
 async def analyze_pdf(file: UploadFile = File(...)):
     """Analyze a PDF bank statement and extract text and tables."""
-    with NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        contents = await file.read()
-        tmp.write(contents)
-        tmp.flush()
-        data = extract_bank_statement(tmp.name)
-    return data
+    stored = await save_upload(file, allowed_types={"application/pdf"})
+    return await run_cpu(extract_statement, stored.path)
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from ..database import get_db
+from ..services import warmup
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+
+@router.get("/live", summary="Process is up")
+def live():
+    return {"status": "ok"}
+
+
+@router.get("/ready", summary="Database reachable and model warmed up")
+def ready(db: Session = Depends(get_db)):
+    """
+    503 until the model has been warmed up, so load balancers only route
+    analysis traffic to workers that will not stall on model loading.
+    """
+    try:
+        db.execute(text("SELECT 1"))
+        database = "ok"
+    except Exception as e:
+        database = f"error: {e}"
+    state = warmup.status()
+    ok = database == "ok" and state["status"] == "ready"
+    return JSONResponse(status_code=200 if ok else 503, content={"database": database, **state})
+
+
+@router.post("/warmup", summary="Load heavy dependencies and model weights")
+def warm():
+    state = warmup.warm_up()
+    return JSONResponse(status_code=500 if state["status"] == "failed" else 200, content=state)
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
+from ..services.jobs import job_payload
+from .. import crud
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+@router.get("/{job_id}")
+async def get_job_status(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Status of a queued analysis; includes the result once the job is done."""
+    job = await crud.get_job_async(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return jsonable_encoder(job_payload(job))
@@ -1,6 +1,5 @@
 from fastapi import APIRouter
 from fastapi.responses import StreamingResponse
-from app.services.pdf_report import generate_pdf_report
 
 
 router = APIRouter(prefix="/report", tags=["Report Generation"])
@@ -8,4 +7,6 @@ router = APIRouter(prefix="/report", tags=["Report Generation"])
 @router.post("/")
 async def generate_report(data: dict):
     """Generate a downloadable PDF summary report."""
+    from app.services.pdf_report import generate_pdf_report  # reportlab loads on first report
+
     return generate_pdf_report(data)
@@ -1,20 +1,77 @@
-from fastapi import APIRouter
-from app.services.retrain import retrain_model
-from datetime import datetime
-
-router = APIRouter()
-
-@router.post("/trigger-retrain", summary="Trigger ML model retraining")
-def trigger_retrain():
-    started = datetime.now()
-    print(f"[{started}] Retraining started via API.")
-    result = retrain_model()
-    completed = datetime.now()
-    print(f"[{completed}] Retraining completed.")
-    return {
-        "status": "completed" if result["success"] else "failed",
-        "f1_score": result.get("f1"),
-        "message": result["message"],
-        "started": str(started),
-        "completed": str(completed)
-    }
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from .. import models
+from ..database import get_db
+from ..services import audit
+from ..services.executor import run_io
+from ..services.retrain_scheduler import queue_state
+from ..services.retrain_jobs import (
+    RetrainBusy, active_retrain, cancel_retrain, retrain_payload, retrain_report, start_retrain
+)
+
+router = APIRouter(tags=["Retraining"])
+
+@router.post("/trigger-retrain", summary="Start ML model retraining in the background")
+async def trigger_retrain(db: Session = Depends(get_db)):
+    """
+    Starts a retrain job in its own process and returns immediately (202).
+    Only one retrain runs at a time; while one is active this returns 409
+    with that job's id.
+    """
+    try:
+        job = await run_io(start_retrain, db)
+    except RetrainBusy as busy:
+        return JSONResponse(
+            status_code=409,
+            content=jsonable_encoder({"detail": str(busy), **retrain_payload(busy.job),
+                                      "status_url": f"/retrain/{busy.job.id}"})
+        )
+    await audit.alog("retrain", None, f"retrain job {job.id} queued", sync=True)
+    print(f"[{job.created_at}] Retraining job {job.id} started via API.")
+    return JSONResponse(
+        status_code=202,
+        content=jsonable_encoder({**retrain_payload(job), "status_url": f"/retrain/{job.id}"})
+    )
+
+def _get_retrain_job(db: Session, job_id: int):
+    job = db.get(models.Job, job_id)
+    if job is None or job.kind != "retrain":
+        raise HTTPException(status_code=404, detail="Retrain job not found.")
+    return job
+
+@router.get("/retrain/queue", summary="Pending retrain requests and scheduler state")
+def get_retrain_queue(db: Session = Depends(get_db)):
+    """
+    Retrain requests (reviews with trigger_retrain) not yet covered by a
+    run, the trigger checks, and when the next run may start. Read-only;
+    runs are started by the scheduler.
+    """
+    return jsonable_encoder(queue_state(db))
+
+@router.get("/retrain/active", summary="The queued or running retrain, if any")
+def get_active_retrain(db: Session = Depends(get_db)):
+    job = active_retrain(db)
+    return jsonable_encoder(retrain_payload(job)) if job else None
+
+@router.get("/retrain/{job_id}", summary="Retrain progress (epoch, step, loss, running F1)")
+def get_retrain_progress(job_id: int, db: Session = Depends(get_db)):
+    return jsonable_encoder(retrain_payload(_get_retrain_job(db, job_id)))
+
+@router.get("/retrain/{job_id}/report", summary="Final retrain report")
+def get_retrain_report(job_id: int, db: Session = Depends(get_db)):
+    job = _get_retrain_job(db, job_id)
+    report = retrain_report(job)
+    if report is None:
+        raise HTTPException(status_code=409, detail=f"Retrain job {job_id} is {job.status}; no report yet.")
+    return jsonable_encoder({"job_id": job.id, "status": job.status, "report": report})
+
+@router.post("/retrain/{job_id}/cancel", summary="Cancel a queued or running retrain")
+def cancel_retrain_job(job_id: int, db: Session = Depends(get_db)):
+    job = _get_retrain_job(db, job_id)
+    if job.status not in ("queued", "running", "cancelling"):
+        raise HTTPException(status_code=409, detail=f"Retrain job {job_id} is already {job.status}.")
+    job = cancel_retrain(db, job)
+    audit.log("retrain", None, f"retrain job {job_id} cancel requested", sync=True)
+    return jsonable_encoder(retrain_payload(job))
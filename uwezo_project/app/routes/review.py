@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from .. import crud, schemas
 from ..database import get_db
+from ..services import audit
 
 router = APIRouter(prefix="/review", tags=["Document Review"])
 
@@ -15,12 +16,25 @@ def review_document(document_id: int, review: schemas.ReviewSchema, db: Session
         review.comment,
         review.trigger_retrain
     )
-    # Only queue retrain if requested
+    # reviewer decisions are compliance records: written before we respond
+    audit.log(
+        "review", review.user_id,
+        f"review {logged_review.id} on upload {document_id} (retrain={review.trigger_retrain})",
+        sync=True
+    )
+    # Only queue retrain if requested; requests are coalesced into scheduled runs
+    retrain = None
     if review.trigger_retrain:
-        crud.queue_retrain_task(db, document_id)
+        state = crud.queue_retrain_task(db, document_id)
+        retrain = {
+            "pending_requests": state["pending_requests"],
+            "started_job_id": state["started_job_id"],
+            "queue_url": "/retrain/queue"
+        }
     # Optionally, return the logged_review object
     return {
         "message": "Review recorded",
         "review_id": logged_review.id,
-        "document_id": document_id
+        "document_id": document_id,
+        "retrain": retrain
     }
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, UploadFile, File
-import tempfile, json
 from pathlib import Path
-from app.services.flagging_service import analyze_document
+from ..services.executor import run_cpu
+from ..services.storage import save_upload
+from ..services.tasks import flag_document as flag_document_task
 
 router = APIRouter(prefix="/review", tags=["Review & Flagging"])
 
@@ -10,16 +11,15 @@ async def flag_document(file: UploadFile = File(...)):
     """
     Endpoint: Upload a document; returns extracted fields and flagging decision.
     """
-    suffix = Path(file.filename).suffix
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        contents = await file.read()
-        tmp.write(contents)
-        image_path = Path(tmp.name)
+    stored = await save_upload(file, allowed_types={"image/png", "image/jpeg"})
+    image_path = Path(stored.path)
 
     # Lookup the OCR JSON you generated when the doc was uploaded
-    ocr_path = Path("processed/ocr/val") / (image_path.stem + ".json")
+    name = Path(file.filename or "").stem
+    ocr_path = Path("processed/ocr/val") / (name + ".json")
     if not ocr_path.exists():
-        return {"error": f"OCR JSON not found for {image_path.name}"}
+        return {"error": f"OCR JSON not found for {file.filename}"}
 
-    result = analyze_document(image_path, ocr_path)
-    return {"document": image_path.name, "analysis": result}
+    # extraction + flagging run in the CPU pool, off the event loop
+    result = await run_cpu(flag_document_task, str(image_path), str(ocr_path))
+    return {"document": file.filename, "analysis": result}
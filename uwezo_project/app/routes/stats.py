@@ -0,0 +1,21 @@
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import get_async_db
+from .. import crud
+
+router = APIRouter(tags=["Dashboard"])
+
+@router.get("/stats", summary="Upload counts, flag rate and average confidence")
+async def get_stats(
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    flag_rate is flagged uploads over uploads that have at least one case;
+    avg_confidence averages each upload's mean case confidence.
+    """
+    return await crud.upload_stats_async(db, user_id, since, until)
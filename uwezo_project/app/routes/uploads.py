@@ -1,13 +1,17 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from ..database import get_db
+from typing import Optional
+from ..database import get_async_db, get_db
+from ..pagination import PageParams, split_page
 from .. import crud, models
+from ..services import audit
+from ..services.executor import run_io
+from ..services.storage import save_upload
 import os
 from datetime import datetime
 
 router = APIRouter()
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @router.post("/upload/", summary="Upload a document")
 async def upload_document(
@@ -15,46 +19,60 @@ async def upload_document(
     user_id: int = Form(...),
     db: Session = Depends(get_db)
 ):
-    user = db.query(models.User).filter_by(id=user_id).first()
+    user = await run_io(db.get, models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     file_extension = os.path.splitext(file.filename)[1]
     safe_filename = f"{user_id}_{timestamp}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, safe_filename)
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
+    # Content-addressed: the same bytes are stored once, however often uploaded
+    stored = await save_upload(file)
+    previous = await run_io(crud.get_upload_by_hash, db, stored.content_hash)
 
-    upload = crud.create_upload(
+    upload = await run_io(
+        crud.create_upload,
         db=db,
         filename=safe_filename,
         user_id=user_id,
-        file_path=file_path,
-        processing_purpose="manual"
+        file_path=stored.path,
+        processing_purpose="manual",
+        content_hash=stored.content_hash
     )
+    await audit.alog("upload", user_id, f"upload {upload.id} sha256={stored.content_hash}")
 
     return {
         "message": "File uploaded successfully.",
         "upload_id": upload.id,
-        "filename": safe_filename
+        "filename": safe_filename,
+        "content_hash": stored.content_hash,
+        "duplicate_of": previous.id if previous else None
     }
 
-# GET all uploads for dashboard stats
+# GET uploads, newest first, one keyset page at a time (dashboard counters: GET /stats)
 @router.get("/upload/")
-def get_uploads(db: Session = Depends(get_db)):
-    uploads = db.query(models.Upload).all()
-    # If your model has `flagged` and `confidence_score` fields, include them here
-    results = [
+async def get_uploads(
+    response: Response,
+    page: PageParams = Depends(),
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    processed: Optional[bool] = None,
+    flagged: Optional[bool] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    rows = await crud.list_uploads_async(db, page, user_id, since, until, processed, flagged)
+    rows = split_page(rows, page, response)
+    return [
         {
-            "id": u.id,
-            "filename": u.filename,
-            "flagged": getattr(u, "flagged", False),  # Adjust as needed
-            "processed": u.processed,
-            "processing_purpose": u.processing_purpose,
-            "confidence_score": getattr(u, "confidence_score", None),  # Adjust as needed
-            # Add other fields needed for dashboard
+            "id": r.id,
+            "filename": r.filename,
+            "user_id": r.user_id,
+            "uploaded_at": r.uploaded_at,
+            "flagged": bool(r.flagged),
+            "processed": r.processed,
+            "processing_purpose": r.processing_purpose,
+            "confidence_score": r.confidence_score,
         }
-        for u in uploads
+        for r in rows
     ]
-    return results
@@ -0,0 +1,161 @@
+# app/services/audit.py
+"""
+Buffered audit-trail sink. Hot endpoints call audit.log(...), which only
+appends to an in-memory buffer; a background thread writes the buffer to
+the audittrail table with one executemany INSERT when it reaches
+FLUSH_ROWS entries or every FLUSH_INTERVAL seconds, and shutdown() flushes
+whatever is left.
+
+Compliance-critical actions pass sync=True: the call blocks until that row
+(and everything buffered before it) is committed, and raises if the write
+fails. UWEZO_AUDIT_MODE=sync makes every call synchronous. A synchronous
+call does database I/O, so async endpoints use `await audit.alog(...)`,
+which appends inline in buffered mode and moves only synchronous writes
+onto the I/O pool (run_io).
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime
+from sqlalchemy import insert
+from .. import models
+from ..database import SessionLocal
+from .executor import run_io
+
+AUDIT_MODE = os.getenv("UWEZO_AUDIT_MODE", "buffered")  # buffered | sync
+FLUSH_ROWS = int(os.getenv("UWEZO_AUDIT_FLUSH_ROWS", "200"))
+FLUSH_INTERVAL = float(os.getenv("UWEZO_AUDIT_FLUSH_S", "1.0"))
+# rows kept for retry while the database is unavailable; the oldest are dropped beyond this
+MAX_BUFFER = int(os.getenv("UWEZO_AUDIT_MAX_BUFFER", "100000"))
+
+logger = logging.getLogger(__name__)
+
+
+class AuditSink:
+    def __init__(self, session_factory=SessionLocal, flush_rows: int = FLUSH_ROWS,
+                 flush_interval: float = FLUSH_INTERVAL, mode: str = AUDIT_MODE,
+                 max_buffer: int = MAX_BUFFER):
+        self.session_factory = session_factory
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.mode = mode
+        self.max_buffer = max_buffer
+        self.dropped = 0
+        self._buffer = []
+        self._lock = threading.Lock()
+        # one writer at a time keeps rows in order across the thread and sync callers
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def log(self, action: str, user_id: int = None, details: str = None, sync: bool = False,
+            model_version: str = None, dataset_snapshot: str = None, timestamp: datetime = None):
+        row = {
+            "action": action,
+            "user_id": user_id,
+            "details": details,
+            "model_version": model_version,
+            "dataset_snapshot": dataset_snapshot,
+            "timestamp": timestamp or datetime.utcnow(),
+        }
+        with self._lock:
+            self._buffer.append(row)
+            pending = len(self._buffer)
+        if sync or self.mode == "sync":
+            self.flush(raise_errors=True)
+            return
+        self._ensure_thread()
+        if pending >= self.flush_rows:
+            self._wake.set()
+
+    async def alog(self, action: str, user_id: int = None, details: str = None, sync: bool = False,
+                   **extra):
+        """log() for async code: only a synchronous write leaves the event loop."""
+        if sync or self.mode == "sync":
+            await run_io(self.log, action, user_id, details, sync=sync, **extra)
+        else:
+            self.log(action, user_id, details, **extra)
+
+    def flush(self, raise_errors: bool = False) -> int:
+        """Write everything buffered so far in one transaction; returns the row count."""
+        with self._write_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            db = self.session_factory()
+            try:
+                db.execute(insert(models.AuditTrail), rows)
+                db.commit()
+            except Exception:
+                db.rollback()
+                self._requeue(rows)
+                if raise_errors:
+                    raise
+                logger.exception("audit flush of %d rows failed; will retry", len(rows))
+                return 0
+            finally:
+                db.close()
+            return len(rows)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def shutdown(self, timeout: float = 10.0):
+        """Stop the flush thread and write the remaining buffer."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _requeue(self, rows):
+        with self._lock:
+            self._buffer = rows + self._buffer
+            overflow = len(self._buffer) - self.max_buffer
+            if overflow > 0:
+                del self._buffer[:overflow]
+                self.dropped += overflow
+                logger.error("audit buffer full; dropped %d oldest rows", overflow)
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="uwezo-audit", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+
+_sink = AuditSink()
+
+
+def get_sink() -> AuditSink:
+    return _sink
+
+
+def log(action: str, user_id: int = None, details: str = None, sync: bool = False, **extra):
+    _sink.log(action, user_id, details, sync=sync, **extra)
+
+
+async def alog(action: str, user_id: int = None, details: str = None, sync: bool = False, **extra):
+    await _sink.alog(action, user_id, details, sync=sync, **extra)
+
+
+def flush() -> int:
+    return _sink.flush()
+
+
+def shutdown():
+    _sink.shutdown()
@@ -0,0 +1,106 @@
+# app/services/executor.py
+"""
+Keeps blocking work off the event loop.
+
+run_io   blocking I/O (SQLAlchemy, file system) on a thread pool
+run_cpu  CPU-bound stages (extraction, inference, forensics) on a bounded
+         thread pool in the web process; inference releases the GIL, and
+         concurrent requests share one resident model and the inference
+         engine's micro-batching
+render_pool  the process pool PDF pages are rendered and OCR'd on
+             (services/pdf_pipeline), shared by every request
+
+UWEZO_CPU_POOL=process runs CPU stages on a spawn-started process pool
+instead (callables must be picklable, see services/tasks.py). Each worker
+loads its own model and serves one request at a time, so model memory
+grows with UWEZO_CPU_WORKERS and nothing is batched across requests.
+"""
+
+import asyncio
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+CPU_POOL = os.getenv("UWEZO_CPU_POOL", "thread")
+CPU_WORKERS = int(os.getenv("UWEZO_CPU_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+IO_WORKERS = int(os.getenv("UWEZO_IO_WORKERS", "16"))
+RENDER_WORKERS = int(os.getenv("UWEZO_RENDER_WORKERS", str(os.cpu_count() or 2)))
+
+_cpu = None
+_io = None
+_render = None
+_lock = threading.Lock()
+
+
+def cpu_pool():
+    global _cpu
+    with _lock:
+        if _cpu is None:
+            if CPU_POOL == "process":
+                # spawn: forking a process that holds event-loop and torch threads is unsafe
+                _cpu = ProcessPoolExecutor(max_workers=CPU_WORKERS, mp_context=mp.get_context("spawn"))
+            elif CPU_POOL == "thread":
+                _cpu = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="uwezo-cpu")
+            else:
+                raise ValueError(f"UWEZO_CPU_POOL must be process or thread, got {CPU_POOL!r}")
+    return _cpu
+
+
+def io_pool():
+    global _io
+    with _lock:
+        if _io is None:
+            _io = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="uwezo-io")
+    return _io
+
+
+def render_pool():
+    global _render
+    with _lock:
+        if _render is None:
+            # spawn, as for the CPU pool: this runs inside the web process too
+            _render = ProcessPoolExecutor(max_workers=RENDER_WORKERS, mp_context=mp.get_context("spawn"))
+    return _render
+
+
+async def run_io(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(io_pool(), partial(fn, *args, **kwargs))
+
+
+async def run_cpu(fn, *args, **kwargs):
+    pool = cpu_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, partial(fn, *args, **kwargs))
+    except BrokenProcessPool:
+        # a worker died (e.g. OOM while loading the model); start a fresh pool next time
+        _discard_cpu_pool(pool)
+        raise
+
+
+def _discard_cpu_pool(pool):
+    global _cpu
+    with _lock:
+        if _cpu is pool:
+            _cpu = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def discard_render_pool(pool):
+    """Drop a broken render pool; the next render_pool() call starts a fresh one."""
+    global _render
+    with _lock:
+        if _render is pool:
+            _render = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown(wait: bool = True):
+    global _cpu, _io, _render
+    with _lock:
+        for pool in (_cpu, _io, _render):
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=True)
+        _cpu = _io = _render = None
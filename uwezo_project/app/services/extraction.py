@@ -1,17 +1,29 @@
 # app/services/extraction.py
 
 from pathlib import Path
-from src.layout_inference import predict_fields  # move your notebook inference here
+from src.inference_engine import get_engine
 from src.flagging import (
     check_numeric_consistency,
     detect_forensic_tampering,
     aggregate_flags,
 )
 
+def run_inference(image_path: Path, ocr_json_path: Path) -> dict:
+    """
+    Predict fields for one page through the shared micro-batching engine.
+    Concurrent callers are batched into a single forward pass.
+    """
+    return get_engine().predict(image_path, ocr_json_path)
+
 def extract_with_ai(file_path: str):
     """
     run model inference + flagging.
+    Multi-page PDFs go through the per-page pipeline in pdf_pipeline.
     """
+    if Path(file_path).suffix.lower() == ".pdf":
+        from .pdf_pipeline import analyze_pdf
+        return analyze_pdf(Path(file_path))
+
     # Step 1 − Existing extraction step
     extracted = some_existing_extraction_logic(file_path) 
     img_path = Path("processed/images/val") / (Path(file_path).stem + ".jpg")
@@ -21,7 +33,7 @@ def extract_with_ai(file_path: str):
     if not (img_path.exists() and ocr_json.exists()):
         return {"error": f"Missing OCR or processed image for {file_path}"}
 
-    fields = predict_fields(img_path, ocr_json)
+    fields = run_inference(img_path, ocr_json)
 
     # Step 3 − Two‑part risk flagging
     numeric_res = check_numeric_consistency(fields)
@@ -0,0 +1,124 @@
+# app/services/jobs.py
+
+import json
+import os
+import socket
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+from .. import models
+from .persistence import persist_result
+
+MAX_ATTEMPTS = int(os.getenv("UWEZO_JOB_MAX_ATTEMPTS", "3"))
+STALE_AFTER = timedelta(seconds=int(os.getenv("UWEZO_JOB_TIMEOUT_S", "900")))
+
+
+def worker_name(index: int = 0) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+def claim_next_job(db: Session, worker_id: str, kind: str = "analyze"):
+    """
+    Atomically move the oldest queued job of this kind to "running" and
+    return it (retrain jobs have their own worker, see retrain_jobs).
+    The conditional UPDATE means two workers can never claim the same job,
+    on Postgres as well as on SQLite. Returns None when the queue is empty.
+    """
+    while True:
+        job_id = (
+            db.query(models.Job.id)
+            .filter(models.Job.status == "queued", models.Job.kind == kind)
+            .order_by(models.Job.id)
+            .limit(1)
+            .scalar()
+        )
+        if job_id is None:
+            return None
+        claimed = (
+            db.query(models.Job)
+            .filter(models.Job.id == job_id, models.Job.status == "queued")
+            .update(
+                {
+                    models.Job.status: "running",
+                    models.Job.worker_id: worker_id,
+                    models.Job.started_at: datetime.utcnow(),
+                    models.Job.attempts: models.Job.attempts + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if claimed:
+            return db.get(models.Job, job_id)
+        # another worker won the race; try the next one
+
+
+def complete_job(db: Session, job: models.Job, result: dict):
+    job.status = "done"
+    job.result = json.dumps(result, default=str)
+    job.error = None
+    job.finished_at = datetime.utcnow()
+    if job.upload_id is not None:
+        # commits the job update together with the document's rows
+        persist_result(db, job.upload_id, result)
+    else:
+        db.commit()
+    return job
+
+
+def fail_job(db: Session, job: models.Job, error: str):
+    """Requeue the job until it has used up MAX_ATTEMPTS, then mark it failed."""
+    job.error = error
+    if (job.attempts or 0) < MAX_ATTEMPTS:
+        job.status = "queued"
+        job.worker_id = None
+    else:
+        job.status = "failed"
+        job.finished_at = datetime.utcnow()
+    db.commit()
+    return job
+
+
+def requeue_stale_jobs(db: Session, stale_after: timedelta = STALE_AFTER, kind: str = "analyze") -> int:
+    """Return jobs whose worker died mid-run to the queue."""
+    cutoff = datetime.utcnow() - stale_after
+    stale = (
+        db.query(models.Job)
+        .filter(models.Job.status == "running", models.Job.kind == kind, models.Job.started_at < cutoff)
+        .all()
+    )
+    for job in stale:
+        fail_job(db, job, f"Worker {job.worker_id} timed out")
+    return len(stale)
+
+
+def run_job(db: Session, job: models.Job):
+    """Execute one claimed job and record its outcome."""
+    from .extraction import extract_with_ai  # heavy ML imports stay out of the web process
+    from .result_cache import analyze_cached
+
+    try:
+        if job.kind != "analyze":
+            raise ValueError(f"Unknown job kind: {job.kind}")
+        content_hash = job.upload.content_hash if job.upload is not None else None
+        if content_hash:
+            result, _ = analyze_cached(db, content_hash, job.file_path)
+        else:
+            result = extract_with_ai(job.file_path)
+    except Exception as e:
+        db.rollback()
+        return fail_job(db, job, str(e))
+    return complete_job(db, job, result)
+
+
+def job_payload(job: models.Job) -> dict:
+    return {
+        "job_id": job.id,
+        "upload_id": job.upload_id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+    }
@@ -0,0 +1,232 @@
+# app/services/pdf_pipeline.py
+"""
+Multi-page statement pipeline: render + OCR pages on the shared render
+process pool (services/executor), run extraction and flagging per page
+concurrently, and yield page results as soon as each one finishes, followed
+by a document-level summary.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from .executor import RENDER_WORKERS, discard_render_pool, render_pool
+
+try:
+    import fitz  # PyMuPDF
+except Exception:
+    fitz = None
+
+DPI = int(os.getenv("UWEZO_PDF_DPI", "200"))
+PAGE_WORKERS = int(os.getenv("UWEZO_PAGE_WORKERS", "4"))
+
+
+# 1. Rendering + OCR (runs inside worker processes)
+
+def pdf_to_images(pdf_path: Path, out_dir: Path, dpi: int = DPI):
+    """
+    Render a PDF to PNGs at ~dpi; returns list[Path].
+    Safe for OCR (do NOT overwrite your detector images).
+    """
+    if fitz is None:
+        warnings.warn("pdf_to_images skipped: PyMuPDF not available.")
+        return []
+    return [render_page(pdf_path, i, out_dir, dpi) for i in range(page_count(pdf_path))]
+
+
+def page_count(pdf_path: Path) -> int:
+    if fitz is None:
+        raise RuntimeError("PyMuPDF is required to process PDF statements.")
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def render_page(pdf_path: Path, index: int, out_dir: Path, dpi: int = DPI) -> Path:
+    pdf_path, out_dir = Path(pdf_path), Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    zoom = dpi / 72.0
+    with fitz.open(pdf_path) as doc:
+        pix = doc[index].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    out_path = out_dir / f"{pdf_path.stem}_p{index+1:03d}.png"
+    pix.save(str(out_path))
+    return out_path
+
+
+def _prep_for_ocr(bgr):
+    import cv2
+
+    h, w = bgr.shape[:2]
+    scale = 1.5 if max(h, w) < 2000 else 1.2
+    bgr = cv2.resize(bgr, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_CUBIC)
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    gray = cv2.bilateralFilter(gray, 5, 30, 30)
+    thr = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                cv2.THRESH_BINARY, 31, 15)
+    return thr, scale
+
+
+def ocr_page(image_path: Path, out_json: Path) -> Path:
+    """
+    Tesseract OCR of one page into the processed/ocr JSON layout.
+    """
+    import cv2
+    import pytesseract
+
+    img = cv2.imread(str(image_path))
+    if img is None:
+        raise ValueError(f"Cannot read {image_path}")
+    h, w = img.shape[:2]
+    proc, scale = _prep_for_ocr(img)
+    data = pytesseract.image_to_data(proc, output_type=pytesseract.Output.DICT,
+                                     config="--oem 1 --psm 6")
+    words = []
+    n = len(data.get("text", []))
+    for i in range(n):
+        txt = (data["text"][i] or "").strip()
+        if not txt:
+            continue
+        # boxes come back in the upscaled OCR image; map them to page pixels
+        x, y = int(data["left"][i] / scale), int(data["top"][i] / scale)
+        bw, bh = int(data["width"][i] / scale), int(data["height"][i] / scale)
+        try:
+            conf_raw = float(data.get("conf", [0] * n)[i])
+            conf = 0.0 if conf_raw < 0 else min(conf_raw / 100.0, 1.0)
+        except Exception:
+            conf = 0.0
+        words.append({"text": txt, "bbox": [x, y, x + bw, y + bh], "score": conf})
+
+    payload = {"image_path": str(image_path), "width": w, "height": h, "words": words}
+    Path(out_json).write_text(json.dumps(payload, ensure_ascii=False))
+    return Path(out_json)
+
+
+def render_and_ocr_page(pdf_path: Path, index: int, out_dir: Path, dpi: int = DPI):
+    img = render_page(pdf_path, index, out_dir, dpi)
+    return img, ocr_page(img, img.with_suffix(".json"))
+
+
+# 2. Per-page extraction + flagging (runs on threads; inference is micro-batched)
+
+def analyze_page(index: int, img_path: Path, ocr_json: Path) -> dict:
+    # imported lazily so render processes never pull in torch
+    from src.flagging import check_numeric_consistency, detect_forensic_tampering, aggregate_flags
+    from .extraction import run_inference
+
+    try:
+        fields = run_inference(img_path, ocr_json)
+        numeric_res = check_numeric_consistency(fields)
+        vision_res = detect_forensic_tampering(img_path)
+        return {
+            "type": "page",
+            "page": index + 1,
+            "fields": fields,
+            "flagging": aggregate_flags(numeric_res, vision_res),
+        }
+    except Exception as e:
+        return {"type": "page", "page": index + 1, "error": str(e)}
+
+
+def document_summary(pages: list) -> dict:
+    """
+    Document-level verdict from the weakest numeric check and the strongest
+    tampering signal across pages.
+    """
+    from src.flagging import aggregate_flags
+
+    flagged = [p["flagging"] for p in pages if "flagging" in p]
+    numeric = min((f["numeric_check"] for f in flagged),
+                  key=lambda r: r.get("consistency_score", 1.0), default={})
+    vision = max((f["tamper_check"] for f in flagged),
+                 key=lambda r: r.get("tamper_score", 0.0), default={})
+    summary = aggregate_flags(numeric, vision)
+    summary.update({
+        "type": "document",
+        "pages": len(pages),
+        "failed_pages": sorted(p["page"] for p in pages if "error" in p),
+        "suspicious_pages": sorted(
+            p["page"] for p in pages if p.get("flagging", {}).get("status") == "suspicious"
+        ),
+    })
+    return summary
+
+
+# 3. Orchestration
+
+def iter_pdf_analysis(pdf_path: Path, work_dir: Path = None, dpi: int = DPI,
+                      render_workers: int = RENDER_WORKERS, page_workers: int = PAGE_WORKERS):
+    """
+    Yield one result dict per page in completion order, then the document summary.
+    Pages are analysed as soon as they are rendered, so the first result does
+    not wait for the whole statement to be rasterised. At most render_workers
+    pages of this document are queued on the shared render pool at a time.
+    """
+    pdf_path = Path(pdf_path)
+    own_dir = work_dir is None
+    work_dir = Path(work_dir or tempfile.mkdtemp(prefix="uwezo_pdf_"))
+
+    procs = render_pool()
+    threads = ThreadPoolExecutor(max_workers=max(1, page_workers))
+    tags, pending = {}, set()
+    try:
+        to_render = iter(range(page_count(pdf_path)))
+
+        def render_next():
+            i = next(to_render, None)
+            if i is not None:
+                fut = procs.submit(render_and_ocr_page, pdf_path, i, work_dir, dpi)
+                tags[fut] = ("render", i)
+                pending.add(fut)
+
+        for _ in range(max(1, render_workers)):
+            render_next()
+
+        pages = []
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            pending -= done
+            for fut in done:
+                kind, i = tags.pop(fut)
+                if kind == "render":
+                    render_next()
+                    try:
+                        img, ocr = fut.result()
+                    except BrokenProcessPool:
+                        discard_render_pool(procs)
+                        raise
+                    except Exception as e:
+                        page = {"type": "page", "page": i + 1, "error": str(e)}
+                        pages.append(page)
+                        yield page
+                        continue
+                    nxt = threads.submit(analyze_page, i, img, ocr)
+                    tags[nxt] = ("page", i)
+                    pending.add(nxt)
+                else:
+                    page = fut.result()
+                    pages.append(page)
+                    yield page
+
+        yield document_summary(pages)
+    finally:
+        # e.g. the client went away: drop queued pages, and let the ones already
+        # rendering or being analysed finish before their files are deleted
+        for fut in pending:
+            fut.cancel()
+        wait(pending)
+        threads.shutdown(wait=True)
+        if own_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def analyze_pdf(pdf_path: Path, **kwargs) -> dict:
+    """Non-streaming variant: all pages (in page order) plus the summary."""
+    items = list(iter_pdf_analysis(pdf_path, **kwargs))
+    return {
+        "pages": sorted(items[:-1], key=lambda p: p["page"]),
+        "flagging": items[-1],
+    }
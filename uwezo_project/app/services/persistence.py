@@ -0,0 +1,142 @@
+# app/services/persistence.py
+"""
+Writes analysis results to the extractedfields, cases and authenticitychecks
+tables. Each batch of documents is one transaction: earlier field and
+authenticity rows for the same uploads are deleted, the new rows go in as
+one executemany INSERT per table, and the uploads are marked processed.
+Case rows are updated in place (one executemany UPDATE) when the upload
+already has one, since evidence bundles and decision labels reference them.
+Error results leave the upload's earlier rows alone. No ORM objects are
+built and nothing is refreshed.
+
+    persist_result(db, upload_id, result)          one document
+    persist_results(db, [(upload_id, result), ...]) bulk runs, BATCH_DOCS per commit
+"""
+
+import json
+import os
+from itertools import islice
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+from .. import models
+
+BATCH_DOCS = int(os.getenv("UWEZO_PERSIST_BATCH_DOCS", "100"))
+
+
+def _pages(result: dict) -> list:
+    # PDFs come back as {"pages": [...], "flagging": summary}; images as a single page
+    if "pages" in result:
+        return [p for p in result["pages"] if "fields" in p]
+    return [result] if "fields" in result else []
+
+
+def _text(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, default=str)
+
+
+def document_rows(upload_id: int, result: dict):
+    """
+    (field rows, case row, authenticity row) for one analysis result, as
+    plain dicts ready for executemany. Error results produce no rows.
+    """
+    if not isinstance(result, dict) or "error" in result or "flagging" not in result:
+        return [], None, None
+
+    fields = [
+        {"upload_id": upload_id, "field_name": name, "field_value": _text(value), "masked": False}
+        for page in _pages(result)
+        for name, value in page["fields"].items()
+    ]
+
+    flagging = result["flagging"]
+    numeric = flagging.get("numeric_check") or {}
+    tamper = flagging.get("tamper_check") or {}
+    risk = float(flagging.get("risk_score", 0.0))
+    suspicious = flagging.get("status") == "suspicious"
+    case_row = {
+        "upload_id": upload_id,
+        "template_type": "pdf" if "pages" in result else "image",
+        "error_rate": round(1.0 - float(numeric.get("consistency_score", 1.0)), 4),
+        "confidence_score": risk,
+        "flagged": suspicious,
+    }
+    issues = [r for r in (numeric.get("reason"), tamper.get("reason")) if r]
+    check_row = {
+        "upload_id": upload_id,
+        "metadata_sane": numeric.get("status") != "suspicious",
+        "compression_issues": tamper.get("status") == "suspicious",
+        "cross_page_consistency": not flagging.get("suspicious_pages") if "pages" in result else None,
+        "trust_score": round(1.0 - risk, 4),
+        "issues_found": "; ".join(issues) or None,
+        "action_taken": "flagged" if suspicious else "approved",
+    }
+    return fields, case_row, check_row
+
+
+def _upsert_cases(db: Session, cases):
+    existing = set(db.scalars(
+        select(models.Case.upload_id).where(models.Case.upload_id.in_([c["upload_id"] for c in cases]))
+    ))
+    updates = [
+        {"b_upload_id": c["upload_id"], **{k: v for k, v in c.items() if k != "upload_id"}}
+        for c in cases if c["upload_id"] in existing
+    ]
+    if updates:
+        table = models.Case.__table__
+        db.execute(table.update().where(table.c.upload_id == bindparam("b_upload_id")), updates)
+    inserts = [c for c in cases if c["upload_id"] not in existing]
+    if inserts:
+        db.execute(insert(models.Case), inserts)
+
+
+def _write_batch(db: Session, batch):
+    upload_ids = [upload_id for upload_id, _ in batch]
+    fields, cases, checks = [], [], []
+    for upload_id, result in batch:
+        f, c, a = document_rows(upload_id, result)
+        fields.extend(f)
+        if c is not None:
+            cases.append(c)
+            checks.append(a)
+
+    try:
+        if cases:
+            # re-analysis (job retries, re-uploads) replaces the previous rows
+            analysed = [c["upload_id"] for c in cases]
+            for model in (models.ExtractedField, models.AuthenticityCheck):
+                db.execute(delete(model).where(model.upload_id.in_(analysed)))
+            _upsert_cases(db, cases)
+        if fields:
+            db.execute(insert(models.ExtractedField), fields)
+        if checks:
+            db.execute(insert(models.AuthenticityCheck), checks)
+        db.execute(
+            update(models.Upload).where(models.Upload.id.in_(upload_ids)).values(processed=True),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(fields) + len(cases) + len(checks)
+
+
+def persist_results(db: Session, items, batch_docs: int = BATCH_DOCS) -> int:
+    """
+    Persist (upload_id, result) pairs, committing every batch_docs documents.
+    items may be a generator, so bulk runs never hold more than one batch.
+    Returns the number of rows inserted.
+    """
+    items = iter(items)
+    written = 0
+    while True:
+        batch = list(islice(items, max(1, batch_docs)))
+        if not batch:
+            return written
+        written += _write_batch(db, batch)
+
+
+def persist_result(db: Session, upload_id: int, result: dict) -> int:
+    return _write_batch(db, [(upload_id, result)])
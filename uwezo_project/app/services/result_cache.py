@@ -0,0 +1,118 @@
+# app/services/result_cache.py
+"""
+Extraction + flagging results keyed on (upload SHA-256, model version).
+Rows persist in the resultcache table; a bounded in-memory LRU sits in front
+so repeat submissions to the same worker skip the database as well.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .. import models
+
+MEMORY_ENTRIES = int(os.getenv("UWEZO_RESULT_CACHE_SIZE", "1024"))
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = MEMORY_ENTRIES):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard_if(self, predicate):
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+
+_memory = LRUCache()
+
+
+def current_model_version() -> str:
+    from src.layout_inference import model_version
+    return model_version()
+
+
+def get_cached_result(db: Session, content_hash: str, version: str = None):
+    version = version or current_model_version()
+    key = (content_hash, version)
+    hit = _memory.get(key)
+    if hit is not None:
+        return hit
+    row = (
+        db.query(models.ResultCache)
+        .filter(models.ResultCache.content_hash == content_hash,
+                models.ResultCache.model_version == version)
+        .first()
+    )
+    if row is None:
+        return None
+    result = json.loads(row.result)
+    _memory.put(key, result)
+    return result
+
+
+def store_result(db: Session, content_hash: str, result: dict, version: str = None):
+    """Cache a successful result; error payloads are never cached."""
+    if not isinstance(result, dict) or "error" in result:
+        return
+    version = version or current_model_version()
+    db.add(models.ResultCache(
+        content_hash=content_hash,
+        model_version=version,
+        result=json.dumps(result, default=str),
+        created_at=datetime.utcnow(),
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        # a concurrent request stored the same entry first
+        db.rollback()
+    _memory.put((content_hash, version), json.loads(json.dumps(result, default=str)))
+
+
+def purge_stale(db: Session, version: str = None) -> int:
+    """Drop entries produced by any other model version; current ones are kept."""
+    version = version or current_model_version()
+    deleted = (
+        db.query(models.ResultCache)
+        .filter(models.ResultCache.model_version != version)
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    _memory.discard_if(lambda key: key[1] != version)
+    return deleted
+
+
+def analyze_cached(db: Session, content_hash: str, file_path: str):
+    """
+    Return (result, cached). Runs extract_with_ai only on a cache miss.
+    """
+    from .extraction import extract_with_ai
+
+    cached = get_cached_result(db, content_hash)
+    if cached is not None:
+        return cached, True
+    result = extract_with_ai(file_path)
+    store_result(db, content_hash, result)
+    return result, False
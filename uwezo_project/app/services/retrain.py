@@ -1,38 +1,190 @@
-import sqlite3, joblib, os
+import glob, json, os, shutil
 from datetime import datetime
-from src.preprocessing import preprocess_for_training
-from src.training import train_model
-from src.evaluation import evaluate_model
+from pathlib import Path
+from sqlalchemy import select
+from app import models
+from app.database import engine
+from src.retrain_data import ShardStore, fields_fingerprint, label_words
 
-DB_PATH = "uwezo_statements.db"
 MODEL_DIR = "models"
-MODEL_PATH = os.path.join(MODEL_DIR, "uwezo_latest.pt")
+RUNS_DIR = os.path.join(MODEL_DIR, "layoutlmv3_runs")
+# the checkpoint src.layout_inference serves
+MODEL_PATH = os.path.join(RUNS_DIR, "checkpoint-best")
 MIN_F1 = 0.9
+# fine-tune the served checkpoint on new pages instead of starting from the base model
+WARM_START = os.getenv("UWEZO_RETRAIN_WARM_START", "1") == "1"
+# every Nth retrain is a full one, so warm starts do not drift for ever (0: never)
+FULL_EVERY = int(os.getenv("UWEZO_RETRAIN_FULL_EVERY", "10"))
+# a reviewed document becomes training pages only if at least this share of
+# its fields is found in the re-OCR'd text; otherwise its labels are unreliable
+MIN_FIELD_MATCH = float(os.getenv("UWEZO_RETRAIN_MIN_FIELD_MATCH", "0.5"))
+
+def ocr_document(file_path: str, out_dir: Path) -> list:
+    """(image, OCR JSON) per page of a stored upload; PDFs are rendered into out_dir first."""
+    from app.services.pdf_pipeline import ocr_page, page_count, render_and_ocr_page
+
+    path, out_dir = Path(file_path), Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".pdf":
+        return [render_and_ocr_page(path, i, out_dir) for i in range(page_count(path))]
+    return [(path, ocr_page(path, out_dir / "page_001.json"))]
+
+def document_pages(upload_id: int, file_path: str, fields: dict, out_dir: Path):
+    """
+    Training pages (src.retrain_data.PAGE_SCHEMA rows) for one reviewed
+    document: its pages are OCR'd again and the words spelling out each
+    reviewed field value are labelled. Returns (rows, fields matched,
+    fields known to the model).
+    """
+    from src.preprocessing import CLASSES, boxes_1000, file_fingerprint, label2id
+
+    known = {name: values for name, values in fields.items() if name in CLASSES}
+    rows, matched = [], set()
+    for image_path, ocr_json in ocr_document(file_path, out_dir):
+        data = json.loads(Path(ocr_json).read_text())
+        words = [w for w in data["words"] if w.get("text", "").strip()]
+        tags, found = label_words([w["text"] for w in words], known)
+        matched |= found
+        rows.append({
+            "image_path": str(image_path),
+            "words": [w["text"] for w in words],
+            "boxes": boxes_1000(words, data["width"], data["height"]),
+            "labels": [label2id[t] for t in tags],
+            "ocr_path": str(ocr_json),
+            "ocr_fp": file_fingerprint(ocr_json),
+            "label_path": f"review:{upload_id}",
+            "label_fp": fields_fingerprint(known),
+        })
+    return rows, matched, set(known)
+
+def build_reviewed_pages(store: ShardStore, report=None) -> dict:
+    """
+    Turn the documents of the shards added since the last run into training
+    pages in store.pages_path. Documents whose file is gone, whose OCR fails
+    or whose fields mostly cannot be found again are skipped. report(**fields)
+    gets per-document progress; returning False stops without storing anything.
+    """
+    docs = store.pending_documents()
+    stats = {"documents": 0, "skipped_documents": 0, "pages": 0}
+    if docs:
+        with engine.connect() as conn:
+            paths = dict(conn.execute(
+                select(models.Upload.id, models.Upload.file_path).where(models.Upload.id.in_(list(docs)))
+            ).all())
+    rows = []
+    for n, (upload_id, fields) in enumerate(docs.items()):
+        if report and report(stage="preparing pages", documents_done=n, documents=len(docs)) is False:
+            return stats
+        out_dir = store.page_dir / str(upload_id)
+        try:
+            if not paths.get(upload_id) or not os.path.exists(paths[upload_id]):
+                raise FileNotFoundError(f"stored file {paths.get(upload_id)!r} not found")
+            pages, matched, known = document_pages(upload_id, paths[upload_id], fields, out_dir)
+            if not known or len(matched) / len(known) < MIN_FIELD_MATCH:
+                raise ValueError(f"{len(matched)}/{len(known)} reviewed fields found in the OCR text")
+        except Exception as e:
+            print(f"[retrain data] upload {upload_id} skipped: {e}")
+            shutil.rmtree(out_dir, ignore_errors=True)
+            stats["skipped_documents"] += 1
+            continue
+        rows.extend(pages)
+        stats["documents"] += 1
+    stats["pages"] = len(rows)
+    stats["total_pages"] = store.add_pages(rows, docs)
+    return stats
+
+def load_training_data(store: ShardStore = None, report=None) -> dict:
+    """
+    Append the fields of documents reviewed since the last retrain to the
+    shard store (only new rows are read from the database) and turn those
+    documents into training pages; returns row and page counts.
+    """
+    store = store or ShardStore()
+    new_rows = store.append(engine)
+    return {"new_rows": new_rows, **build_reviewed_pages(store, report)}
+
+def promote_checkpoint(checkpoint: str, target: str = MODEL_PATH, keep: int = 2):
+    """
+    Make checkpoint the served model. target is a symlink to a versioned copy
+    (<target>-<stamp>) and is swapped with one rename, so a reader sees the
+    old or the new checkpoint, never neither; serving processes notice the
+    new link target on their next prediction and reload (see
+    src.layout_inference.checkpoint_key). The newest keep versions are kept.
+    """
+    version = f"{target}-{datetime.utcnow():%Y%m%dT%H%M%S%f}"
+    shutil.copytree(checkpoint, version + ".tmp")
+    os.replace(version + ".tmp", version)
+    if os.path.isdir(target) and not os.path.islink(target):
+        # served from before versioning: keep it as the oldest version
+        os.replace(target, f"{target}-{datetime.utcfromtimestamp(os.path.getmtime(target)):%Y%m%dT%H%M%S%f}")
+    link = target + ".link"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(version), link)
+    os.replace(link, target)
+    versions = sorted(p for p in glob.glob(target + "-*") if not p.endswith(".tmp"))
+    for old in versions[:-keep]:
+        shutil.rmtree(old, ignore_errors=True)
+
+def use_warm_start(store: ShardStore) -> bool:
+    """Warm start when the served checkpoint records its training pages and no full run is due."""
+    from src.train import META_FILE
+
+    if not WARM_START or not os.path.exists(os.path.join(MODEL_PATH, META_FILE)):
+        return False
+    return not FULL_EVERY or (len(store.manifest()["models"]) + 1) % FULL_EVERY != 0
+
+def retrain_model(progress=None, warm_start: bool = None):
+    """
+    Fine-tune LayoutLMv3 and promote the best checkpoint if it reaches
+    MIN_F1. progress(**fields) receives stage / epoch / step / F1 updates;
+    returning False cancels the run (nothing is promoted). warm_start=None
+    picks warm or full via use_warm_start().
+    """
+    cancelled = []
+
+    def report(**fields):
+        keep_going = progress(**fields) if progress else True
+        if keep_going is False:
+            cancelled.append(True)
+        return keep_going
 
-def load_training_data():
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute("""SELECT field_name, field_value FROM ExtractedFields e
-                   JOIN Uploads u ON e.upload_id = u.id
-                   WHERE u.processed = 1""")
-    data = cur.fetchall()
-    conn.close()
-    return preprocess_for_training(data)
-
-def retrain_model():
     os.makedirs(MODEL_DIR, exist_ok=True)
     try:
-        X, y = load_training_data()
-        model = train_model(X, y)
-        scores = evaluate_model(model, X, y)
-        if scores["f1"] >= MIN_F1:
-            joblib.dump(model, MODEL_PATH)
-            msg = f"Model retrained successfully. New F1={scores['f1']:.3f}"
+        from src.train import ProgressCallback, train  # the training stack loads only here
+
+        store = ShardStore()
+        report(stage="loading data")
+        data = load_training_data(store, report)
+        if cancelled:
+            return {"success": False, "cancelled": True, "f1": None, "message": "Retraining cancelled."}
+        if warm_start is None:
+            warm_start = use_warm_start(store)
+        report(stage="training", warm_start=warm_start, **data)
+        output_dir = os.path.join(RUNS_DIR, f"retrain-{datetime.utcnow():%Y%m%dT%H%M%S}")
+        # reviewed documents join the train split; a warm start sees them as its new pages
+        result = train(output_dir=output_dir, warm_start=warm_start, base_checkpoint=MODEL_PATH,
+                       extra_train=[store.pages_path],
+                       callbacks=[ProgressCallback(lambda **f: report(**{"stage": "training", **f}))])
+        result["reviewed_data"] = data
+        if result.get("skipped"):
+            msg = f"Retrain skipped. {result['message']}."
+            print(msg)
+            return {"success": False, "skipped": True, "f1": None, "message": msg, "report": result}
+        f1 = result["f1"]
+        if cancelled:
+            msg = "Retraining cancelled."
+            print(msg)
+            return {"success": False, "cancelled": True, "f1": f1, "message": msg, "report": result}
+        if f1 is not None and f1 >= MIN_F1 and result["best_checkpoint"]:
+            promote_checkpoint(result["best_checkpoint"])
+            store.record_model(f"{os.path.basename(output_dir)}@{datetime.utcnow():%Y%m%dT%H%M%S}")
+            msg = f"Model retrained successfully. New F1={f1:.3f}"
             print(msg)
-            return {"success": True, "f1": scores["f1"], "message": msg}
-        msg = f"Retrain skipped. F1={scores['f1']:.3f}"
+            return {"success": True, "f1": f1, "message": msg, "report": result}
+        msg = f"Retrain skipped. F1={f1:.3f}" if f1 is not None else "Retrain skipped. No F1 reported."
         print(msg)
-        return {"success": False, "f1": scores["f1"], "message": msg}
+        return {"success": False, "f1": f1, "message": msg, "report": result}
     except Exception as e:
         msg = f"Retraining failed: {e}"
         print(msg)
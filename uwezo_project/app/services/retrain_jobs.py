@@ -0,0 +1,209 @@
+# app/services/retrain_jobs.py
+"""
+Retraining as a background job. POST /trigger-retrain records a jobs row
+(kind="retrain") and starts `python -m app.retrain_worker <job_id>` as a
+separate, lower-priority process with its own thread budget, so training
+never runs on a web worker. The worker writes progress into the job row;
+cancellation is a status flag the worker picks up at its next progress
+write and acts on at the end of the current training step.
+
+Only one retrain runs at a time: the worker holds an exclusive lock on
+RETRAIN_LOCK for the whole run, and a new job is refused while another one
+is active.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from .. import models
+
+RETRAIN_LOCK = os.getenv("UWEZO_RETRAIN_LOCK", os.path.join("models", "retrain.lock"))
+RETRAIN_THREADS = int(os.getenv("UWEZO_RETRAIN_THREADS", str(max(1, (os.cpu_count() or 2) // 2))))
+RETRAIN_NICE = int(os.getenv("UWEZO_RETRAIN_NICE", "10"))
+PROGRESS_EVERY = float(os.getenv("UWEZO_RETRAIN_PROGRESS_S", "2.0"))
+LAUNCH_GRACE = 60  # seconds a queued job may wait for its worker to take the lock
+ACTIVE = ("queued", "running", "cancelling")
+
+
+class RetrainBusy(Exception):
+    def __init__(self, job):
+        super().__init__(f"Retrain job {job.id} is already {job.status}")
+        self.job = job
+
+
+def _lock_file():
+    os.makedirs(os.path.dirname(RETRAIN_LOCK) or ".", exist_ok=True)
+    return open(RETRAIN_LOCK, "a+")
+
+
+def acquire_lock():
+    """Exclusive, non-blocking run lock; returns the open file or None if held."""
+    import fcntl
+
+    f = _lock_file()
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+
+def lock_held() -> bool:
+    f = acquire_lock()
+    if f is None:
+        return True
+    f.close()
+    return False
+
+
+def active_retrain(db: Session):
+    return (
+        db.query(models.Job)
+        .filter(models.Job.kind == "retrain", models.Job.status.in_(ACTIVE))
+        .order_by(models.Job.id.desc())
+        .first()
+    )
+
+
+def job_state(job) -> dict:
+    return json.loads(job.result) if job.result else {}
+
+
+def _set_state(job, **updates):
+    state = job_state(job)
+    state.update(updates)
+    job.result = json.dumps(state, default=str)
+
+
+def start_retrain(db: Session, spawn: bool = True, trigger: dict = None):
+    """
+    Queue a retrain job and launch its worker process. Raises RetrainBusy
+    while another retrain is queued or running. The job records the newest
+    review id at start ("reviews_upto"), so the scheduler knows which
+    retrain requests this run covers.
+    """
+    job = active_retrain(db)
+    if job is not None:
+        launching = job.status == "queued" and (datetime.utcnow() - job.created_at).total_seconds() < LAUNCH_GRACE
+        if launching or lock_held():
+            raise RetrainBusy(job)
+        # active in the table but nobody holds the lock: its worker died
+        job.status = "failed"
+        job.error = "Retrain worker exited without finishing"
+        job.finished_at = datetime.utcnow()
+        db.commit()
+
+    job = models.Job(kind="retrain", status="queued", attempts=0, created_at=datetime.utcnow())
+    upto = db.query(func.max(models.Review.id)).scalar() or 0
+    _set_state(job, trigger=trigger or {"reason": "manual"}, reviews_upto=upto)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    if spawn:
+        launch_worker(job.id)
+    return job
+
+
+def worker_env() -> dict:
+    env = dict(os.environ)
+    threads = str(RETRAIN_THREADS)
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "TOKENIZERS_PARALLELISM"):
+        env[var] = "false" if var == "TOKENIZERS_PARALLELISM" else threads
+    env["UWEZO_RETRAIN_THREADS"] = threads
+    return env
+
+
+def launch_worker(job_id: int):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "app.retrain_worker", str(job_id)],
+        env=worker_env(),
+        start_new_session=True,  # survives web worker restarts
+        preexec_fn=(lambda: os.nice(RETRAIN_NICE)) if RETRAIN_NICE else None,
+    )
+    # reap the child when it exits so it does not linger as a zombie
+    threading.Thread(target=proc.wait, name=f"retrain-{job_id}", daemon=True).start()
+    return proc
+
+
+def cancel_retrain(db: Session, job: models.Job):
+    if job.status == "queued":
+        job.status = "cancelled"
+        job.finished_at = datetime.utcnow()
+    elif job.status == "running":
+        job.status = "cancelling"
+    db.commit()
+    return job
+
+
+def finish_retrain(db: Session, job: models.Job, result: dict, cancelled: bool = False):
+    db.refresh(job)
+    _set_state(job, report=result)
+    job.finished_at = datetime.utcnow()
+    if result.get("cancelled") or cancelled:
+        job.status = "cancelled"
+    elif result.get("success") or result.get("skipped") or result.get("f1") is not None:
+        # a run that trained but missed MIN_F1, or had nothing new to learn, still completed
+        job.status = "done"
+    else:
+        job.status = "failed"
+        job.error = result.get("message")
+    db.commit()
+    return job
+
+
+class JobProgress:
+    """
+    progress(**fields) callback for retrain_model, run inside the worker.
+    Writes to the job row at most every PROGRESS_EVERY seconds, and on
+    every stage change (evaluations included), and returns False once a
+    cancel has been requested.
+    """
+
+    def __init__(self, db: Session, job: models.Job, every: float = PROGRESS_EVERY):
+        self.db = db
+        self.job = job
+        self.every = every
+        self._last = 0.0
+        self._stage = None
+        self.cancelled = False
+
+    def __call__(self, **fields):
+        now = time.monotonic()
+        stage = fields.get("stage")
+        if now - self._last < self.every and stage == self._stage:
+            return not self.cancelled
+        self._last, self._stage = now, stage
+        self.db.refresh(self.job)
+        if self.job.status == "cancelling":
+            self.cancelled = True
+        progress = dict(job_state(self.job).get("progress") or {})
+        progress.update({k: v for k, v in fields.items() if v is not None})
+        progress["updated_at"] = datetime.utcnow().isoformat()
+        _set_state(self.job, progress=progress)
+        self.db.commit()
+        return not self.cancelled
+
+
+def retrain_payload(job: models.Job) -> dict:
+    state = job_state(job)
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "trigger": state.get("trigger"),
+        "progress": state.get("progress"),
+        "error": job.error,
+    }
+
+
+def retrain_report(job: models.Job):
+    return job_state(job).get("report")
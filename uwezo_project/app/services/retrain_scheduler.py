@@ -0,0 +1,132 @@
+# app/services/retrain_scheduler.py
+"""
+Coalesces retrain requests into runs. A review with retrain_flag=True is a
+request; the reviews table is the queue. Requests newer than the last
+started run's "reviews_upto" are pending, and one run covers all of them.
+
+A run starts when, with at least one request pending and no retrain active,
+  - MIN_REQUESTS requests have accumulated, or
+  - the oldest pending request has waited MAX_WAIT, or
+  - the reviewer correction rate (share of reviews asking for a retrain)
+    over the last DRIFT_WINDOW reviews exceeds the rate over the
+    DRIFT_WINDOW reviews before the last run by DRIFT_THRESHOLD,
+and never sooner than MIN_SPACING after the previous run started.
+
+tick() is called on every retrain request (crud.queue_retrain_task) and
+periodically by the analysis worker, so time and drift triggers fire
+without new reviews.
+"""
+
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+from .. import models
+from .retrain_jobs import RetrainBusy, active_retrain, job_state, retrain_payload, start_retrain
+
+MIN_REQUESTS = int(os.getenv("UWEZO_RETRAIN_MIN_REQUESTS", "50"))
+MAX_WAIT = timedelta(hours=float(os.getenv("UWEZO_RETRAIN_MAX_WAIT_H", "24")))
+MIN_SPACING = timedelta(hours=float(os.getenv("UWEZO_RETRAIN_MIN_SPACING_H", "6")))
+DRIFT_WINDOW = int(os.getenv("UWEZO_RETRAIN_DRIFT_WINDOW", "200"))
+DRIFT_MIN_REVIEWS = int(os.getenv("UWEZO_RETRAIN_DRIFT_MIN_REVIEWS", "30"))
+DRIFT_THRESHOLD = float(os.getenv("UWEZO_RETRAIN_DRIFT", "0.10"))
+TICK_EVERY = float(os.getenv("UWEZO_RETRAIN_TICK_S", "60"))
+
+
+def last_run(db: Session):
+    """The most recent retrain that was not cancelled before it started."""
+    return (
+        db.query(models.Job)
+        .filter(models.Job.kind == "retrain",
+                ~((models.Job.status == "cancelled") & models.Job.started_at.is_(None)))
+        .order_by(models.Job.id.desc())
+        .first()
+    )
+
+
+def _covered_upto(db: Session) -> int:
+    # failed and cancelled runs did not consume their requests
+    job = (
+        db.query(models.Job)
+        .filter(models.Job.kind == "retrain", models.Job.status.in_(("queued", "running", "cancelling", "done")))
+        .order_by(models.Job.id.desc())
+        .first()
+    )
+    return job_state(job).get("reviews_upto", 0) if job is not None else 0
+
+
+def _correction_rate(db: Session, *conds):
+    # the DRIFT_WINDOW newest reviews matching conds (reviews.id is indexed)
+    R = models.Review
+    window = select(R.retrain_flag).where(*conds).order_by(R.id.desc()).limit(DRIFT_WINDOW).subquery()
+    n, flagged = db.execute(
+        select(func.count(), func.sum(case((window.c.retrain_flag.is_(True), 1), else_=0)))
+    ).one()
+    return (flagged or 0) / n if n >= DRIFT_MIN_REVIEWS else None, n
+
+
+def queue_state(db: Session, now: datetime = None) -> dict:
+    """Pending requests, trigger checks and whether a run is due."""
+    now = now or datetime.utcnow()
+    R = models.Review
+    upto = _covered_upto(db)
+    pending, oldest = db.execute(
+        select(func.count(), func.min(R.reviewed_at)).where(R.id > upto, R.retrain_flag.is_(True))
+    ).one()
+
+    recent, n_recent = _correction_rate(db, R.id > upto)
+    baseline, n_base = _correction_rate(db, R.id <= upto)
+    drift = recent - baseline if recent is not None and baseline is not None else None
+
+    previous = last_run(db)
+    active = active_retrain(db)
+    next_allowed = (previous.created_at + MIN_SPACING) if previous is not None else None
+
+    reasons = []
+    if pending >= MIN_REQUESTS:
+        reasons.append(f"{pending} requests >= {MIN_REQUESTS}")
+    if pending and oldest is not None and now - oldest >= MAX_WAIT:
+        reasons.append(f"oldest request waited {now - oldest}")
+    if pending and drift is not None and drift >= DRIFT_THRESHOLD:
+        reasons.append(f"correction rate {recent:.1%} vs {baseline:.1%} before the last run")
+
+    blocked = None
+    if active is not None:
+        blocked = f"retrain job {active.id} is {active.status}"
+    elif next_allowed is not None and now < next_allowed:
+        blocked = f"minimum spacing until {next_allowed.isoformat()}"
+
+    return {
+        "pending_requests": pending,
+        "oldest_request_at": oldest,
+        "covered_upto_review_id": upto,
+        "correction_rate": {"recent": recent, "recent_reviews": n_recent,
+                            "baseline": baseline, "baseline_reviews": n_base, "drift": drift},
+        "thresholds": {"min_requests": MIN_REQUESTS, "max_wait_h": MAX_WAIT.total_seconds() / 3600,
+                       "drift": DRIFT_THRESHOLD, "min_spacing_h": MIN_SPACING.total_seconds() / 3600},
+        "last_run": retrain_payload(previous) if previous is not None else None,
+        "next_run_allowed_at": next_allowed,
+        "triggers": reasons,
+        "blocked_by": blocked,
+        "due": bool(reasons) and blocked is None,
+    }
+
+
+def tick(db: Session, now: datetime = None, spawn: bool = True) -> dict:
+    """Start a coalesced retrain if one is due; returns the queue state."""
+    state = queue_state(db, now)
+    state["started_job_id"] = None
+    if not state["due"]:
+        return state
+    try:
+        job = start_retrain(db, spawn=spawn, trigger={
+            "reason": "scheduled", "triggers": state["triggers"],
+            "requests": state["pending_requests"],
+        })
+    except RetrainBusy as busy:
+        state["blocked_by"] = str(busy)
+        state["due"] = False
+        return state
+    print(f"[retrain scheduler] job {job.id} started: {'; '.join(state['triggers'])}")
+    state["started_job_id"] = job.id
+    return state
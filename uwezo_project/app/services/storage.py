@@ -0,0 +1,145 @@
+# app/services/storage.py
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import namedtuple
+from fastapi import HTTPException, UploadFile
+from .executor import run_io
+
+UPLOAD_DIR = os.getenv("UWEZO_UPLOAD_DIR", "uploads")
+OBJECT_DIR = os.path.join(UPLOAD_DIR, "objects")
+CHUNK_SIZE = 1024 * 1024
+MAX_FILE_BYTES = int(float(os.getenv("UWEZO_MAX_UPLOAD_MB", "50")) * 1024 * 1024)
+MAX_REQUEST_BYTES = int(float(os.getenv("UWEZO_MAX_REQUEST_MB", "60")) * 1024 * 1024)
+
+# content type -> (magic prefix, stored suffix)
+SIGNATURES = {
+    "application/pdf": (b"%PDF-", ".pdf"),
+    "image/png": (b"\x89PNG\r\n\x1a\n", ".png"),
+    "image/jpeg": (b"\xff\xd8\xff", ".jpg"),
+}
+DOCUMENT_TYPES = frozenset(SIGNATURES)
+
+StoredFile = namedtuple("StoredFile", ["content_hash", "path", "size", "content_type"])
+
+
+def object_path(content_hash: str, suffix: str = "") -> str:
+    """uploads/objects/ab/abcdef...<suffix>: identical content always maps to one file."""
+    return os.path.join(OBJECT_DIR, content_hash[:2], content_hash + suffix.lower())
+
+
+def sniff_type(head: bytes):
+    """Content type from the leading bytes, or None if unrecognised."""
+    for content_type, (magic, _) in SIGNATURES.items():
+        if head.startswith(magic):
+            return content_type
+    return None
+
+
+def _consume(digest, out, chunk: bytes):
+    digest.update(chunk)
+    out.write(chunk)
+
+
+async def save_upload(file: UploadFile, allowed_types=DOCUMENT_TYPES,
+                      max_bytes: int = MAX_FILE_BYTES) -> StoredFile:
+    """
+    Stream an upload to disk in CHUNK_SIZE chunks, hashing it (SHA-256) on
+    the way in, and store it content-addressed. Re-uploads of the same bytes
+    reuse the existing file. Memory use is one chunk, whatever the file size.
+
+    The type is taken from the magic bytes, not the client's Content-Type,
+    and must be in allowed_types (415); files over max_bytes are rejected
+    as soon as they cross it (413). allowed_types=None accepts anything and
+    keeps the client's file extension.
+    """
+    os.makedirs(OBJECT_DIR, exist_ok=True)
+    suffix = os.path.splitext(file.filename or "")[1]
+    content_type = None
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=OBJECT_DIR, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size == 0 and allowed_types is not None:
+                    content_type = sniff_type(chunk)
+                    if content_type not in allowed_types:
+                        raise HTTPException(
+                            status_code=415,
+                            detail=f"File type not supported; expected {', '.join(sorted(allowed_types))}."
+                        )
+                    suffix = SIGNATURES[content_type][1]
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit."
+                    )
+                await run_io(_consume, digest, out, chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty file.")
+        content_hash = digest.hexdigest()
+        path = object_path(content_hash, suffix)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return StoredFile(content_hash, path, size, content_type)
+
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware capping the whole request body at max_bytes, checked
+    against Content-Length up front and against the bytes actually received
+    for chunked requests, before the multipart parser spools anything.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_bytes <= 0:
+            return await self.app(scope, receive, send)
+
+        declared = dict(scope.get("headers") or []).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_bytes:
+            return await self._reject(send)
+
+        received = 0
+
+        async def limited_receive():
+            # raised while the body is being parsed, so FastAPI turns it into a 413
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail=self._detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    def _detail(self):
+        return f"Request exceeds the {self.max_bytes // (1024 * 1024)} MB limit."
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": self._detail()}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,31 @@
+# app/services/tasks.py
+"""
+Entry points for the CPU pool (services/executor.run_cpu). They are plain
+module-level functions so they pickle by reference (UWEZO_CPU_POOL=process),
+and they import the ML stack inside the call, so nothing loads torch or
+OpenCV until the first CPU stage runs.
+"""
+
+import os
+from pathlib import Path
+
+
+def extract_file(file_path: str) -> dict:
+    from .extraction import extract_with_ai
+    return extract_with_ai(file_path)
+
+
+def flag_document(image_path: str, ocr_json_path: str) -> dict:
+    from .flagging_service import analyze_document
+    return analyze_document(Path(image_path), Path(ocr_json_path))
+
+
+def extract_statement(pdf_path: str) -> dict:
+    from ..extraction import extract_bank_statement
+    return extract_bank_statement(pdf_path)
+
+
+def warm_worker():
+    """Load the model in this pool worker; returns (pid, timings)."""
+    from .warmup import warm_local
+    return os.getpid(), warm_local()
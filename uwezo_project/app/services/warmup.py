@@ -0,0 +1,89 @@
+# app/services/warmup.py
+"""
+Deferred loading of the ML stack. The web process starts without torch,
+transformers, OpenCV or sklearn; they are loaded on the first request that
+needs them, or ahead of time through warm_up() (POST /health/warmup, or
+UWEZO_WARMUP_ON_STARTUP=1 to run it in the background at startup). With the
+process CPU pool (services/executor.py) it is the pool workers that load them.
+"""
+
+import os
+import sys
+import threading
+import time
+
+from . import executor, tasks
+
+WARMUP_ON_STARTUP = os.getenv("UWEZO_WARMUP_ON_STARTUP", "0") == "1"
+
+_lock = threading.Lock()
+_state = {"status": "cold", "timings": {}, "error": None}
+
+
+def model_loaded() -> bool:
+    # checked through sys.modules so asking never imports torch
+    mod = sys.modules.get("src.layout_inference")
+    return mod is not None and mod.is_model_loaded()
+
+
+def warm_local() -> dict:
+    """Import the flagging stack, load the model and run one forward pass in this process."""
+    timings = {}
+    t0 = time.perf_counter()
+    import src.flagging  # noqa: F401  (cv2, sklearn, pandas)
+    timings["flagging_import_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    from src.inference_engine import get_engine
+    from src.layout_inference import warm_up as warm_model
+    get_engine().start()
+    timings["model_load_s"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    warm_model()
+    timings["first_forward_s"] = time.perf_counter() - t0
+    return timings
+
+
+def warm_up() -> dict:
+    """
+    Warm wherever CPU stages run: every worker of the process pool
+    (UWEZO_CPU_POOL=process), otherwise this process. Concurrent callers
+    wait for the first one; later calls return immediately.
+    """
+    with _lock:
+        if _state["status"] == "ready":
+            return status()
+        _state.update(status="warming", error=None)
+        t0 = time.perf_counter()
+        try:
+            if executor.CPU_POOL == "process":
+                pool = executor.cpu_pool()
+                futures = [pool.submit(tasks.warm_worker) for _ in range(executor.CPU_WORKERS)]
+                results = [f.result() for f in futures]
+                timings = {k: max(r[1][k] for r in results) for k in results[0][1]}
+                timings["workers_warmed"] = len({pid for pid, _ in results})
+            else:
+                timings = warm_local()
+        except Exception as e:
+            _state.update(status="failed", error=str(e), timings={})
+            return status()
+        timings["total_s"] = time.perf_counter() - t0
+        _state.update(status="ready", timings={k: round(v, 3) for k, v in timings.items()})
+    return status()
+
+
+def warm_up_in_background() -> threading.Thread:
+    t = threading.Thread(target=warm_up, name="uwezo-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def status() -> dict:
+    return {
+        "status": _state["status"],
+        "cpu_pool": executor.CPU_POOL,
+        "model_loaded": model_loaded(),
+        "timings": dict(_state["timings"]),
+        "error": _state["error"],
+    }
@@ -0,0 +1,81 @@
+# app/worker.py
+"""
+Analysis job workers. Scale these independently of the web processes:
+
+    python -m app.worker --workers 4
+"""
+
+import argparse
+import multiprocessing as mp
+import time
+
+from .database import SessionLocal
+from .services.jobs import claim_next_job, requeue_stale_jobs, run_job, worker_name
+from .services.result_cache import purge_stale
+from .services.retrain_scheduler import TICK_EVERY, tick as retrain_tick
+
+POLL_INTERVAL = 1.0
+STALE_CHECK_EVERY = 60.0
+
+
+def worker_loop(index: int = 0, poll_interval: float = POLL_INTERVAL, stop_event=None):
+    wid = worker_name(index)
+    print(f"[worker {wid}] started")
+    last_stale_check = last_tick = 0.0
+    db = SessionLocal()
+    try:
+        while stop_event is None or not stop_event.is_set():
+            if time.monotonic() - last_stale_check > STALE_CHECK_EVERY:
+                requeue_stale_jobs(db)
+                last_stale_check = time.monotonic()
+            # worker 0 drives the time- and drift-based retrain triggers
+            if index == 0 and time.monotonic() - last_tick > TICK_EVERY:
+                retrain_tick(db)
+                last_tick = time.monotonic()
+
+            job = claim_next_job(db, wid)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            print(f"[worker {wid}] job {job.id} started")
+            job = run_job(db, job)
+            print(f"[worker {wid}] job {job.id} {job.status}")
+    finally:
+        db.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Drain the analysis job queue")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    args = ap.parse_args()
+
+    db = SessionLocal()
+    try:
+        # a new model version makes older cached results unreachable; drop them
+        print(f"[worker] purged {purge_stale(db)} stale cached results")
+    finally:
+        db.close()
+
+    if args.workers == 1:
+        worker_loop(0, args.poll_interval)
+        return
+
+    stop = mp.Event()
+    procs = [
+        mp.Process(target=worker_loop, args=(i, args.poll_interval, stop), daemon=False)
+        for i in range(args.workers)
+    ]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        stop.set()
+        for p in procs:
+            p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_audit_sink.py
+"""
+POST /upload/ latency (which writes an audit row per request) with the
+audit sink in sync mode (one INSERT + commit per request, the old
+crud.create_audit pattern) and in buffered mode.
+
+Uses a temporary SQLite file unless --database-url is given; on Postgres
+the gap grows with the commit round trip.
+
+Run from uwezo_project/:
+    python -m benchmarks.bench_audit_sink [--requests 300] [--database-url ...]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="uwezo_audit_")
+os.environ.setdefault("UWEZO_UPLOAD_DIR", os.path.join(_tmp, "uploads"))
+if "--database-url" in sys.argv:
+    os.environ["DATABASE_URL"] = sys.argv[sys.argv.index("--database-url") + 1]
+else:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'audit.db')}"
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from app import models  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import audit  # noqa: E402
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 2048
+
+
+def run(client, mode, n):
+    sink = audit.get_sink()
+    sink.mode = mode
+    latencies = []
+    for i in range(n):
+        body = PNG + i.to_bytes(4, "big")  # distinct content per request
+        t0 = time.perf_counter()
+        r = client.post("/upload/", data={"user_id": "1"}, files={"file": (f"p{i}.png", body, "image/png")})
+        latencies.append((time.perf_counter() - t0) * 1000)
+        r.raise_for_status()
+    t0 = time.perf_counter()
+    sink.flush()
+    drain = (time.perf_counter() - t0) * 1000
+    latencies.sort()
+    print(f"{mode:9s} p50 {statistics.median(latencies):7.2f}ms  "
+          f"p95 {latencies[int(0.95 * len(latencies)) - 1]:7.2f}ms  "
+          f"mean {statistics.fmean(latencies):7.2f}ms  final flush {drain:6.1f}ms")
+    return statistics.median(latencies)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--database-url", default=None)
+    args = ap.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    db.merge(models.User(id=1, username="bench", role="analyst"))
+    db.commit()
+
+    with TestClient(app) as client:
+        run(client, "buffered", 20)  # warm-up
+        sync = run(client, "sync", args.requests)
+        buffered = run(client, "buffered", args.requests)
+
+    rows = db.scalar(select(func.count()).select_from(models.AuditTrail))
+    db.close()
+    print(f"p50 saved per request: {sync - buffered:.2f}ms; {rows} audit rows written "
+          f"(expected {2 * args.requests + 20})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/bench_bulk_persistence.py
+"""
+Rows/sec writing analysis results (extracted fields, case, authenticity
+check) three ways:
+
+    per_row   db.add + commit + refresh for every row (crud-style helpers)
+    per_doc   persistence.persist_result, one transaction per document
+    bulk      persistence.persist_results, BATCH_DOCS documents per transaction
+
+Uses a temporary SQLite file unless --database-url is given.
+
+Run from uwezo_project/:
+    python -m benchmarks.bench_bulk_persistence [--docs 500] [--pages 3] [--database-url ...]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.mkdtemp(prefix="uwezo_persist_")
+if "--database-url" not in sys.argv:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'persist.db')}"
+else:
+    os.environ["DATABASE_URL"] = sys.argv[sys.argv.index("--database-url") + 1]
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app import models  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.services import persistence  # noqa: E402
+
+FIELD_NAMES = ["bank_name", "account_number", "account_name", "statement_period",
+               "opening_balance", "closing_balance", "total_credits", "total_debits"]
+
+
+def fake_result(rng, pages: int) -> dict:
+    page_results = []
+    for p in range(pages):
+        fields = {name: str(rng.randint(0, 10**6)) for name in FIELD_NAMES}
+        fields["table_transactions_data"] = [round(rng.uniform(-500, 500), 2) for _ in range(20)]
+        page_results.append({"type": "page", "page": p + 1, "fields": fields,
+                             "flagging": {"risk_score": 0.2, "status": "approved"}})
+    risk = round(rng.random(), 3)
+    return {
+        "pages": page_results,
+        "flagging": {
+            "type": "document", "risk_score": risk, "status": "suspicious" if risk > 0.75 else "approved",
+            "numeric_check": {"consistency_score": rng.random(), "status": "ok", "reason": ""},
+            "tamper_check": {"tamper_score": rng.random(), "status": "ok", "reason": ""},
+            "pages": pages, "failed_pages": [], "suspicious_pages": [],
+        },
+    }
+
+
+def per_row(db, upload_id, result):
+    # what hand-written persistence through crud-style helpers costs
+    fields, case_row, check_row = persistence.document_rows(upload_id, result)
+    rows = [models.ExtractedField(**f) for f in fields]
+    if case_row is not None:
+        rows += [models.Case(**case_row), models.AuthenticityCheck(**check_row)]
+    for row in rows:
+        db.add(row)
+        db.commit()
+        db.refresh(row)
+    return len(rows)
+
+
+def make_uploads(db, n):
+    db.execute(models.Upload.__table__.insert(), [
+        {"filename": f"s{i}.pdf", "processed": False, "processing_purpose": "analyze"} for i in range(n)
+    ])
+    db.commit()
+    return db.scalars(select(models.Upload.id).order_by(models.Upload.id.desc()).limit(n)).all()[::-1]
+
+
+def run(name, fn, docs):
+    db = SessionLocal()
+    try:
+        ids = make_uploads(db, len(docs))
+        t0 = time.perf_counter()
+        rows = fn(db, list(zip(ids, docs)))
+        elapsed = time.perf_counter() - t0
+        stored = db.scalar(select(func.count()).select_from(models.ExtractedField)
+                           .where(models.ExtractedField.upload_id.in_(ids)))
+    finally:
+        db.close()
+    print(f"{name:8s} {rows:8d} rows  {elapsed:8.2f}s  {rows / elapsed:10.0f} rows/s  ({stored} field rows stored)")
+    return rows / elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=500)
+    ap.add_argument("--pages", type=int, default=3)
+    ap.add_argument("--batch-docs", type=int, default=persistence.BATCH_DOCS)
+    ap.add_argument("--database-url", default=None)
+    args = ap.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    rng = random.Random(0)
+    docs = [fake_result(rng, args.pages) for _ in range(args.docs)]
+    print(f"{args.docs} documents x {args.pages} pages on {engine.url.get_backend_name()}")
+
+    base = run("per_row", lambda db, items: sum(per_row(db, u, r) for u, r in items), docs)
+    doc = run("per_doc", lambda db, items: sum(persistence.persist_result(db, u, r) for u, r in items), docs)
+    bulk = run("bulk", lambda db, items: persistence.persist_results(db, items, args.batch_docs), docs)
+    print(f"speedup vs per_row: per_doc {doc / base:.1f}x, bulk {bulk / base:.1f}x")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# benchmarks/bench_dynamic_padding.py
+"""
+Padded (512 tokens, 2 pages/batch) vs dynamic-padding, token-budget training.
+
+Always reports, from the encoded train split, the tokens the model processes
+per epoch in each mode (text + VISUAL_TOKENS image patches per page) and
+the batch count. With --steps N it also trains N steps in each mode from
+the base checkpoint and reports measured tokens/sec and the projected epoch
+time.
+
+Run from uwezo_project/:
+    python -m benchmarks.bench_dynamic_padding [--steps 20] [--token-budget 1418]
+"""
+
+import argparse
+import tempfile
+
+from src.dynamic_batching import TOKEN_BUDGET, VISUAL_TOKENS, make_trainer, padded_length, token_budget_batches
+from src.preprocessing import MAX_LENGTH, PROCESSOR_NAME, get_dataset
+
+PADDED_BATCH = 2
+
+
+def epoch_cost(lengths, token_budget):
+    n = len(lengths)
+    padded = n * (MAX_LENGTH + VISUAL_TOKENS)
+    batches = token_budget_batches(lengths, token_budget)
+    dynamic = sum(len(b) * (padded_length(max(lengths[i] for i in b)) + VISUAL_TOKENS) for b in batches)
+    return {
+        "pages": n,
+        "real_text_tokens": int(sum(lengths)),
+        "padded": {"batches": -(-n // PADDED_BATCH), "tokens": padded},
+        "dynamic": {"batches": len(batches), "tokens": dynamic},
+    }
+
+
+def train_steps(dataset, eval_dataset, dynamic, steps, token_budget, id2label, label2id):
+    from transformers import AutoProcessor, LayoutLMv3ForTokenClassification, TrainingArguments
+
+    processor = AutoProcessor.from_pretrained(PROCESSOR_NAME, apply_ocr=False)
+    model = LayoutLMv3ForTokenClassification.from_pretrained(
+        PROCESSOR_NAME, num_labels=len(id2label), id2label=id2label, label2id=label2id
+    )
+    with tempfile.TemporaryDirectory() as out:
+        args = TrainingArguments(
+            output_dir=out,
+            per_device_train_batch_size=PADDED_BATCH,
+            max_steps=steps,
+            save_strategy="no",
+            logging_steps=max(steps, 1),
+            report_to=[],
+        )
+        trainer, throughput = make_trainer(
+            model, args, dataset, eval_dataset, processor, None, dynamic=dynamic, token_budget=token_budget
+        )
+        trainer.train()
+    return throughput.history[-1]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--steps", type=int, default=0, help="training steps per mode (0 = cost model only)")
+    ap.add_argument("--token-budget", type=int, default=TOKEN_BUDGET)
+    args = ap.parse_args()
+
+    padded, id2label, label2id, _ = get_dataset()
+    dynamic, _, _, _ = get_dataset(dynamic_padding=True)
+    lengths = list(dynamic["train"]["length"])
+
+    cost = epoch_cost(lengths, args.token_budget)
+    print(f"train pages: {cost['pages']}, real text tokens: {cost['real_text_tokens']}, "
+          f"token budget: {args.token_budget}")
+    for mode in ("padded", "dynamic"):
+        c = cost[mode]
+        print(f"{mode:8s} batches/epoch {c['batches']:6d}  tokens/epoch {c['tokens']:10d}")
+    print(f"dynamic processes {cost['dynamic']['tokens'] / cost['padded']['tokens']:.1%} of the padded tokens")
+
+    if args.steps:
+        for mode, ds in (("padded", padded), ("dynamic", dynamic)):
+            ds = ds.with_format("numpy")
+            stats = train_steps(ds["train"], ds["validation"], mode == "dynamic",
+                                args.steps, args.token_budget, id2label, label2id)
+            per_page = stats["epoch_time_s"] / max(stats["pages"], 1)
+            print(f"{mode:8s} {stats['tokens_per_s']:9.1f} tokens/s  "
+                  f"{stats['padded_tokens_per_s']:9.1f} padded tokens/s  "
+                  f"pad {stats['pad_fraction']:.1%}  "
+                  f"projected epoch {per_page * cost['pages']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
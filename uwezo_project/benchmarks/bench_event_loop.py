@@ -0,0 +1,130 @@
+# benchmarks/bench_event_loop.py
+"""
+Health-check latency while analyses are running.
+
+Starts uvicorn, measures GET / latency while idle, then again while
+--concurrency POST /analyze/ requests for --file are in flight (each with a
+byte appended so the result cache cannot short-circuit them). With
+extraction on the executor pools the loaded latency should stay close to
+the idle one; an analysis running on the event loop shows up as
+multi-second stalls.
+
+Run from uwezo_project/ (migrated database in DATABASE_URL):
+    python -m benchmarks.bench_event_loop --file path/to/statement.pdf [--concurrency 4] [--cpu-pool process]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_up(base, proc, timeout=60.0):
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            urllib.request.urlopen(base + "/", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError("uvicorn did not start")
+
+
+def _ping(base, seconds, interval=0.02, stop=None):
+    latencies = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end and not (stop and stop.is_set()):
+        t0 = time.perf_counter()
+        urllib.request.urlopen(base + "/", timeout=120).read()
+        latencies.append((time.perf_counter() - t0) * 1000)
+        time.sleep(interval)
+    return latencies
+
+
+def _analyze(base, payload, filename, results):
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+        f"Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+    req = urllib.request.Request(base + "/analyze/?mode=sync", data=body, method="POST",
+                                 headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=600) as r:
+            status = r.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    results.append((status, time.perf_counter() - t0))
+
+
+def _summary(name, lat):
+    lat = sorted(lat)
+    p95 = lat[int(0.95 * (len(lat) - 1))]
+    print(f"{name:8s} n={len(lat):4d}  p50 {statistics.median(lat):7.1f}ms  p95 {p95:7.1f}ms  max {lat[-1]:7.1f}ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--file", required=True)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--cpu-pool", choices=["process", "thread"], default=None)
+    ap.add_argument("--idle-seconds", type=float, default=3.0)
+    args = ap.parse_args()
+
+    env = dict(os.environ)
+    if args.cpu_pool:
+        env["UWEZO_CPU_POOL"] = args.cpu_pool
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        _wait_up(base, proc)
+        _summary("idle", _ping(base, args.idle_seconds))
+
+        with open(args.file, "rb") as f:
+            data = f.read()
+        results, workers = [], []
+        for i in range(args.concurrency):
+            # trailing bytes change the hash but not how PDF/PNG/JPEG decoders read the file
+            payload = data + b"\n%" + uuid.uuid4().hex.encode()
+            t = threading.Thread(target=_analyze, args=(base, payload, os.path.basename(args.file), results))
+            t.start()
+            workers.append(t)
+
+        stop = threading.Event()
+        pinger_out = []
+        pinger = threading.Thread(target=lambda: pinger_out.extend(_ping(base, 3600, stop=stop)))
+        pinger.start()
+        for t in workers:
+            t.join()
+        stop.set()
+        pinger.join()
+
+        _summary("loaded", pinger_out)
+        for status, secs in results:
+            print(f"analysis status {status} in {secs:.1f}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
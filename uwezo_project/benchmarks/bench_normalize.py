@@ -0,0 +1,91 @@
+# benchmarks/bench_normalize.py
+"""
+Header normalization: original per-frame regex + substring scan vs the
+memoized matcher, on tables with realistic recurring bank header spellings.
+
+Run from uwezo_project/:
+    python -m benchmarks.bench_normalize [--tables 5000]
+"""
+
+import argparse
+import random
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.normalize import COLUMN_MAPPING, _normalized_index, match_header, normalize_columns, normalize_columns_many
+
+HEADER_SETS = [
+    ["Date", "Narration", "Chq./Ref.No.", "Value Dt", "Withdrawal Amt.", "Deposit Amt.", "Closing Balance"],
+    ["Txn Date", "Value Date", "Description", "Ref No./Cheque No.", "Debit", "Credit", "Balance"],
+    ["Tran Date", "Chq No", "Particulars", "Debit", "Credit", "Balance", "Init. Br"],
+    ["Transaction Date", "Transaction Details", "Money Out", "Money In", "Running Balance"],
+    ["Booking Date", "Remarks", "Amount Paid", "Amount Received", "Ledger Balance"],
+    ["DATE", "DESCRIPTION", "WITHDRAWAL (DR)", "DEPOSIT (CR)", "BALANCE"],
+    ["S.No", "Value Date", "Transaction Remarks", "Withdrawal", "Deposit", "Balance (INR)"],
+]
+
+
+def legacy_normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """The pre-memoization implementation, kept here as the baseline."""
+    df = df.copy()
+    normalized_map = {}
+    for col in df.columns:
+        clean_col = re.sub(r"[^a-zA-Z0-9 ]", "", col).strip().lower()
+        matched = False
+        for target, variants in COLUMN_MAPPING.items():
+            if any(clean_col in v or v in clean_col for v in variants):
+                normalized_map[col] = target
+                matched = True
+                break
+        if not matched:
+            normalized_map[col] = clean_col
+    df.rename(columns=normalized_map, inplace=True)
+    return df
+
+
+def _tables(n, rows):
+    rng = random.Random(0)
+    out = []
+    for _ in range(n):
+        headers = rng.choice(HEADER_SETS)
+        out.append(pd.DataFrame(np.zeros((rows, len(headers))), columns=headers))
+    return out
+
+
+def _time(fn, *args):
+    t0 = time.perf_counter()
+    res = fn(*args)
+    return time.perf_counter() - t0, res
+
+
+def run(n_tables=5000, rows=200):
+    tables = _tables(n_tables, rows)
+    match_header.cache_clear()
+    _normalized_index.cache_clear()
+
+    t_legacy, ref = _time(lambda ts: [legacy_normalize_columns(t) for t in ts], tables)
+    t_single, new = _time(lambda ts: [normalize_columns(t) for t in ts], tables)
+    t_batch, views = _time(normalize_columns_many, tables)
+
+    assert all(list(a.columns) == list(b.columns) for a, b in zip(ref, new))
+    assert all(list(a.columns) == list(b.columns) for a, b in zip(ref, views))
+
+    info = match_header.cache_info()
+    layouts = _normalized_index.cache_info()
+    print(f"{n_tables} tables x {rows} rows, {len(HEADER_SETS)} header layouts")
+    print(f"legacy normalize_columns   {1000 * t_legacy:8.1f} ms")
+    print(f"normalize_columns (cached) {1000 * t_single:8.1f} ms  x{t_legacy / t_single:.1f}")
+    print(f"normalize_columns_many     {1000 * t_batch:8.1f} ms  x{t_legacy / t_batch:.1f}")
+    print(f"header cache: {info.hits} hits, {info.misses} misses, {info.currsize} entries")
+    print(f"layout cache: {layouts.hits} hits, {layouts.misses} misses, {layouts.currsize} entries")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tables", type=int, default=5000)
+    ap.add_argument("--rows", type=int, default=200)
+    args = ap.parse_args()
+    run(args.tables, args.rows)
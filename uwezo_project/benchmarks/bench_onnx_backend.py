@@ -0,0 +1,99 @@
+# benchmarks/bench_onnx_backend.py
+"""
+Parity and speed check of the ONNX Runtime backends against the torch path.
+
+For every page of the split, the same encoded inputs go through each backend.
+Reports token-level argmax agreement with torch, seqeval F1 of the per-word
+tags (against YOLO ground truth when labels exist, otherwise against torch),
+per-page latency and resident memory.
+
+Run from uwezo_project/ after `python -m src.export_onnx --quantize`:
+    python -m benchmarks.bench_onnx_backend [--backends onnx onnx-int8] [--limit N]
+"""
+
+import argparse
+import gc
+import statistics
+import time
+
+import evaluate
+import psutil
+
+from benchmarks.bench_windowed_inference import load_pages
+from src.layout_inference import _merge_windows, encode_pages, load_model, make_backend
+from src.preprocessing import id2label
+
+
+def _rss_mb():
+    return psutil.Process().memory_info().rss / 2**20
+
+
+def _run_backend(name, processor, pages):
+    gc.collect()
+    before = _rss_mb()
+    backend = make_backend(name)
+    loaded_mb = _rss_mb() - before
+
+    peak = _rss_mb()
+    times, logits_per_page, tags_per_page = [], [], []
+    for img, js, _, _ in pages:
+        enc, inputs, texts = encode_pages(processor, [(img, js)], windowed=False)
+        t0 = time.perf_counter()
+        logits = backend(inputs)
+        times.append(time.perf_counter() - t0)
+        peak = max(peak, _rss_mb())
+        mask = enc["attention_mask"][0].bool()
+        logits_per_page.append(logits[0].argmax(-1)[mask])
+        tags_per_page.append(_merge_windows(logits, [enc.word_ids(0)], [0], [len(texts[0])])[0])
+    del backend
+    return {
+        "times": times,
+        "token_preds": logits_per_page,
+        "word_tags": tags_per_page,
+        "load_mb": loaded_mb,
+        "peak_mb": peak - before,
+    }
+
+
+def run(backends, split="test", limit=None):
+    processor, _ = load_model()
+    pages = load_pages(split, limit)
+    if not pages:
+        print(f"No pages found for split {split!r}")
+        return
+    metric = evaluate.load("seqeval")
+
+    results = {"torch": _run_backend("torch", processor, pages)}
+    for name in backends:
+        results[name] = _run_backend(name, processor, pages)
+
+    has_gold = all(gold is not None for *_, gold in pages)
+    if has_gold:
+        refs = [[id2label[i] for i in gold] for *_, gold in pages]
+    else:
+        refs = [[id2label[i] for i in tags] for tags in results["torch"]["word_tags"]]
+
+    ref_tokens = results["torch"]["token_preds"]
+    print(f"{len(pages)} pages, F1 reference: {'ground truth' if has_gold else 'torch predictions'}")
+    print(f"{'backend':<10} {'agree':>7} {'f1':>7} {'mean ms':>9} {'p95 ms':>9} {'load MB':>8} {'peak MB':>8}")
+    for name, r in results.items():
+        same = sum(int((a == b).sum()) for a, b in zip(r["token_preds"], ref_tokens))
+        total = sum(len(a) for a in ref_tokens)
+        preds = [[id2label[i] for i in tags] for tags in r["word_tags"]]
+        f1 = metric.compute(predictions=preds, references=refs)["overall_f1"]
+        lat = sorted(r["times"])
+        p95 = lat[min(len(lat) - 1, int(0.95 * len(lat)))]
+        print(
+            f"{name:<10} {same / max(total, 1):>7.4f} {f1:>7.4f} "
+            f"{1000 * statistics.mean(lat):>9.1f} {1000 * p95:>9.1f} "
+            f"{r['load_mb']:>8.0f} {r['peak_mb']:>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--backends", nargs="+", default=["onnx", "onnx-int8"])
+    ap.add_argument("--split", default="test")
+    ap.add_argument("--limit", type=int, default=None)
+    args = ap.parse_args()
+    run(args.backends, args.split, args.limit)
@@ -0,0 +1,104 @@
+# benchmarks/bench_retrain_loader.py
+"""
+Retrain data prep as history grows: the old full re-select with fetchall()
+vs the incremental shard store (src/retrain_data.py), which only reads the
+documents reviewed since the last run from the database.
+
+Each round adds --new-docs reviewed documents on top of the history and
+times both loaders. Uses a temporary SQLite file.
+
+Run from uwezo_project/:
+    python -m benchmarks.bench_retrain_loader [--history 50000 100000 200000] [--new-docs 500]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_tmp = tempfile.mkdtemp(prefix="uwezo_retrain_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'retrain.db')}"
+
+from app import models  # noqa: E402
+from app.database import engine  # noqa: E402
+from src.retrain_data import ShardStore  # noqa: E402
+
+FIELD_NAMES = ["bank_name", "account_number", "opening_balance", "closing_balance",
+               "statement_period", "total_credits"]
+T0 = datetime(2024, 1, 1)
+
+
+def add_docs(conn, start, n, rng):
+    ids = range(start, start + n)
+    conn.exec_driver_sql(
+        "INSERT INTO uploads (id, filename, uploaded_at, processed) VALUES (?, ?, ?, 1)",
+        [(i, f"s{i}.pdf", T0 + timedelta(minutes=i)) for i in ids])
+    conn.exec_driver_sql(
+        "INSERT INTO extractedfields (upload_id, field_name, field_value) VALUES (?, ?, ?)",
+        [(i, f, str(rng.randint(0, 10**6))) for i in ids for f in FIELD_NAMES])
+    conn.exec_driver_sql(
+        "INSERT INTO reviews (document_id, comment, reviewed_at) VALUES (?, 'ok', ?)",
+        [(i, T0 + timedelta(minutes=i)) for i in ids])
+    conn.commit()
+
+
+def full_reselect():
+    # the previous load_training_data query
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("""SELECT field_name, field_value FROM ExtractedFields e
+                       JOIN Uploads u ON e.upload_id = u.id
+                       WHERE u.processed = 1""")
+        return cur.fetchall()
+    finally:
+        raw.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--history", type=int, nargs="+", default=[50_000, 100_000, 200_000])
+    ap.add_argument("--new-docs", type=int, default=500)
+    args = ap.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    store = ShardStore(os.path.join(_tmp, "shards"))
+    rng = random.Random(0)
+    next_id = 1
+    with engine.connect() as conn:
+        add_docs(conn, next_id, args.history[0], rng)
+        next_id += args.history[0]
+    store.append(engine)  # initial backfill, as on the first retrain
+
+    print(f"{'history':>9s} {'full':>9s} {'db rows':>8s} {'incr db':>9s} {'incr total':>11s} {'new rows':>9s}")
+    for size in args.history:
+        with engine.connect() as conn:
+            if next_id - 1 < size:
+                add_docs(conn, next_id, size - (next_id - 1), rng)
+                next_id = size + 1
+            add_docs(conn, next_id, args.new_docs, rng)
+            next_id += args.new_docs
+        store.append(engine)  # fold the growth step in, leaving only the new batch timed below
+        with engine.connect() as conn:
+            add_docs(conn, next_id, args.new_docs, rng)
+            next_id += args.new_docs
+
+        t0 = time.perf_counter()
+        full = full_reselect()
+        t_full = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        added = store.append(engine)
+        t_db = time.perf_counter() - t0
+        rows = store.rows()
+        t_total = time.perf_counter() - t0
+        assert len(rows) == len(full), (len(rows), len(full))
+        print(f"{size:9d} {t_full * 1000:8.1f}ms {len(full):8d} {t_db * 1000:8.1f}ms "
+              f"{t_total * 1000:10.1f}ms {added:9d}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
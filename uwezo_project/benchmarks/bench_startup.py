@@ -0,0 +1,115 @@
+# benchmarks/bench_startup.py
+"""
+API cold-start benchmark. Each run uses a fresh interpreter and reports:
+
+  import_s        time to `import app.main`
+  heavy_modules   which of torch/transformers/cv2/sklearn/fitz got imported
+  first_request_s uvicorn spawn -> first 200 from GET /health/live
+  warmup_s        POST /health/warmup (model load + first forward), optional
+
+Run from uwezo_project/:
+    python -m benchmarks.bench_startup [--runs 3] [--warmup]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+HEAVY = ["torch", "transformers", "cv2", "sklearn", "fitz", "pandas"]
+
+IMPORT_PROBE = f"""
+import json, sys, time
+t0 = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"import_s": elapsed, "heavy": [m for m in {HEAVY!r} if m in sys.modules]}}))
+"""
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///./bench_startup.db")
+    return env
+
+
+def measure_import():
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], env=_env(),
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def measure_first_request(warmup: bool, timeout: float = 120.0):
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        first = None
+        while time.perf_counter() - t0 < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            try:
+                with urllib.request.urlopen(base + "/health/live", timeout=1) as r:
+                    if r.status == 200:
+                        first = time.perf_counter() - t0
+                        break
+            except OSError:
+                time.sleep(0.02)
+        if first is None:
+            raise TimeoutError("no response from uvicorn")
+
+        warm = None
+        if warmup:
+            t1 = time.perf_counter()
+            req = urllib.request.Request(base + "/health/warmup", method="POST")
+            try:
+                urllib.request.urlopen(req, timeout=timeout).read()
+                warm = time.perf_counter() - t1
+            except OSError as e:
+                print(f"warm-up failed: {e}")
+        return first, warm
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--warmup", action="store_true", help="also time POST /health/warmup")
+    args = ap.parse_args()
+
+    imports, firsts, warms, heavy = [], [], [], set()
+    for _ in range(args.runs):
+        probe = measure_import()
+        imports.append(probe["import_s"])
+        heavy.update(probe["heavy"])
+        first, warm = measure_first_request(args.warmup)
+        firsts.append(first)
+        if warm is not None:
+            warms.append(warm)
+
+    print(f"import_s        median {statistics.median(imports):.3f}  (runs: {', '.join(f'{x:.3f}' for x in imports)})")
+    print(f"heavy_modules   {sorted(heavy) or 'none'}")
+    print(f"first_request_s median {statistics.median(firsts):.3f}  (runs: {', '.join(f'{x:.3f}' for x in firsts)})")
+    if warms:
+        print(f"warmup_s        median {statistics.median(warms):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_upload_memory.py
+"""
+Peak Python heap while storing uploads of growing size: the old
+`await file.read()` pattern vs the chunked save_upload writer.
+
+Run from uwezo_project/:
+    python -m benchmarks.bench_upload_memory [--sizes-mb 5 50 200]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import tracemalloc
+
+from starlette.datastructures import UploadFile
+
+from app.services import storage
+
+
+def _make_file(dirname, size_mb):
+    path = os.path.join(dirname, f"upload_{size_mb}mb.pdf")
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        block = os.urandom(1024 * 1024)
+        for _ in range(size_mb):
+            f.write(block)
+    return path
+
+
+async def _read_all(upload, out_dir):
+    contents = await upload.read()
+    with open(os.path.join(out_dir, "whole.bin"), "wb") as out:
+        out.write(contents)
+
+
+async def _chunked(upload, out_dir):
+    await storage.save_upload(upload, max_bytes=2**40)
+
+
+def _peak(fn, path, out_dir):
+    with open(path, "rb") as f:
+        upload = UploadFile(file=f, filename=os.path.basename(path))
+        tracemalloc.start()
+        asyncio.run(fn(upload, out_dir))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return peak / 2**20
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes-mb", type=int, nargs="+", default=[5, 50, 200])
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.OBJECT_DIR = os.path.join(tmp, "objects")
+        print(f"{'size':>8} {'read() peak':>14} {'chunked peak':>14}")
+        for size in args.sizes_mb:
+            path = _make_file(tmp, size)
+            whole = _peak(_read_all, path, tmp)
+            chunked = _peak(_chunked, path, tmp)
+            print(f"{size:6d}MB {whole:12.1f}MB {chunked:12.1f}MB")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
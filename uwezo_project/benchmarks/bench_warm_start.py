@@ -0,0 +1,67 @@
+# benchmarks/bench_warm_start.py
+"""
+Warm-start fine-tuning vs a full retrain, on the cached dataset.
+
+A random --new-fraction of the train pages is held back as "newly reviewed"
+data. The benchmark trains
+  base  from microsoft/layoutlmv3-base on the remaining pages (the model
+        being served before the new data arrived),
+  full  from microsoft/layoutlmv3-base on every page (a full retrain),
+  warm  from base's best checkpoint on the new pages plus a replay sample
+        (src.train warm start),
+and reports wall time, the saving and the F1 difference of warm vs full on
+the validation split. Checkpoints go to a temporary directory.
+
+Run from uwezo_project/:
+    python -m benchmarks.bench_warm_start [--new-fraction 0.2] [--epochs 10]
+        [--warm-epochs 3] [--replay-ratio 1.0] [--freeze-layers 0]
+"""
+
+import argparse
+import random
+import tempfile
+from pathlib import Path
+
+from src.preprocessing import CACHE_DIR, SPLITS, get_dataset, page_keys
+from src.train import train
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--new-fraction", type=float, default=0.2)
+    ap.add_argument("--epochs", type=float, default=None, help="full run epochs (default src.train.EPOCHS)")
+    ap.add_argument("--warm-epochs", type=float, default=None, help="default UWEZO_WARM_EPOCHS")
+    ap.add_argument("--replay-ratio", type=float, default=1.0)
+    ap.add_argument("--freeze-layers", type=int, default=0)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    get_dataset()  # builds the page caches page_keys reads
+    keys = page_keys(SPLITS["train"], CACHE_DIR)
+    new = set(random.Random(args.seed).sample(keys, max(1, int(len(keys) * args.new_fraction))))
+    old = [k for k in keys if k not in new]
+    print(f"train pages: {len(keys)} ({len(old)} old, {len(new)} new)")
+
+    with tempfile.TemporaryDirectory(prefix="uwezo_warm_") as tmp:
+        runs = {}
+        runs["base"] = train(output_dir=str(Path(tmp) / "base"), epochs=args.epochs,
+                             warm_start=False, only_pages=old)
+        runs["full"] = train(output_dir=str(Path(tmp) / "full"), epochs=args.epochs, warm_start=False)
+        runs["warm"] = train(output_dir=str(Path(tmp) / "warm"), epochs=args.warm_epochs, warm_start=True,
+                             base_checkpoint=runs["base"]["best_checkpoint"],
+                             replay_ratio=args.replay_ratio, freeze_layers=args.freeze_layers)
+
+    for name, r in runs.items():
+        print(f"{name:5s} pages {r['train_pages']:6d}  epochs {r['epochs']:5.2f}  "
+              f"wall {r['wall_time_s']:8.1f}s  F1 {r['f1']:.4f}"
+              f"{'  (stopped early)' if r['stopped_early'] else ''}")
+    full, warm = runs["full"], runs["warm"]
+    print(f"warm start: {warm['new_pages']} new + {warm['replay_pages']} replay pages, "
+          f"{warm['frozen_layers']} frozen layers")
+    print(f"wall-clock saving vs full retrain: {full['wall_time_s'] - warm['wall_time_s']:.1f}s "
+          f"({1 - warm['wall_time_s'] / full['wall_time_s']:.1%}, {full['wall_time_s'] / warm['wall_time_s']:.2f}x)")
+    print(f"F1 difference (warm - full): {warm['f1'] - full['f1']:+.4f}")
+
+
+if __name__ == "__main__":
+    main()
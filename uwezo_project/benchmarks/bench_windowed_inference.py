@@ -0,0 +1,103 @@
+# benchmarks/bench_windowed_inference.py
+"""
+Truncated vs sliding-window LayoutLMv3 inference on processed/ocr/test.
+
+Reports per-page latency (grouped by word count) and word-level recall of
+labelled field words against the YOLO ground truth.
+
+Run from uwezo_project/:
+    python -m benchmarks.bench_windowed_inference [--stride 128] [--limit N]
+"""
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from src.layout_inference import load_model, predict_word_tags_batch
+from src.preprocessing import PROC_IMG, PROC_OCR, YOLO_ROOT, id2label, label2id, load_yolo, to_bio
+
+
+def load_pages(split, limit=None):
+    """(image, ocr json, word count, gold label ids or None) for each page of a split."""
+    out = []
+    for jp in sorted((PROC_OCR / split).glob("*.json")):
+        data = json.loads(jp.read_text())
+        img = PROC_IMG / split / Path(data["image_path"]).name
+        if not img.exists():
+            continue
+        words = [w for w in data["words"] if w.get("text", "").strip()]
+        lbl = YOLO_ROOT / "labels" / split / (img.stem + ".txt")
+        gold = None
+        if lbl.exists():
+            tags = to_bio(words, load_yolo(lbl, data["width"], data["height"]))
+            gold = [label2id[t] for t in tags]
+        out.append((img, jp, len(words), gold))
+        if limit and len(out) >= limit:
+            break
+    return out
+
+
+def _field(label_id):
+    tag = id2label[label_id]
+    return tag[2:] if tag != "O" else None
+
+
+def _recall(pred, gold):
+    hits = total = 0
+    for p, g in zip(pred, gold):
+        if _field(g) is None:
+            continue
+        total += 1
+        hits += _field(p) == _field(g)
+    return hits, total
+
+
+def run(split="test", stride=128, limit=None):
+    load_model()
+    pages = load_pages(split, limit)
+    if not pages:
+        print(f"No pages found under {PROC_OCR / split}")
+        return
+
+    report = {}
+    for mode, windowed in [("truncated", False), ("windowed", True)]:
+        # warm-up so the first page does not pay for lazy initialisation
+        predict_word_tags_batch([(pages[0][0], pages[0][1])], windowed, stride)
+        times, hits, total = [], 0, 0
+        for img, js, n_words, gold in pages:
+            t0 = time.perf_counter()
+            [(_, pred)] = predict_word_tags_batch([(img, js)], windowed, stride)
+            times.append((n_words, time.perf_counter() - t0))
+            if gold is not None:
+                h, t = _recall(pred, gold)
+                hits += h
+                total += t
+        report[mode] = {"times": times, "recall": (hits / total) if total else None}
+
+    print(f"{len(pages)} pages from {PROC_OCR / split}")
+    print(f"{'mode':<10} {'mean ms':>9} {'p95 ms':>9} {'recall':>8}")
+    for mode, r in report.items():
+        lat = sorted(t for _, t in r["times"])
+        p95 = lat[min(len(lat) - 1, int(0.95 * len(lat)))]
+        recall = f"{r['recall']:.3f}" if r["recall"] is not None else "n/a"
+        print(f"{mode:<10} {1000 * statistics.mean(lat):>9.1f} {1000 * p95:>9.1f} {recall:>8}")
+
+    print("\nLatency by page length (words):")
+    buckets = [(0, 200), (200, 400), (400, 800), (800, 10**9)]
+    for lo, hi in buckets:
+        row = []
+        for mode, r in report.items():
+            ts = [t for n, t in r["times"] if lo <= n < hi]
+            row.append(f"{mode}={1000 * statistics.mean(ts):.1f}ms" if ts else f"{mode}=-")
+        print(f"  [{lo}, {hi if hi < 10**9 else 'inf'}): " + "  ".join(row))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--split", default="test")
+    ap.add_argument("--stride", type=int, default=128)
+    ap.add_argument("--limit", type=int, default=None)
+    args = ap.parse_args()
+    run(args.split, args.stride, args.limit)
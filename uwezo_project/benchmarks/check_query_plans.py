@@ -0,0 +1,210 @@
+# benchmarks/check_query_plans.py
+"""
+Query-plan regression check for the hot tables.
+
+Builds the schema with `alembic upgrade head` (so migration 7c3e5a91d0f4's
+indexes are the ones checked) in a temporary SQLite file, seeds a synthetic
+dataset, runs ANALYZE, and checks EXPLAIN QUERY PLAN of every hot query:
+the expected index must be used and none of the listed tables may be read
+with a bare full-table SCAN. Each query is also executed and timed.
+Exits non-zero if any plan regresses. tests/test_query_plans.py runs the
+same checks at a small scale.
+
+Run from uwezo_project/:
+    python -m benchmarks.check_query_plans [--scale 1.0] [--without-indexes]
+
+--without-indexes drops the migration's indexes first, to show the plans
+(and timings) they replace.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import select
+
+from app import crud, models
+from app.database import make_engine
+from app.pagination import PageParams
+from src.retrain_data import new_rows_query
+
+MIGRATIONS = Path(__file__).resolve().parent.parent / "migrations"
+MIGRATION_INDEXES = [
+    "ix_uploads_user_id_id", "ix_uploads_processed_id", "ix_uploads_uploaded_at",
+    "ix_reviews_document_id", "ix_extractedfields_upload_id", "ix_cases_upload_id_flagged",
+    "ix_audittrail_user_id_id", "ix_audittrail_action_id", "ix_audittrail_timestamp",
+]
+T0 = datetime(2024, 1, 1)
+ACTIONS = ["login", "upload", "analyze", "review", "export", "retrain"]
+
+
+def seed(conn, scale: float):
+    rng = random.Random(0)
+    n_users = max(10, int(2_000 * scale))
+    n_uploads = max(100, int(200_000 * scale))
+    n_audit = max(100, int(500_000 * scale))
+    minutes = 2 * 365 * 24 * 60
+
+    conn.exec_driver_sql("BEGIN")
+    conn.exec_driver_sql(
+        "INSERT INTO users (id, username, role) VALUES (?, ?, ?)",
+        [(i, f"user{i}", "analyst") for i in range(1, n_users + 1)],
+    )
+    uploads, cases, fields, reviews = [], [], [], []
+    for i in range(1, n_uploads + 1):
+        processed = rng.random() < 0.8
+        uploads.append((
+            i, f"statement_{i}.pdf", T0 + timedelta(minutes=i * minutes // n_uploads),
+            rng.randint(1, n_users), processed, "analyze", f"{i:064x}",
+        ))
+        if processed and rng.random() < 0.35:
+            cases.append((i, rng.random() < 0.15, round(rng.random(), 3)))
+        if processed:
+            fields.extend((i, name, str(rng.randint(0, 10**6))) for name in ("opening_balance", "closing_balance", "account_number"))
+        if rng.random() < 0.2:
+            reviews.append((i, rng.randint(1, n_users), "ok", T0 + timedelta(minutes=i)))
+    conn.exec_driver_sql(
+        "INSERT INTO uploads (id, filename, uploaded_at, user_id, processed, processing_purpose, content_hash) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)", uploads)
+    conn.exec_driver_sql("INSERT INTO cases (upload_id, flagged, confidence_score) VALUES (?, ?, ?)", cases)
+    conn.exec_driver_sql("INSERT INTO extractedfields (upload_id, field_name, field_value) VALUES (?, ?, ?)", fields)
+    conn.exec_driver_sql("INSERT INTO reviews (document_id, user_id, comment, reviewed_at) VALUES (?, ?, ?, ?)", reviews)
+    conn.exec_driver_sql(
+        "INSERT INTO audittrail (action, user_id, timestamp, details) VALUES (?, ?, ?, ?)",
+        [(rng.choice(ACTIONS), rng.randint(1, n_users), T0 + timedelta(minutes=i * minutes // n_audit), "")
+         for i in range(n_audit)],
+    )
+    conn.exec_driver_sql("COMMIT")
+    conn.exec_driver_sql("ANALYZE")
+    return {"users": n_users, "uploads": n_uploads, "cases": len(cases), "fields": len(fields),
+            "reviews": len(reviews), "audit": n_audit}
+
+
+def hot_queries(counts):
+    U, EF = models.Upload, models.ExtractedField
+    page = PageParams(limit=50, cursor=None)
+    deep = PageParams(limit=50, cursor=counts["uploads"] // 2)
+    day = T0 + timedelta(days=200)
+    # (name, statement, indexes that must appear, tables that must not be fully scanned)
+    return [
+        ("reviews_for_document",
+         select(models.Review).where(models.Review.document_id == counts["uploads"] // 3),
+         ["ix_reviews_document_id"], ["reviews"]),
+        ("retrain_fields_since_watermark",
+         new_rows_query(counts["reviews"] - counts["reviews"] // 100, counts["reviews"], {counts["reviews"]}),
+         ["ix_extractedfields_upload_id"], ["extractedfields", "uploads", "reviews"]),
+        ("upload_by_hash",
+         select(U).where(U.content_hash == f"{counts['uploads'] // 2:064x}"),
+         ["ix_uploads_content_hash"], ["uploads"]),
+        ("uploads_page_by_user",
+         crud.uploads_page_query(page, user_id=7),
+         ["ix_uploads_user_id_id"], ["uploads", "cases"]),
+        ("uploads_page_unprocessed_deep",
+         crud.uploads_page_query(deep, processed=False),
+         ["ix_uploads_processed_id"], ["uploads", "cases"]),
+        ("uploads_page_one_day",
+         crud.uploads_page_query(page, since=day, until=day + timedelta(days=1)),
+         ["ix_uploads_uploaded_at"], ["uploads", "cases"]),
+        # flagged is an EXISTS filter: a backwards primary-key walk that stops at the page size
+        ("uploads_page_flagged",
+         crud.uploads_page_query(page, flagged=True),
+         ["ix_cases_upload_id_flagged"], ["cases"]),
+        ("audit_page_by_user",
+         crud.audit_page_query(page, user_id=7),
+         ["ix_audittrail_user_id_id"], ["audittrail"]),
+        ("audit_page_by_action",
+         crud.audit_page_query(page, action="retrain"),
+         ["ix_audittrail_action_id"], ["audittrail"]),
+        ("audit_page_one_day",
+         crud.audit_page_query(page, since=day, until=day + timedelta(days=1)),
+         ["ix_audittrail_timestamp"], ["audittrail"]),
+        ("stats_for_user",
+         crud.upload_stats_query(user_id=7),
+         ["ix_uploads_user_id_id", "ix_cases_upload_id_flagged"], ["uploads", "cases"]),
+        ("stats_all",
+         crud.upload_stats_query(),
+         ["ix_cases_upload_id_flagged"], []),
+    ]
+
+
+def build_schema(engine):
+    """Create the schema the way deployments do: alembic upgrade head."""
+    from alembic import command
+    from alembic.config import Config
+
+    cfg = Config()
+    cfg.set_main_option("script_location", str(MIGRATIONS))
+    # not engine.begin(): migrations that need autocommit_block() manage their own transactions
+    with engine.connect() as conn:
+        cfg.attributes["connection"] = conn
+        command.upgrade(cfg, "head")
+        conn.commit()
+
+
+def _driver_sql(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(
+        v.isoformat(" ") if isinstance(v, datetime) else v
+        for v in (compiled.params[k] for k in compiled.positiontup)
+    )
+    return str(compiled), params
+
+
+def plan_problems(conn, stmt, expect, no_scan):
+    """(EXPLAIN QUERY PLAN lines, what is wrong with them)."""
+    sql, params = _driver_sql(conn, stmt)
+    plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params)]
+    problems = [f"expected index {ix}" for ix in expect if not any(ix in line for line in plan)]
+    for line in plan:
+        m = re.fullmatch(r"SCAN (\w+)(?: AS \w+)?", line.strip())
+        if m and m.group(1) in no_scan:
+            problems.append(f"full scan of {m.group(1)}")
+    return plan, problems
+
+
+def check(conn, name, stmt, expect, no_scan):
+    plan, problems = plan_problems(conn, stmt, expect, no_scan)
+    sql, params = _driver_sql(conn, stmt)
+    t0 = time.perf_counter()
+    rows = len(conn.exec_driver_sql(sql, params).fetchall())
+    ms = (time.perf_counter() - t0) * 1000
+
+    status = "ok  " if not problems else "FAIL"
+    print(f"{status} {name:32s} {ms:8.2f}ms  {rows:5d} rows")
+    for line in plan:
+        print(f"       {line}")
+    for p in problems:
+        print(f"       !! {p}")
+    return not problems
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--scale", type=float, default=1.0, help="1.0 = 200k uploads, 500k audit rows")
+    ap.add_argument("--without-indexes", action="store_true")
+    args = ap.parse_args()
+
+    engine = make_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='uwezo_plans_'), 'plans.db')}")
+    build_schema(engine)
+    with engine.connect() as conn:
+        if args.without_indexes:
+            for ix in MIGRATION_INDEXES:
+                conn.exec_driver_sql(f"DROP INDEX {ix}")
+        t0 = time.perf_counter()
+        counts = seed(conn, args.scale)
+        print(f"seeded {counts} in {time.perf_counter() - t0:.1f}s")
+
+        ok = all([check(conn, *q) for q in hot_queries(counts)])
+    engine.dispose()
+    print("all plans use their indexes" if ok else "query plan regression")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""create base schema
+
+Revision ID: 1f0c6a2d8e31
+Revises:
+Create Date: 2025-10-20 09:00:00.000000
+
+The tables as they stood before 4b1f41cccd0d (REAL scores, TEXT usernames,
+reviews.document_id as TEXT, uploads without user_id / file_path), so the
+rest of the chain applies unchanged on top. Databases created before this
+revision existed already have these tables and are stamped past it.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1f0c6a2d8e31'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.Text(), nullable=True),
+        sa.Column('password', sa.String(), nullable=True),
+        sa.Column('role', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username'),
+    )
+    op.create_table(
+        'uploads',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.Text(), nullable=True),
+        sa.Column('uploaded_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('processing_purpose', sa.Text(), nullable=True),
+        sa.Column('processed', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'reviews',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('document_id', sa.Text(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('retrain_flag', sa.Boolean(), nullable=True),
+        sa.Column('reviewed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'extractedfields',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('upload_id', sa.Integer(), nullable=True),
+        sa.Column('field_name', sa.Text(), nullable=True),
+        sa.Column('field_value', sa.Text(), nullable=True),
+        sa.Column('masked', sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(['upload_id'], ['uploads.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'cases',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('upload_id', sa.Integer(), nullable=True),
+        sa.Column('template_type', sa.Text(), nullable=True),
+        sa.Column('language', sa.Text(), nullable=True),
+        sa.Column('error_rate', sa.REAL(), nullable=True),
+        sa.Column('confidence_score', sa.REAL(), nullable=True),
+        sa.Column('flagged', sa.Boolean(), nullable=True),
+        sa.Column('reviewer_id', sa.Integer(), nullable=True),
+        sa.Column('reviewer_decision', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['upload_id'], ['uploads.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'audittrail',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('action', sa.Text(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('details', sa.Text(), nullable=True),
+        sa.Column('model_version', sa.Text(), nullable=True),
+        sa.Column('dataset_snapshot', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'evidencebundles',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('case_id', sa.Integer(), nullable=True),
+        sa.Column('pdf_path', sa.Text(), nullable=True),
+        sa.Column('json_path', sa.Text(), nullable=True),
+        sa.Column('extracted_at', sa.DateTime(), nullable=True),
+        sa.Column('retention_until', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['case_id'], ['cases.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'subjectrequests',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('request_type', sa.Text(), nullable=True),
+        sa.Column('request_details', sa.Text(), nullable=True),
+        sa.Column('status', sa.Text(), nullable=True),
+        sa.Column('request_date', sa.DateTime(), nullable=True),
+        sa.Column('completion_date', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'decisionlabels',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('case_id', sa.Integer(), nullable=True),
+        sa.Column('label', sa.Text(), nullable=True),
+        sa.Column('reviewer_justification', sa.Text(), nullable=True),
+        sa.Column('evidence', sa.Text(), nullable=True),
+        sa.Column('confidence', sa.REAL(), nullable=True),
+        sa.Column('review_month', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['case_id'], ['cases.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'authenticitychecks',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('upload_id', sa.Integer(), nullable=True),
+        sa.Column('metadata_sane', sa.Boolean(), nullable=True),
+        sa.Column('compression_issues', sa.Boolean(), nullable=True),
+        sa.Column('cross_page_consistency', sa.Boolean(), nullable=True),
+        sa.Column('trust_score', sa.REAL(), nullable=True),
+        sa.Column('issues_found', sa.Text(), nullable=True),
+        sa.Column('action_taken', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['upload_id'], ['uploads.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'accessibilityaudits',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.DateTime(), nullable=True),
+        sa.Column('issue', sa.Text(), nullable=True),
+        sa.Column('fixed', sa.Boolean(), nullable=True),
+        sa.Column('method', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    for table in ('accessibilityaudits', 'authenticitychecks', 'decisionlabels', 'subjectrequests',
+                  'evidencebundles', 'audittrail', 'cases', 'extractedfields', 'reviews', 'uploads', 'users'):
+        op.drop_table(table)
@@ -0,0 +1,45 @@
+"""add jobs table for queued analysis
+
+Revision ID: 2e7d9f4a2182
+Revises: dabfe5379bb6
+Create Date: 2025-11-03 09:12:44.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2e7d9f4a2182'
+down_revision: Union[str, None] = 'dabfe5379bb6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('upload_id', sa.Integer(), nullable=True),
+        sa.Column('kind', sa.Text(), nullable=True),
+        sa.Column('status', sa.Text(), nullable=True),
+        sa.Column('file_path', sa.Text(), nullable=True),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('worker_id', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['upload_id'], ['uploads.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # workers poll for the oldest queued job
+    op.create_index('ix_jobs_status_id', 'jobs', ['status', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_jobs_status_id', table_name='jobs')
+    op.drop_table('jobs')
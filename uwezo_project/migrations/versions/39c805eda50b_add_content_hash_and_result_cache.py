@@ -0,0 +1,39 @@
+"""add upload content hash and result cache
+
+Revision ID: 39c805eda50b
+Revises: 2e7d9f4a2182
+Create Date: 2025-11-05 14:27:03.861942
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '39c805eda50b'
+down_revision: Union[str, None] = '2e7d9f4a2182'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('uploads', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_uploads_content_hash', 'uploads', ['content_hash'])
+    op.create_table(
+        'resultcache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('model_version', sa.Text(), nullable=False),
+        sa.Column('result', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('content_hash', 'model_version', name='uq_resultcache_hash_version'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('resultcache')
+    op.drop_index('ix_uploads_content_hash', table_name='uploads')
+    op.drop_column('uploads', 'content_hash')
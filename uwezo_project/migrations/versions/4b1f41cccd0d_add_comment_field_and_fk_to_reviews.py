@@ -1,7 +1,7 @@
 """Add comment field and FK to reviews
 
 Revision ID: 4b1f41cccd0d
-Revises: 
+Revises: 1f0c6a2d8e31
 Create Date: 2025-10-23 10:03:28.198542
 
 """
@@ -11,70 +11,85 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = '4b1f41cccd0d'
-down_revision: Union[str, None] = None
+down_revision: Union[str, None] = '1f0c6a2d8e31'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
+# batch mode: plain ALTERs on Postgres, table copies on SQLite (which has no
+# ALTER COLUMN / ADD CONSTRAINT). The FK carries Postgres' default name so
+# databases migrated before it was named downgrade the same way.
 def upgrade() -> None:
-    op.alter_column('authenticitychecks', 'trust_score',
+    with op.batch_alter_table('authenticitychecks') as batch_op:
+        batch_op.alter_column('trust_score',
                existing_type=sa.REAL(),
                type_=sa.Float(),
                existing_nullable=True)
-    op.alter_column('cases', 'error_rate',
+    with op.batch_alter_table('cases') as batch_op:
+        batch_op.alter_column('error_rate',
                existing_type=sa.REAL(),
                type_=sa.Float(),
                existing_nullable=True)
-    op.alter_column('cases', 'confidence_score',
+        batch_op.alter_column('confidence_score',
                existing_type=sa.REAL(),
                type_=sa.Float(),
                existing_nullable=True)
-    op.alter_column('decisionlabels', 'confidence',
+    with op.batch_alter_table('decisionlabels') as batch_op:
+        batch_op.alter_column('confidence',
                existing_type=sa.REAL(),
                type_=sa.Float(),
                existing_nullable=True)
-    op.add_column('reviews', sa.Column('comment', sa.Text(), nullable=True))
-    
-    # Explicitly cast document_id from TEXT to INTEGER
-    op.execute("ALTER TABLE reviews ALTER COLUMN document_id TYPE INTEGER USING document_id::integer")
-    
-    op.create_foreign_key(None, 'reviews', 'uploads', ['document_id'], ['id'])
-    op.alter_column('users', 'username',
+    with op.batch_alter_table('reviews') as batch_op:
+        batch_op.add_column(sa.Column('comment', sa.Text(), nullable=True))
+        # Explicitly cast document_id from TEXT to INTEGER
+        batch_op.alter_column('document_id',
+               existing_type=sa.TEXT(),
+               type_=sa.Integer(),
+               existing_nullable=True,
+               postgresql_using='document_id::integer')
+        batch_op.create_foreign_key('reviews_document_id_fkey', 'uploads', ['document_id'], ['id'])
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('username',
                existing_type=sa.TEXT(),
                type_=sa.String(),
                existing_nullable=True)
-    op.alter_column('users', 'role',
+        batch_op.alter_column('role',
                existing_type=sa.TEXT(),
                type_=sa.String(),
                existing_nullable=True)
 
 def downgrade() -> None:
-    op.alter_column('users', 'role',
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('role',
                existing_type=sa.String(),
                type_=sa.TEXT(),
                existing_nullable=True)
-    op.alter_column('users', 'username',
+        batch_op.alter_column('username',
                existing_type=sa.String(),
                type_=sa.TEXT(),
                existing_nullable=True)
-    op.drop_constraint(None, 'reviews', type_='foreignkey')
-    op.alter_column('reviews', 'document_id',
+    with op.batch_alter_table('reviews') as batch_op:
+        batch_op.drop_constraint('reviews_document_id_fkey', type_='foreignkey')
+        batch_op.alter_column('document_id',
                existing_type=sa.Integer(),
                type_=sa.TEXT(),
                existing_nullable=True)
-    op.drop_column('reviews', 'comment')
-    op.alter_column('decisionlabels', 'confidence',
+        batch_op.drop_column('comment')
+    with op.batch_alter_table('decisionlabels') as batch_op:
+        batch_op.alter_column('confidence',
                existing_type=sa.Float(),
                type_=sa.REAL(),
                existing_nullable=True)
-    op.alter_column('cases', 'confidence_score',
+    with op.batch_alter_table('cases') as batch_op:
+        batch_op.alter_column('confidence_score',
                existing_type=sa.Float(),
                type_=sa.REAL(),
                existing_nullable=True)
-    op.alter_column('cases', 'error_rate',
+        batch_op.alter_column('error_rate',
                existing_type=sa.Float(),
                type_=sa.REAL(),
                existing_nullable=True)
-    op.alter_column('authenticitychecks', 'trust_score',
+    with op.batch_alter_table('authenticitychecks') as batch_op:
+        batch_op.alter_column('trust_score',
                existing_type=sa.Float(),
                type_=sa.REAL(),
                existing_nullable=True)
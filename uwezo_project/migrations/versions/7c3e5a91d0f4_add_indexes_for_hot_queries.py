@@ -0,0 +1,50 @@
+"""add indexes for hot lookup and dashboard queries
+
+Revision ID: 7c3e5a91d0f4
+Revises: 39c805eda50b
+Create Date: 2025-11-10 10:04:51.207316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3e5a91d0f4'
+down_revision: Union[str, None] = '39c805eda50b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, table, columns). (col, id) composites serve "filter on col,
+# keyset-paginate on id" without a sort; the cases index also covers the
+# per-upload flagged / confidence lookups.
+INDEXES = [
+    ('ix_uploads_user_id_id', 'uploads', ['user_id', 'id']),
+    ('ix_uploads_processed_id', 'uploads', ['processed', 'id']),
+    ('ix_uploads_uploaded_at', 'uploads', ['uploaded_at']),
+    ('ix_reviews_document_id', 'reviews', ['document_id']),
+    ('ix_extractedfields_upload_id', 'extractedfields', ['upload_id']),
+    ('ix_cases_upload_id_flagged', 'cases', ['upload_id', 'flagged', 'confidence_score']),
+    ('ix_audittrail_user_id_id', 'audittrail', ['user_id', 'id']),
+    ('ix_audittrail_action_id', 'audittrail', ['action', 'id']),
+    ('ix_audittrail_timestamp', 'audittrail', ['timestamp']),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY on Postgres so large tables (audittrail) stay writable;
+    # it cannot run inside a transaction
+    concurrently = op.get_context().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=concurrently)
+
+
+def downgrade() -> None:
+    concurrently = op.get_context().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=concurrently)
@@ -20,15 +20,17 @@ depends_on: Union[str, Sequence[str], None] = None
 
 def upgrade() -> None:
     # ### commands auto generated by Alembic - please adjust! ###
-    op.add_column('uploads', sa.Column('user_id', sa.Integer(), nullable=True))
-    op.add_column('uploads', sa.Column('file_path', sa.Text(), nullable=True))
-    op.create_foreign_key(None, 'uploads', 'users', ['user_id'], ['id'])
+    with op.batch_alter_table('uploads') as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('file_path', sa.Text(), nullable=True))
+        batch_op.create_foreign_key('uploads_user_id_fkey', 'users', ['user_id'], ['id'])
     # ### end Alembic commands ###
 
 
 def downgrade() -> None:
     # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_constraint(None, 'uploads', type_='foreignkey')
-    op.drop_column('uploads', 'file_path')
-    op.drop_column('uploads', 'user_id')
+    with op.batch_alter_table('uploads') as batch_op:
+        batch_op.drop_constraint('uploads_user_id_fkey', type_='foreignkey')
+        batch_op.drop_column('file_path')
+        batch_op.drop_column('user_id')
     # ### end Alembic commands ###
@@ -0,0 +1,221 @@
+# src/dynamic_batching.py
+"""
+Dynamic padding and token-budget batching for LayoutLMv3 training.
+
+Pages are padded per batch to the longest page in it instead of to 512, and
+pages of similar length are grouped into batches whose padded size stays
+under a token budget, so short pages train in large batches and long pages
+in small ones.
+"""
+
+import os
+import random
+import time
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, Sampler
+from transformers import Trainer, TrainerCallback
+
+from src.preprocessing import MAX_LENGTH
+
+# 224x224 image / 16x16 patches + CLS; every page pays these regardless of text
+VISUAL_TOKENS = (224 // 16) ** 2 + 1
+# default budget = the padded setup's per-device batch (2 x 512 text tokens),
+# so peak activation memory stays the same
+TOKEN_BUDGET = int(os.getenv("UWEZO_TOKEN_BUDGET", str(2 * (MAX_LENGTH + VISUAL_TOKENS))))
+MAX_BATCH_PAGES = int(os.getenv("UWEZO_MAX_BATCH_PAGES", "32"))
+PAD_TO_MULTIPLE_OF = 8
+MODEL_KEYS = ("input_ids", "bbox", "attention_mask", "labels")
+
+
+def padded_length(n_tokens: int, multiple: int = PAD_TO_MULTIPLE_OF) -> int:
+    return min(-(-n_tokens // multiple) * multiple, max(n_tokens, MAX_LENGTH))
+
+
+class DynamicPaddingCollator:
+    """
+    Pad input_ids/bbox/attention_mask/labels to the longest page in the batch
+    (rounded up to a multiple of 8) and stack pixel_values. Extra columns
+    such as "length" are ignored. Keeps running counts of real and padded
+    text tokens for ThroughputCallback; with dataloader workers the counts
+    stay in the workers, so use dataloader_num_workers=0 when reporting.
+    """
+
+    def __init__(self, pad_token_id: int = 1, pad_to_multiple_of: int = PAD_TO_MULTIPLE_OF):
+        self.pad_token_id = pad_token_id
+        self.pad_to_multiple_of = pad_to_multiple_of
+        self.tokens = 0
+        self.padded_tokens = 0
+        self.pages = 0
+
+    def __call__(self, features):
+        n = len(features)
+        lengths = [len(f["input_ids"]) for f in features]
+        width = padded_length(max(lengths), self.pad_to_multiple_of)
+
+        input_ids = torch.full((n, width), self.pad_token_id, dtype=torch.long)
+        bbox = torch.zeros((n, width, 4), dtype=torch.long)
+        attention_mask = torch.zeros((n, width), dtype=torch.long)
+        has_labels = "labels" in features[0]
+        labels = torch.full((n, width), -100, dtype=torch.long) if has_labels else None
+
+        for i, (f, k) in enumerate(zip(features, lengths)):
+            input_ids[i, :k] = torch.as_tensor(np.asarray(f["input_ids"]))
+            bbox[i, :k] = torch.as_tensor(np.asarray(f["bbox"]))
+            attention_mask[i, :k] = torch.as_tensor(np.asarray(f["attention_mask"]))
+            if has_labels:
+                labels[i, :k] = torch.as_tensor(np.asarray(f["labels"]))
+
+        batch = {
+            "input_ids": input_ids,
+            "bbox": bbox,
+            "attention_mask": attention_mask,
+            "pixel_values": torch.stack(
+                [torch.as_tensor(np.asarray(f["pixel_values"]), dtype=torch.float32) for f in features]
+            ),
+        }
+        if has_labels:
+            batch["labels"] = labels
+
+        self.tokens += int(attention_mask.sum())
+        self.padded_tokens += n * width
+        self.pages += n
+        return batch
+
+
+def token_budget_batches(lengths, max_tokens: int = TOKEN_BUDGET, max_pages: int = MAX_BATCH_PAGES):
+    """
+    Group page indices by length into batches whose cost
+    (pages x (padded text length + VISUAL_TOKENS)) stays within max_tokens.
+    A page that alone exceeds the budget gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, current, longest = [], [], 0
+    for i in order:
+        width = padded_length(int(lengths[i]))
+        cost = (len(current) + 1) * (max(longest, width) + VISUAL_TOKENS)
+        if current and (cost > max_tokens or len(current) >= max_pages):
+            batches.append(current)
+            current, longest = [], 0
+        current.append(i)
+        longest = max(longest, width)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class TokenBudgetBatchSampler(Sampler):
+    """
+    Length-grouped batches under a token budget. Batch composition is fixed
+    (so len() is stable for the LR schedule); the batch order is reshuffled
+    every epoch.
+    """
+
+    def __init__(self, lengths, max_tokens: int = TOKEN_BUDGET, max_pages: int = MAX_BATCH_PAGES,
+                 shuffle: bool = True, seed: int = 42):
+        self.batches = token_budget_batches(lengths, max_tokens, max_pages)
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __iter__(self):
+        order = list(range(len(self.batches)))
+        if self.shuffle:
+            random.Random(self.seed + self.epoch).shuffle(order)
+        self.epoch += 1
+        for b in order:
+            yield self.batches[b]
+
+    def __len__(self):
+        return len(self.batches)
+
+
+class TokenBudgetTrainer(Trainer):
+    """Trainer whose training dataloader uses TokenBudgetBatchSampler."""
+
+    def __init__(self, *args, token_budget: int = TOKEN_BUDGET, max_batch_pages: int = MAX_BATCH_PAGES, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.token_budget = token_budget
+        self.max_batch_pages = max_batch_pages
+
+    def get_train_dataloader(self):
+        if self.train_dataset is None:
+            raise ValueError("Trainer: training requires a train_dataset.")
+        sampler = TokenBudgetBatchSampler(
+            self.train_dataset["length"], self.token_budget, self.max_batch_pages, seed=self.args.seed
+        )
+        loader = DataLoader(
+            self.train_dataset,
+            batch_sampler=sampler,
+            collate_fn=self.data_collator,
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory,
+        )
+        return self.accelerator.prepare(loader)
+
+
+class ThroughputCallback(TrainerCallback):
+    """
+    Per-epoch wall time and text-token throughput, read from the collator's
+    counters. "tokens" are real (non-pad) tokens, "padded_tokens" what the
+    model actually processed.
+    """
+
+    def __init__(self, collator: DynamicPaddingCollator):
+        self.collator = collator
+        self.history = []
+        self._start = None
+
+    def _snapshot(self):
+        c = self.collator
+        return time.perf_counter(), c.tokens, c.padded_tokens, c.pages
+
+    def on_epoch_begin(self, args, state, control, **kwargs):
+        self._start = self._snapshot()
+
+    def on_epoch_end(self, args, state, control, **kwargs):
+        if self._start is None:
+            return
+        t1, tok1, pad1, pages1 = self._snapshot()
+        t0, tok0, pad0, pages0 = self._start
+        elapsed = max(t1 - t0, 1e-9)
+        stats = {
+            "epoch": state.epoch,
+            "epoch_time_s": round(elapsed, 2),
+            "pages": pages1 - pages0,
+            "tokens": tok1 - tok0,
+            "padded_tokens": pad1 - pad0,
+            "tokens_per_s": round((tok1 - tok0) / elapsed, 1),
+            "padded_tokens_per_s": round((pad1 - pad0) / elapsed, 1),
+            "pad_fraction": round(1 - (tok1 - tok0) / max(pad1 - pad0, 1), 4),
+        }
+        self.history.append(stats)
+        print(f"[throughput] {stats}")
+
+
+def make_trainer(model, args, train_dataset, eval_dataset, processing_class, compute_metrics,
+                 dynamic: bool, token_budget: int = TOKEN_BUDGET):
+    """
+    Build the Trainer for either mode. Both modes go through
+    DynamicPaddingCollator (a no-op pad on the 512-padded dataset) so their
+    throughput numbers are directly comparable.
+    """
+    collator = DynamicPaddingCollator(pad_token_id=processing_class.tokenizer.pad_token_id)
+    throughput = ThroughputCallback(collator)
+    kwargs = dict(
+        model=model,
+        args=args,
+        train_dataset=train_dataset,
+        eval_dataset=eval_dataset,
+        tokenizer=processing_class,
+        data_collator=collator,
+        compute_metrics=compute_metrics,
+        callbacks=[throughput],
+    )
+    if dynamic:
+        return TokenBudgetTrainer(token_budget=token_budget, **kwargs), throughput
+    return Trainer(**kwargs), throughput
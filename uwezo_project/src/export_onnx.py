@@ -0,0 +1,100 @@
+# src/export_onnx.py
+"""
+Export the fine-tuned LayoutLMv3 checkpoint to ONNX for CPU inference,
+optionally with a dynamically INT8-quantized copy.
+
+Run from uwezo_project/:
+    python -m src.export_onnx [--checkpoint models/layoutlmv3_runs/checkpoint-best] [--quantize]
+"""
+
+import argparse
+from pathlib import Path
+
+import torch
+from PIL import Image
+from transformers import AutoProcessor, LayoutLMv3ForTokenClassification
+
+from src.layout_inference import (
+    MAX_LENGTH,
+    MODEL_INPUTS,
+    MODEL_PATH,
+    ONNX_DIR,
+    ONNX_FILES,
+    PROCESSOR_NAME,
+)
+
+OPSET = 14
+
+
+def _dummy_inputs(processor):
+    enc = processor(
+        images=Image.new("RGB", (224, 224), "white"),
+        text=["opening", "balance"],
+        boxes=[[10, 10, 120, 40], [130, 10, 240, 40]],
+        return_tensors="pt",
+        truncation=True, padding="max_length", max_length=MAX_LENGTH,
+    )
+    return {k: enc[k] for k in MODEL_INPUTS}
+
+
+def export(checkpoint: str = MODEL_PATH, out_dir: Path = ONNX_DIR) -> Path:
+    """
+    Trace the token-classification model to ONNX with dynamic batch/sequence axes.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / ONNX_FILES["onnx"]
+
+    processor = AutoProcessor.from_pretrained(PROCESSOR_NAME, apply_ocr=False)
+    model = LayoutLMv3ForTokenClassification.from_pretrained(checkpoint)
+    model.eval()
+    inputs = _dummy_inputs(processor)
+
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "bbox": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "sequence"},
+        "pixel_values": {0: "batch"},
+        "logits": {0: "batch", 1: "sequence"},
+    }
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (inputs,),  # a trailing dict is passed to forward() as keyword arguments
+            str(out_path),
+            input_names=MODEL_INPUTS,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=OPSET,
+            do_constant_folding=True,
+        )
+    print(f"Exported {checkpoint} -> {out_path}")
+    return out_path
+
+
+def quantize(onnx_path: Path, out_dir: Path = ONNX_DIR) -> Path:
+    """
+    Dynamic INT8 quantization of the MatMul/Gemm weights; activations stay fp32.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    out_path = Path(out_dir) / ONNX_FILES["onnx-int8"]
+    quantize_dynamic(
+        model_input=str(onnx_path),
+        model_output=str(out_path),
+        weight_type=QuantType.QInt8,
+    )
+    print(f"Quantized {onnx_path} -> {out_path}")
+    return out_path
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export LayoutLMv3 to ONNX")
+    ap.add_argument("--checkpoint", default=MODEL_PATH)
+    ap.add_argument("--out-dir", default=str(ONNX_DIR))
+    ap.add_argument("--quantize", action="store_true", help="also write a dynamic INT8 model")
+    args = ap.parse_args()
+
+    path = export(args.checkpoint, Path(args.out_dir))
+    if args.quantize:
+        quantize(path, Path(args.out_dir))
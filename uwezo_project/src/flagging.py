@@ -2,11 +2,23 @@
 Document-level integrity analysis and flagging utilities.
 """
 
+import os
 import cv2
 import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
 from sklearn.ensemble import IsolationForest
 from pathlib import Path
 
+# Tiled forensic analysis settings
+TILED_FORENSICS = os.getenv("UWEZO_TILED_FORENSICS", "0") == "1"
+DCT_BLOCK = 8            # JPEG block size
+TILE = 64                # heatmap cell (pixels)
+STRIP_ROWS = 512         # rows processed at once; bounds float32 temporaries
+MAX_PIXELS = 12_000_000  # larger pages are decoded at 1/2, 1/4 or 1/8 scale
+TOP_K = 5
+
 
 # 1. Numerical anomaly detection
 
@@ -41,13 +53,117 @@ def check_numeric_consistency(fields: dict) -> dict:
     return result
 
 
+# 1b. Row-level running-balance verification
+
+MAX_REPORTED_MISMATCHES = 100
+
+
+def parse_amounts(values) -> pd.Series:
+    """
+    Bulk-parse statement amounts ("1,234.50", "(12.00)", "45.10 Dr", "-") into
+    floats; blanks and unparseable cells become NaN. Parentheses and a
+    trailing Dr mark negative values.
+    """
+    series = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("float64")
+    txt = series.astype("string").str.strip()
+    # fast path: plain "1,234.50" style cells
+    amounts = pd.to_numeric(txt.str.replace(",", "", regex=False), errors="coerce").astype("float64")
+    slow = (amounts.isna() & txt.fillna("").ne("")).to_numpy()
+    if slow.any():
+        rest = txt[slow]
+        negative = (rest.str.match(r"^\(.*\)$", na=False)
+                    | rest.str.contains(r"\bdr\.?$", case=False, regex=True, na=False))
+        parsed = pd.to_numeric(rest.str.replace(r"[^0-9.\-]", "", regex=True), errors="coerce")
+        amounts[slow] = parsed.where(~negative, -parsed.abs()).astype("float64").to_numpy()
+    return amounts
+
+
+def _balance_breaks(balance, movement, opening, tolerance):
+    """
+    Expected balance of every row = last known balance + movements since.
+    Rows without a printed balance just carry the chain forward.
+    """
+    known = ~np.isnan(balance)
+    seg = np.cumsum(known) - known                       # known balances strictly before each row
+    anchors = np.concatenate(([opening], balance[known]))
+    mv = np.cumsum(movement)
+    seg_start = np.concatenate(([0.0], mv[known]))       # cumulative movement at each anchor
+    expected = anchors[seg] + (mv - seg_start[seg])
+    diff = balance - expected
+    bad = known & (np.abs(diff) > tolerance + 1e-9 * np.abs(expected))
+    return expected, diff, bad
+
+
+def check_running_balance(df: pd.DataFrame, opening_balance=None, tolerance: float = 0.01) -> dict:
+    """
+    Verify the running balance of a normalized transaction table
+    (date/debit/credit/balance columns from app.normalize.normalize_columns)
+    row by row, so the row that breaks the chain can be reported.
+    Both chronological and newest-first statements are supported.
+    """
+    result = {"consistency_score": 1.0, "status": "ok", "reason": "", "rows_checked": 0,
+              "order": "ascending", "first_mismatch": None, "mismatch_rows": [], "mismatches": []}
+    if "balance" not in df.columns or df.empty:
+        return result
+
+    n = len(df)
+    balance = parse_amounts(df["balance"]).to_numpy()
+    credit = parse_amounts(df["credit"]).fillna(0).to_numpy() if "credit" in df.columns else np.zeros(n)
+    debit = parse_amounts(df["debit"]).fillna(0).to_numpy() if "debit" in df.columns else np.zeros(n)
+    movement = credit - np.abs(debit)
+
+    known = ~np.isnan(balance)
+    checked = int(known.sum())
+    if checked == 0:
+        result.update({"consistency_score": 0.0, "status": "suspicious",
+                       "reason": "Non‑numeric or missing fields"})
+        return result
+
+    def run(order):
+        bal, mv = (balance, movement) if order == "ascending" else (balance[::-1], movement[::-1])
+        first = np.flatnonzero(~np.isnan(bal))[0]
+        opening = float(opening_balance) if opening_balance is not None else bal[first] - np.sum(mv[:first + 1])
+        expected, diff, bad = _balance_breaks(bal, mv, opening, tolerance)
+        if order == "descending":
+            expected, diff, bad = expected[::-1], diff[::-1], bad[::-1]
+        return expected, diff, bad
+
+    runs = {order: run(order) for order in ("ascending", "descending")}
+    order = min(runs, key=lambda o: (runs[o][2].sum(), o != "ascending"))
+    expected, diff, bad = runs[order]
+
+    positions = np.flatnonzero(bad)
+    labels = df.index.to_numpy()
+    result["rows_checked"] = checked
+    result["order"] = order
+    result["mismatch_rows"] = labels[positions].tolist()
+    result["mismatches"] = [
+        {"row": labels[i].item() if hasattr(labels[i], "item") else labels[i],
+         "expected": round(float(expected[i]), 2),
+         "actual": round(float(balance[i]), 2),
+         "diff": round(float(diff[i]), 2)}
+        for i in positions[:MAX_REPORTED_MISMATCHES]
+    ]
+    if positions.size:
+        result["first_mismatch"] = result["mismatches"][0]
+        result["consistency_score"] = 1.0 - positions.size / checked
+        result["status"] = "suspicious"
+        result["reason"] = (f"Running balance breaks at row {result['first_mismatch']['row']} "
+                            f"({positions.size} of {checked} rows mismatched)")
+    return result
+
+
 # 2. Forensic vision / tampering detection
 
-def detect_forensic_tampering(img_path: Path) -> dict:
+def detect_forensic_tampering(img_path: Path, tiled: bool = TILED_FORENSICS) -> dict:
     """
     Detect potential edits or tampering in an image using simple noise + compression features.
     Advanced implementations can replace this with a trained CNN or tampering API.
     """
+    if tiled:
+        return detect_forensic_tampering_tiled(img_path)
     img = cv2.imread(str(img_path))
     result = {"tamper_score": 0.0, "status": "ok", "reason": ""}
     if img is None:
@@ -71,6 +187,146 @@ def detect_forensic_tampering(img_path: Path) -> dict:
     return result
 
 
+def _dct_matrix(n: int = DCT_BLOCK) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    m[0] /= np.sqrt(2.0)
+    return m.astype(np.float32)
+
+
+_DCT = _dct_matrix()
+
+
+def _read_gray_bounded(img_path: Path):
+    """
+    Decode as grayscale, using libjpeg/OpenCV reduced decoding for very large
+    pages so the uint8 buffer never exceeds MAX_PIXELS. Returns (gray, scale).
+    """
+    try:
+        with Image.open(img_path) as im:
+            W, H = im.size
+    except Exception:
+        return None, 1
+    for factor, flag in [(1, cv2.IMREAD_GRAYSCALE), (2, cv2.IMREAD_REDUCED_GRAYSCALE_2),
+                         (4, cv2.IMREAD_REDUCED_GRAYSCALE_4), (8, cv2.IMREAD_REDUCED_GRAYSCALE_8)]:
+        if (W // factor) * (H // factor) <= MAX_PIXELS or factor == 8:
+            return cv2.imread(str(img_path), flag), factor
+
+
+def _strip_features(strip: np.ndarray, edges: np.ndarray, rows: int, cols: int):
+    """
+    Per-tile AC DCT energy, edge density and pixel coverage for one strip
+    padded to multiples of TILE; rows/cols is the unpadded extent, so padding
+    never dilutes a tile's statistics. Everything is vectorised over 8x8 blocks.
+    """
+    h, w = strip.shape
+    b = DCT_BLOCK
+    blocks = strip.reshape(h // b, b, w // b, b).transpose(0, 2, 1, 3).astype(np.float32) / 255.0
+    coeffs = _DCT @ blocks @ _DCT.T          # 2-D DCT-II of every 8x8 block
+    coeffs[..., 0, 0] = 0.0                   # drop DC, keep compression/noise energy
+    block_energy = np.abs(coeffs).mean(axis=(2, 3))
+
+    valid = np.zeros_like(block_energy)
+    valid[:-(-rows // b), :-(-cols // b)] = 1.0
+    per_tile = TILE // b
+    th, tw = h // TILE, w // TILE
+    energy = (block_energy * valid).reshape(th, per_tile, tw, per_tile).sum(axis=(1, 3))
+    energy /= np.maximum(valid.reshape(th, per_tile, tw, per_tile).sum(axis=(1, 3)), 1.0)
+
+    pixels = np.outer(np.clip(rows - np.arange(th) * TILE, 0, TILE),
+                      np.clip(cols - np.arange(tw) * TILE, 0, TILE)).astype(np.float32)
+    edge = (edges > 0).reshape(th, TILE, tw, TILE).sum(axis=(1, 3)) / np.maximum(pixels, 1.0)
+    return energy, edge, pixels / (TILE * TILE)
+
+
+def _robust_z(values: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    # one-sided: tampering adds DCT energy and edges, so only tiles above the
+    # page median count; quiet, sparse tiles are not evidence
+    ref = values[mask]
+    if ref.size < 2:
+        return np.zeros_like(values)
+    med = np.median(ref)
+    mad = 1.4826 * np.median(np.abs(ref - med)) + 1e-6
+    return np.maximum(values - med, 0.0) / mad
+
+
+def detect_forensic_tampering_tiled(img_path: Path, top_k: int = TOP_K, z_max: float = 6.0) -> dict:
+    """
+    Local tampering analysis: per-tile DCT energy and edge density compared
+    with the rest of the page. Returns a TILE-sized heatmap in [0, 1] and the
+    top-k most inconsistent regions (in original image pixels). The page is
+    processed in horizontal strips so peak memory is bounded by STRIP_ROWS.
+    """
+    result = {"tamper_score": 0.0, "status": "ok", "reason": "", "heatmap": [], "regions": []}
+    gray, scale = _read_gray_bounded(img_path)
+    if gray is None:
+        result.update({"status": "error", "reason": f"Cannot read {img_path}"})
+        return result
+
+    H, W = gray.shape
+    pad_w = (-W) % TILE
+    energies, edges, coverages = [], [], []
+    for y0 in range(0, H, STRIP_ROWS):
+        y1 = min(y0 + STRIP_ROWS, H)
+        # a few rows of context either side keep Canny consistent at strip seams
+        c0, c1 = max(0, y0 - DCT_BLOCK), min(H, y1 + DCT_BLOCK)
+        edge = cv2.Canny(gray[c0:c1], 100, 200)[y0 - c0:y0 - c0 + (y1 - y0)]
+        strip = gray[y0:y1]
+        pad_h = (-(y1 - y0)) % TILE
+        if pad_h or pad_w:
+            strip = cv2.copyMakeBorder(strip, 0, pad_h, 0, pad_w, cv2.BORDER_REPLICATE)
+            edge = cv2.copyMakeBorder(edge, 0, pad_h, 0, pad_w, cv2.BORDER_CONSTANT, value=0)
+        e, d, cov = _strip_features(strip, edge, y1 - y0, W)
+        energies.append(e)
+        edges.append(d)
+        coverages.append(cov)
+    energy = np.vstack(energies)
+    edge_density = np.vstack(edges)
+    coverage = np.vstack(coverages)
+
+    # compare only tiles that carry content; blank margins and slivers are not evidence
+    content = (edge_density > 0.01) & (coverage >= 0.25)
+    z = 0.5 * (np.minimum(_robust_z(energy, content), z_max)
+               + np.minimum(_robust_z(edge_density, content), z_max)) / z_max
+    heatmap = np.where(content, z, 0.0).astype(np.float32)
+
+    k = min(top_k, heatmap.size)
+    top = np.argsort(heatmap, axis=None)[::-1][:k]
+    regions = []
+    for idx in top:
+        r, c = np.unravel_index(idx, heatmap.shape)
+        x1, y1 = int(c * TILE * scale), int(r * TILE * scale)
+        regions.append({
+            "bbox": [x1, y1, int(min((c + 1) * TILE, W) * scale), int(min((r + 1) * TILE, H) * scale)],
+            "score": round(float(heatmap[r, c]), 4),
+            "dct_energy": round(float(energy[r, c]), 5),
+            "edge_density": round(float(edge_density[r, c]), 4),
+        })
+
+    tamper_score = float(np.mean([reg["score"] for reg in regions])) if regions else 0.0
+    result.update({
+        "tamper_score": min(1.0, max(0.0, tamper_score)),
+        "heatmap": np.round(heatmap, 3).tolist(),
+        "tile_size": TILE * scale,
+        "regions": regions,
+    })
+    if result["tamper_score"] > 0.7:
+        result["status"] = "suspicious"
+        result["reason"] = "Localised compression / edge inconsistency, possible manipulation"
+    return result
+
+
+def detect_forensic_tampering_batch(img_paths, tiled: bool = True, max_workers: int = None) -> list:
+    """
+    Run forensic analysis over many pages on a thread pool; OpenCV and the
+    NumPy kernels release the GIL. Results keep the input order.
+    """
+    fn = detect_forensic_tampering_tiled if tiled else (lambda p: detect_forensic_tampering(p, tiled=False))
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        return list(pool.map(fn, img_paths))
+
+
 # 3. Aggregator / ensemble risk scorer
 
 def aggregate_flags(numeric_result: dict, vision_result: dict) -> dict:
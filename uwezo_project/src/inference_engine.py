@@ -0,0 +1,115 @@
+# src/inference_engine.py
+"""
+Resident LayoutLMv3 inference engine with dynamic micro-batching.
+
+Callers submit single pages; a background thread gathers whatever arrives
+within a short window into one batch and runs a single forward pass.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+from src.layout_inference import load_model, predict_fields, predict_fields_batch
+
+MAX_BATCH_SIZE = int(os.getenv("UWEZO_MAX_BATCH_SIZE", "8"))
+MAX_WAIT_MS = float(os.getenv("UWEZO_MAX_WAIT_MS", "10"))
+
+_STOP = object()
+
+
+class InferenceEngine:
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Load the model and start the batching thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            load_model()
+            self._thread = threading.Thread(
+                target=self._run, name="layoutlmv3-batcher", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = None):
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, img_path: Path, ocr_json: Path) -> Future:
+        """Queue one page; the future resolves to its fields dict."""
+        self.start()
+        fut = Future()
+        self._queue.put((Path(img_path), Path(ocr_json), fut))
+        return fut
+
+    def predict(self, img_path: Path, ocr_json: Path, timeout: float = None) -> dict:
+        return self.submit(img_path, ocr_json).result(timeout)
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # re-queue so the run loop exits after this batch
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = self._collect(item)
+            batch = [b for b in batch if b[2].set_running_or_notify_cancel()]
+            if batch:
+                self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        try:
+            results = predict_fields_batch([(img, js) for img, js, _ in batch])
+        except Exception:
+            # one bad page must not fail the whole batch; retry pages one by one
+            for img, js, fut in batch:
+                try:
+                    fut.set_result(predict_fields(img, js))
+                except Exception as e:
+                    fut.set_exception(e)
+            return
+        for (_, _, fut), fields in zip(batch, results):
+            fut.set_result(fields)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> InferenceEngine:
+    """Process-wide engine; the model is loaded once per worker."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = InferenceEngine()
+    return _engine
@@ -1,25 +1,169 @@
-def predict_fields(img_path: Path, ocr_json: Path):
-    data = json.loads(ocr_json.read_text())
-    W,H = data["width"], data["height"]
-    words = [w for w in data["words"] if (w.get("text","").strip())]
+# src/layout_inference.py
+
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import torch
+from PIL import Image
+from transformers import AutoProcessor, LayoutLMv3ForTokenClassification
+
+from src.preprocessing import CLASSES, PROC_IMG, PROC_OCR, id2label, label2id
+
+MODEL_PATH = "models/layoutlmv3_runs/checkpoint-best"
+PROCESSOR_NAME = "microsoft/layoutlmv3-base"
+MAX_LENGTH = 512
+MODEL_INPUTS = ["input_ids", "bbox", "attention_mask", "pixel_values"]
+
+# Inference backend: "torch" (fp32 checkpoint), "onnx" or "onnx-int8" (see src/export_onnx.py)
+BACKEND = os.getenv("UWEZO_INFERENCE_BACKEND", "torch")
+ONNX_DIR = Path(os.getenv("UWEZO_ONNX_DIR", "models/onnx"))
+ONNX_FILES = {"onnx": "layoutlmv3.onnx", "onnx-int8": "layoutlmv3.int8.onnx"}
+ORT_THREADS = int(os.getenv("UWEZO_ORT_THREADS", "0"))
+
+# Sliding-window mode: overlap (in tokens) between consecutive 512-token windows
+WINDOWED = os.getenv("UWEZO_WINDOWED_INFERENCE", "0") == "1"
+WINDOW_STRIDE = int(os.getenv("UWEZO_WINDOW_STRIDE", "128"))
+
+_processor = None
+_backend = None
+_loaded_from = None
+_load_lock = threading.Lock()
+
+
+class TorchBackend:
+    name = "torch"
+
+    def __init__(self, model_path: str = MODEL_PATH):
+        self.model = LayoutLMv3ForTokenClassification.from_pretrained(model_path)
+        self.model.eval()
+
+    def __call__(self, inputs: dict) -> torch.Tensor:
+        with torch.no_grad():
+            return self.model(**inputs).logits
+
+
+class OnnxBackend:
+    def __init__(self, onnx_path: Path, num_threads: int = ORT_THREADS):
+        import onnxruntime as ort  # optional dependency, only needed for this backend
+
+        self.name = Path(onnx_path).name
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            opts.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            str(onnx_path), opts, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def __call__(self, inputs: dict) -> torch.Tensor:
+        feed = {k: v.numpy() for k, v in inputs.items() if k in self.input_names}
+        (logits,) = self.session.run(["logits"], feed)
+        return torch.from_numpy(logits)
+
+
+def make_backend(name: str = BACKEND, model_path: str = MODEL_PATH):
+    """
+    Build an inference backend by name: torch | onnx | onnx-int8.
+    """
+    if name == "torch":
+        return TorchBackend(model_path)
+    if name in ONNX_FILES:
+        path = ONNX_DIR / ONNX_FILES[name]
+        if not path.exists():
+            raise FileNotFoundError(f"{path} not found; run `python -m src.export_onnx` first")
+        return OnnxBackend(path)
+    raise ValueError(f"Unknown inference backend: {name}")
+
+
+def checkpoint_key() -> tuple:
+    """
+    What the served model is loaded from: MODEL_PATH resolved (promotion
+    swaps its symlink, see app/services/retrain.promote_checkpoint) and, for
+    the ONNX backends, the exported file's mtime.
+    """
+    onnx = ONNX_DIR / ONNX_FILES[BACKEND] if BACKEND in ONNX_FILES else None
+    return os.path.realpath(MODEL_PATH), onnx.stat().st_mtime_ns if onnx and onnx.exists() else None
+
+
+def load_model():
+    """
+    Load the processor and inference backend once per process and reuse them;
+    the backend is reloaded when a new checkpoint has been promoted.
+    """
+    global _processor, _backend, _loaded_from
+    key = checkpoint_key()
+    with _load_lock:
+        if _backend is None or key != _loaded_from:
+            if _processor is None:
+                _processor = AutoProcessor.from_pretrained(PROCESSOR_NAME, apply_ocr=False)
+            _backend = make_backend(BACKEND, key[0])
+            _loaded_from = key
+    return _processor, _backend
+
+
+def is_model_loaded() -> bool:
+    return _backend is not None
+
+
+def warm_up():
+    """
+    Load the model and push one synthetic page through it, so the first real
+    request does not pay for weight loading and first-call initialisation.
+    """
+    processor, backend = load_model()
+    image = Image.new("RGB", (224, 224), "white")
+    enc = processor(images=[image], text=[["warmup"]], boxes=[[[0, 0, 100, 100]]],
+                    truncation=True, padding="max_length", max_length=MAX_LENGTH, return_tensors="pt")
+    backend({k: enc[k] for k in MODEL_INPUTS})
+
+
+def model_version() -> str:
+    """
+    Identifier for everything that changes predictions: checkpoint files,
+    backend and windowing mode. Override with UWEZO_MODEL_VERSION. Follows
+    promotions without a restart (see checkpoint_key).
+    """
+    override = os.getenv("UWEZO_MODEL_VERSION")
+    if override:
+        return override
+    return _model_version(checkpoint_key())
+
+
+@lru_cache(maxsize=4)
+def _model_version(key: tuple) -> str:
+    ckpt = Path(key[0])
+    files = sorted(p for p in ckpt.glob("*") if p.is_file()) if ckpt.exists() else []
+    if BACKEND in ONNX_FILES and (ONNX_DIR / ONNX_FILES[BACKEND]).exists():
+        files.append(ONNX_DIR / ONNX_FILES[BACKEND])
+    stats = [(p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in files]
+    digest = hashlib.sha256(repr(stats).encode()).hexdigest()[:12]
+    mode = f"win{WINDOW_STRIDE}" if WINDOWED else "trunc"
+    return f"layoutlmv3-{digest}:{BACKEND}:{mode}"
+
+
+def read_page(img_path: Path, ocr_json: Path):
+    """
+    Load a page image plus its OCR words and 0-1000 scaled boxes.
+    """
+    data = json.loads(Path(ocr_json).read_text())
+    W, H = data["width"], data["height"]
+    words = [w for w in data["words"] if (w.get("text", "").strip())]
     boxes = [[int(1000*w["bbox"][0]/W), int(1000*w["bbox"][1]/H),
               int(1000*w["bbox"][2]/W), int(1000*w["bbox"][3]/H)] for w in words]
+    image = Image.open(img_path).convert("RGB")
+    return image, [w["text"] for w in words], boxes
 
-    enc = processor(
-        images=Image.open(img_path).convert("RGB"),
-        text=[w["text"] for w in words],
-        boxes=boxes,
-        return_tensors="pt",
-        truncation=True, padding="max_length", max_length=512
-    )
-    with torch.no_grad():
-        logits = model(**{k:v for k,v in enc.items() if k in ["input_ids","bbox","attention_mask","pixel_values"]}).logits
-    pred = logits.argmax(-1)[0].tolist()
-    mask = enc["attention_mask"][0].tolist()
-
-    fields = {c:[] for c in CLASSES}
+
+def _decode_fields(pred, mask, texts):
+    fields = {c: [] for c in CLASSES}
     cur_field = None
-    for t, wtxt, m in zip(pred, [w["text"] for w in words], mask):
+    for t, wtxt, m in zip(pred, texts, mask):
         if not m: continue
         tag = id2label.get(t, "O")
         if tag.startswith("B-"):
@@ -29,9 +173,103 @@ def predict_fields(img_path: Path, ocr_json: Path):
             fields[cur_field].append(wtxt)
         else:
             cur_field = None
-    return {k: " ".join(v).strip() for k,v in fields.items()}
+    return {k: " ".join(v).strip() for k, v in fields.items()}
+
+
+def _repair_bio(ids):
+    """An I- tag that does not continue the previous word's field becomes B-."""
+    out, prev = [], "O"
+    for i in ids:
+        tag = id2label.get(i, "O")
+        if tag.startswith("I-") and prev[2:] != tag[2:]:
+            tag = "B-" + tag[2:]
+        out.append(label2id[tag])
+        prev = tag
+    return out
+
+
+def _merge_windows(logits, window_word_ids, window_to_page, word_counts):
+    """
+    Fold token logits from every window back onto per-word BIO tags.
+    Each word is scored by its first sub-token in each window it appears in,
+    weighted towards windows where it sits far from the window edges.
+    Words never seen by the model (truncated away) stay "O".
+    """
+    probs = torch.softmax(logits.float(), -1).numpy()
+    scores = [np.zeros((n, len(id2label)), dtype=np.float32) for n in word_counts]
+    for w, page in enumerate(window_to_page):
+        word_ids = window_word_ids[w]
+        content = [j for j, wid in enumerate(word_ids) if wid is not None]
+        if not content:
+            continue
+        lo, hi = content[0], content[-1]
+        prev = None
+        for j in content:
+            wid = word_ids[j]
+            if wid != prev:
+                scores[page][wid] += (1 + min(j - lo, hi - j)) * probs[w, j]
+            prev = wid
+    return [_repair_bio(s.argmax(-1).tolist()) for s in scores]
+
+
+def encode_pages(processor, pages, windowed: bool = WINDOWED, stride: int = WINDOW_STRIDE):
+    """
+    Encode pages for the model; returns (encoding, model inputs, words per page).
+    """
+    loaded = [read_page(img, js) for img, js in pages]
+    images, texts, boxes = zip(*loaded)
+
+    kwargs = dict(truncation=True, padding="max_length", max_length=MAX_LENGTH, return_tensors="pt")
+    if windowed:
+        kwargs.update(stride=stride, return_overflowing_tokens=True, return_offsets_mapping=True)
+    enc = processor(images=list(images), text=list(texts), boxes=list(boxes), **kwargs)
+
+    inputs = {k: enc[k] for k in MODEL_INPUTS}
+    if isinstance(inputs["pixel_values"], list):
+        # overflow windows repeat their page image as a list of tensors
+        inputs["pixel_values"] = torch.stack(inputs["pixel_values"])
+    return enc, inputs, list(texts)
+
+
+def predict_word_tags_batch(pages, windowed: bool = WINDOWED, stride: int = WINDOW_STRIDE, backend=None):
+    """
+    Run several pages through the model in a single forward pass.
+    pages: list of (img_path, ocr_json); returns (words, label ids) per page.
+
+    With windowed=True, pages longer than MAX_LENGTH tokens are split into
+    overlapping windows (stride tokens of overlap) instead of truncated, and
+    all windows of all pages share the same forward pass.
+    """
+    processor, default_backend = load_model()
+    backend = backend or default_backend
+    enc, inputs, texts = encode_pages(processor, pages, windowed, stride)
+    logits = backend(inputs)
+
+    if windowed:
+        window_to_page = enc["overflow_to_sample_mapping"].tolist()
+    else:
+        window_to_page = list(range(len(pages)))
+    window_word_ids = [enc.word_ids(i) for i in range(len(window_to_page))]
+    tags = _merge_windows(logits, window_word_ids, window_to_page, [len(t) for t in texts])
+    return list(zip(texts, tags))
+
+
+def predict_fields_batch(pages, windowed: bool = WINDOWED, stride: int = WINDOW_STRIDE):
+    """
+    Predict the fields dict for each of several pages in one forward pass.
+    """
+    return [
+        _decode_fields(ids, [1] * len(ids), words)
+        for words, ids in predict_word_tags_batch(pages, windowed, stride)
+    ]
+
+
+def predict_fields(img_path: Path, ocr_json: Path, windowed: bool = WINDOWED):
+    return predict_fields_batch([(img_path, ocr_json)], windowed)[0]
+
 
-# example
-ex_img = (PROC_IMG/"val").rglob("*.jpg").__next__()
-ex_json = PROC_OCR/"val"/(ex_img.stem + ".json")
-print(predict_fields(ex_img, ex_json))
+if __name__ == "__main__":
+    # example
+    ex_img = (PROC_IMG/"val").rglob("*.jpg").__next__()
+    ex_json = PROC_OCR/"val"/(ex_img.stem + ".json")
+    print(predict_fields(ex_img, ex_json))
@@ -1,8 +1,15 @@
 # src/preprocessing.py
 
+import hashlib
 import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from datasets import Dataset, DatasetDict
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datasets import Dataset, DatasetDict, load_from_disk
 from transformers import LayoutLMv3Processor
 from PIL import Image
 
@@ -10,6 +17,10 @@ from PIL import Image
 PROC_IMG = Path("processed/images")
 PROC_OCR = Path("processed/ocr")
 YOLO_ROOT = Path("yolo")
+CACHE_DIR = Path("processed/cache")
+PROCESSOR_NAME = "microsoft/layoutlmv3-base"
+MAX_LENGTH = 512
+ENCODED_CACHE_KEEP = 3  # most recent encoded datasets kept on disk
 
 # Label definitions
 CLASSES = [
@@ -43,69 +54,287 @@ def center_in(box, x, y):
     return x1 <= x <= x2 and y1 <= y <= y2
 
 
+# bound the words x fields membership matrix so huge pages stay cheap on memory
+MAX_PAIRS_PER_CHUNK = 4_000_000
+
+
+def _first_hit(centers, field_boxes):
+    """
+    Index of the first field box containing each word center (-1 if none),
+    computed by broadcasting word centers against all field boxes.
+    """
+    hits = np.full(len(centers), -1, dtype=np.int64)
+    step = max(1, MAX_PAIRS_PER_CHUNK // max(len(field_boxes), 1))
+    for s in range(0, len(centers), step):
+        cx = centers[s:s + step, 0:1]
+        cy = centers[s:s + step, 1:2]
+        inside = ((field_boxes[:, 0] <= cx) & (cx <= field_boxes[:, 2])
+                  & (field_boxes[:, 1] <= cy) & (cy <= field_boxes[:, 3]))
+        any_hit = inside.any(axis=1)
+        hits[s:s + step] = np.where(any_hit, inside.argmax(axis=1), -1)
+    return hits
+
+
 def to_bio(words, fields):
     tags = ["O"] * len(words)
-    for i, w in enumerate(words):
-        x1, y1, x2, y2 = w["bbox"]
-        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-        hit = None
-        for f in fields:
-            if center_in(f["bbox"], cx, cy):
-                hit = f["name"]
-                break
-        if hit:
-            prev = tags[i - 1] if i > 0 else "O"
-            prefix = "I-" if prev.endswith(hit) else "B-"
-            tags[i] = f"{prefix}{hit}"
+    if not words or not fields:
+        return tags
+
+    wb = np.asarray([w["bbox"] for w in words], dtype=np.float64)
+    centers = np.stack([(wb[:, 0] + wb[:, 2]) // 2, (wb[:, 1] + wb[:, 3]) // 2], axis=1)
+    first = _first_hit(centers, np.asarray([f["bbox"] for f in fields], dtype=np.float64))
+
+    # map field index -> class name code; prev.endswith(hit) on the tag reduces
+    # to a suffix test between class names (names contain no "-")
+    names = sorted({f["name"] for f in fields})
+    code_of = {n: i for i, n in enumerate(names)}
+    field_code = np.array([code_of[f["name"]] for f in fields] + [-1])
+    hit = field_code[first]  # first == -1 picks the trailing -1
+    suffix = np.array([[a.endswith(b) for b in names] for a in names])
+
+    prev = np.concatenate(([-1], hit[:-1]))
+    cont = (hit >= 0) & (prev >= 0)
+    cont[cont] = suffix[prev[cont], hit[cont]]
+
+    for i in np.flatnonzero(hit >= 0):
+        tags[i] = ("I-" if cont[i] else "B-") + names[hit[i]]
     return tags
 
 
+def boxes_1000(words, W, H) -> list:
+    """Word boxes in LayoutLMv3's 0-1000 page coordinates."""
+    return [
+        [
+            int(1000 * w["bbox"][0] / W),
+            int(1000 * w["bbox"][1] / H),
+            int(1000 * w["bbox"][2] / W),
+            int(1000 * w["bbox"][3] / H),
+        ]
+        for w in words
+    ]
+
+
+def page_example(jp: Path, lbl_split: Path) -> dict:
+    """Build one training example from an OCR JSON and its YOLO label file."""
+    data = json.loads(jp.read_text())
+    W, H = data["width"], data["height"]
+    words = [w for w in data["words"] if w.get("text", "").strip()]
+    img_path = Path(data["image_path"])
+    lbl = lbl_split / (img_path.stem + ".txt")
+    fields = load_yolo(lbl, W, H)
+    tags = to_bio(words, fields)
+
+    return {
+        "image_path": str(img_path),
+        "words": [w["text"] for w in words],
+        "boxes": boxes_1000(words, W, H),
+        "labels": [label2id[t] for t in tags],
+        "label_path": str(lbl),
+    }
+
+
 def page_examples(split):
-    IMG_SPLIT = PROC_IMG / split
     OCR_SPLIT = PROC_OCR / split
     LBL_SPLIT = YOLO_ROOT / "labels" / split
 
     items = []
     for jp in sorted(OCR_SPLIT.glob("*.json")):
-        data = json.loads(jp.read_text())
-        W, H = data["width"], data["height"]
-        words = [w for w in data["words"] if w.get("text", "").strip()]
-        img_path = Path(data["image_path"])
-        lbl = LBL_SPLIT / (img_path.stem + ".txt")
-        fields = load_yolo(lbl, W, H)
-        tags = to_bio(words, fields)
-
-        boxes_1000 = [
-            [
-                int(1000 * w["bbox"][0] / W),
-                int(1000 * w["bbox"][1] / H),
-                int(1000 * w["bbox"][2] / W),
-                int(1000 * w["bbox"][3] / H),
-            ]
-            for w in words
-        ]
-        items.append(
-            {
-                "image_path": str(img_path),
-                "words": [w["text"] for w in words],
-                "boxes": boxes_1000,
-                "labels": [label2id[t] for t in tags],
-            }
-        )
+        item = page_example(jp, LBL_SPLIT)
+        del item["label_path"]
+        items.append(item)
     return items
 
 
-def get_dataset():
-    train_items = page_examples("train")
-    val_items = page_examples("val")
-    test_items = page_examples("test")
+# Parallel, incrementally cached page examples
+
+EXAMPLE_COLUMNS = ["image_path", "words", "boxes", "labels"]
+CACHE_SCHEMA = pa.schema([
+    ("image_path", pa.string()),
+    ("words", pa.list_(pa.string())),
+    ("boxes", pa.list_(pa.list_(pa.int64()))),
+    ("labels", pa.list_(pa.int64())),
+    ("ocr_path", pa.string()),
+    ("ocr_fp", pa.string()),
+    ("label_path", pa.string()),
+    ("label_fp", pa.string()),
+])
+
+
+def file_fingerprint(path) -> str:
+    """path + mtime + size; "missing" if the file does not exist."""
+    path = Path(path)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return "missing"
+    return f"{path}:{st.st_mtime_ns}:{st.st_size}"
+
+
+def _cached_example(args):
+    jp, lbl_split = args
+    item = page_example(jp, lbl_split)
+    item["ocr_path"] = str(jp)
+    item["ocr_fp"] = file_fingerprint(jp)
+    item["label_fp"] = file_fingerprint(item["label_path"])
+    return item
+
+
+def build_page_examples(split, cache_dir: Path = CACHE_DIR, workers: int = None) -> Path:
+    """
+    Build the page examples of a split into cache_dir/pages_<split>.parquet.
+    Rows whose OCR JSON and label file fingerprints are unchanged are reused;
+    only new or modified pages are re-parsed, on a process pool.
+    """
+    ocr_split = PROC_OCR / split
+    lbl_split = YOLO_ROOT / "labels" / split
+    out = Path(cache_dir) / f"pages_{split}.parquet"
+
+    cached = {}
+    if out.exists():
+        for row in pq.read_table(out).to_pylist():
+            cached[row["ocr_path"]] = row
+
+    rows, todo = {}, []
+    for jp in sorted(ocr_split.glob("*.json")):
+        row = cached.get(str(jp))
+        if (row is not None and row["ocr_fp"] == file_fingerprint(jp)
+                and row["label_fp"] == file_fingerprint(row["label_path"])):
+            rows[str(jp)] = row
+        else:
+            todo.append((jp, lbl_split))
+
+    if todo:
+        workers = workers or os.cpu_count() or 1
+        if workers > 1 and len(todo) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                built = list(pool.map(_cached_example, todo, chunksize=16))
+        else:
+            built = [_cached_example(t) for t in todo]
+        for item in built:
+            rows[item["ocr_path"]] = item
+
+    if todo or len(rows) != len(cached) or not out.exists():
+        out.parent.mkdir(parents=True, exist_ok=True)
+        ordered = [rows[k] for k in sorted(rows)]
+        table = pa.Table.from_pylist(ordered, schema=CACHE_SCHEMA)
+        tmp = out.with_suffix(".parquet.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, out)
+    print(f"[{split}] {len(rows)} pages ({len(todo)} rebuilt, {len(rows) - len(todo)} cached)")
+    return out
+
+
+def cached_page_dataset(split, cache_dir: Path = CACHE_DIR, workers: int = None) -> Dataset:
+    """Page examples of a split as a Dataset backed by the parquet cache."""
+    path = build_page_examples(split, cache_dir, workers)
+    return Dataset(pq.read_table(path, columns=EXAMPLE_COLUMNS))
+
+
+def page_keys(split, cache_dir: Path = CACHE_DIR, extra=()) -> list:
+    """
+    One key per page of a split, in dataset order: the OCR path plus its OCR
+    and label fingerprints, so a relabelled page counts as a new page.
+    extra: further page tables appended to the split, as in get_dataset.
+    """
+    keys = []
+    for path in [Path(cache_dir) / f"pages_{split}.parquet", *_existing(extra)]:
+        table = pq.read_table(path, columns=["ocr_path", "ocr_fp", "label_fp"])
+        keys.extend(f"{r['ocr_path']}|{r['ocr_fp']}|{r['label_fp']}" for r in table.to_pylist())
+    return keys
+
+
+def _existing(paths) -> list:
+    return [Path(p) for p in paths if Path(p).exists()]
+
+
+# Encoded dataset cache
+
+SPLITS = {"train": "train", "validation": "val", "test": "test"}
+
+
+def source_fingerprint(page_tables: dict) -> str:
+    """
+    Fingerprint of everything encoding reads: the OCR/label fingerprints in
+    the page caches plus each page image's path, mtime and size. Values are
+    one page table path or a list of them.
+    """
+    h = hashlib.sha256()
+    for name in sorted(page_tables):
+        h.update(name.encode())
+        paths = page_tables[name] if isinstance(page_tables[name], list) else [page_tables[name]]
+        for path in paths:
+            table = pq.read_table(path, columns=["image_path", "ocr_fp", "label_fp"])
+            for row in table.to_pylist():
+                h.update(row["ocr_fp"].encode())
+                h.update(row["label_fp"].encode())
+                h.update(file_fingerprint(row["image_path"]).encode())
+    return h.hexdigest()
+
+
+def encoded_cache_key(source_fp: str, processor_name: str = PROCESSOR_NAME,
+                      max_length: int = MAX_LENGTH, labels=BIO_LABELS,
+                      dynamic_padding: bool = False) -> str:
+    payload = json.dumps(
+        {"processor": processor_name, "max_length": max_length,
+         "labels": list(labels), "source": source_fp,
+         "padding": "dynamic" if dynamic_padding else "max_length"},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _prune_encoded(root: Path, keep: int = ENCODED_CACHE_KEEP):
+    entries = sorted((p for p in root.iterdir() if p.is_dir()), key=lambda p: p.stat().st_mtime, reverse=True)
+    for stale in entries[keep:]:
+        shutil.rmtree(stale, ignore_errors=True)
+
+
+def get_dataset(cache_dir: Path = CACHE_DIR, rebuild: bool = False, dynamic_padding: bool = False,
+                extra_train=()):
+    """
+    Encoded train/validation/test splits. The encoded DatasetDict is saved
+    under cache_dir/encoded/<key> and memory-mapped on later calls; the key
+    covers the processor, max_length, BIO_LABELS and the source data, so any
+    change to those re-encodes.
+
+    dynamic_padding=True leaves pages unpadded (truncated at max_length) for
+    batch-wise padding by src.dynamic_batching.DynamicPaddingCollator. Both
+    variants carry a "length" column with each page's real token count.
+
+    extra_train: further page tables (CACHE_SCHEMA parquet files, e.g. the
+    reviewed-document pages of src.retrain_data.ShardStore) appended to the
+    train split; missing files are skipped.
+    """
+    cache_dir = Path(cache_dir)
+    page_tables = {name: [build_page_examples(split, cache_dir)] for name, split in SPLITS.items()}
+    page_tables["train"] += _existing(extra_train)
+    key = encoded_cache_key(source_fingerprint(page_tables), dynamic_padding=dynamic_padding)
+    encoded_root = cache_dir / "encoded"
+    target = encoded_root / key
+
+    if target.exists() and not rebuild:
+        print(f"Loading encoded dataset from {target}")
+        return load_from_disk(str(target)), id2label, label2id, BIO_LABELS
 
     processor = LayoutLMv3Processor.from_pretrained(
-        "microsoft/layoutlmv3-base", apply_ocr=False
+        PROCESSOR_NAME, apply_ocr=False
     )
 
     def encode_batch(batch):
         images = [Image.open(p).convert("RGB") for p in batch["image_path"]]
+        if dynamic_padding:
+            enc = processor(
+                images=images,
+                text=batch["words"],
+                boxes=batch["boxes"],
+                word_labels=batch["labels"],
+                truncation=True,
+                padding=False,
+                max_length=MAX_LENGTH,
+            )
+            out = dict(enc)
+            out["length"] = [len(ids) for ids in enc["input_ids"]]
+            return out
         enc = processor(
             images=images,
             text=batch["words"],
@@ -113,19 +342,27 @@ def get_dataset():
             word_labels=batch["labels"],
             truncation=True,
             padding="max_length",
-            max_length=512,
+            max_length=MAX_LENGTH,
             return_tensors="pt",
         )
-        return {k: v.numpy() for k, v in enc.items()}
-
-    ds = DatasetDict(
-        {
-            "train": Dataset.from_list(train_items),
-            "validation": Dataset.from_list(val_items),
-            "test": Dataset.from_list(test_items),
-        }
-    )
+        out = {k: v.numpy() for k, v in enc.items()}
+        out["length"] = enc["attention_mask"].sum(dim=1).numpy()
+        return out
+
+    ds = DatasetDict({
+        name: Dataset(pa.concat_tables(pq.read_table(p, columns=EXAMPLE_COLUMNS) for p in paths))
+        for name, paths in page_tables.items()
+    })
     encoded = ds.map(
         encode_batch, batched=True, remove_columns=ds["train"].column_names
     )
-    return encoded, id2label, label2id, BIO_LABELS
+
+    encoded_root.mkdir(parents=True, exist_ok=True)
+    tmp = encoded_root / f".{key}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    encoded.save_to_disk(str(tmp))
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    _prune_encoded(encoded_root)
+    # reload so callers get the memory-mapped copy rather than in-memory tables
+    return load_from_disk(str(target)), id2label, label2id, BIO_LABELS
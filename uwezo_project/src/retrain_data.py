@@ -0,0 +1,299 @@
+# src/retrain_data.py
+"""
+Incremental retraining data: reviewed extracted fields are appended to a
+parquet shard store under processed/cache/retrain, and each retrain only
+pulls the documents reviewed since the last high-water mark.
+
+    store = ShardStore()
+    store.append(engine)                 # stream new reviewed rows into a new shard
+    docs = store.pending_documents()     # {upload_id: {field: [values]}} not yet paged
+    ...OCR each document, label its words with label_words()...
+    store.add_pages(rows, docs)          # -> store.pages_path, a train page table
+    ...train with get_dataset(extra_train=[store.pages_path])...
+    store.record_model(version)
+
+The watermark is the last review id consumed (reviews arrive for old
+uploads too, so upload ids alone would miss them); the newest upload id and
+timestamp seen are kept alongside for reference. Every new review (re-)enters
+its document, so a later review (e.g. one asking for a retrain) brings back
+a document whose earlier review found it unprocessed, and the newest shard's
+copy of a document wins. Review ids are handed out at insert but commit out
+of order, so the last REVIEW_OVERLAP ids below the watermark are scanned
+again and the ids already consumed there are kept in the manifest. Rows are
+streamed with a server-side cursor where the driver has one (Postgres), so
+memory stays at one chunk.
+
+Reviewed documents become training pages: the app re-OCRs the stored
+upload and label_words() tags the words that spell out each reviewed field
+value. The pages go to pages_reviewed.parquet (same columns as the
+src.preprocessing page caches), which training appends to the train split.
+The manifest's "paged_shards" counts the shards already turned into pages.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import and_, column, exists, func, select, table, true
+
+SHARD_DIR = Path("processed/cache/retrain")  # next to src.preprocessing.CACHE_DIR's caches
+STREAM_CHUNK = int(os.getenv("UWEZO_RETRAIN_STREAM_CHUNK", "5000"))
+# review ids below the watermark re-scanned for reviews that committed late
+REVIEW_OVERLAP = int(os.getenv("UWEZO_RETRAIN_REVIEW_OVERLAP", "1000"))
+SHARD_SCHEMA = pa.schema([
+    ("upload_id", pa.int64()),
+    ("field_name", pa.string()),
+    ("field_value", pa.string()),
+])
+
+# lightweight table handles: src/ does not import the app's ORM models
+uploads = table("uploads", column("id"), column("processed"), column("uploaded_at"))
+fields = table("extractedfields", column("id"), column("upload_id"), column("field_name"), column("field_value"))
+reviews = table("reviews", column("id"), column("document_id"))
+
+# the columns of src.preprocessing.CACHE_SCHEMA (not imported: that module loads the training stack)
+PAGE_SCHEMA = pa.schema([
+    ("image_path", pa.string()),
+    ("words", pa.list_(pa.string())),
+    ("boxes", pa.list_(pa.list_(pa.int64()))),
+    ("labels", pa.list_(pa.int64())),
+    ("ocr_path", pa.string()),
+    ("ocr_fp", pa.string()),
+    ("label_path", pa.string()),
+    ("label_fp", pa.string()),
+])
+
+EMPTY_WATERMARK = {"review_id": 0, "upload_id": None, "uploaded_at": None, "recent_review_ids": []}
+
+
+def _norm(text: str) -> str:
+    return "".join(ch for ch in text.casefold() if ch.isalnum())
+
+
+def label_words(words, fields: dict):
+    """
+    BIO tags for a page's OCR words from reviewed field values: every run of
+    consecutive words that spells out a value (ignoring case, spacing and
+    punctuation) is tagged B-<field> I-<field> .... fields maps field name
+    to a list of values. Returns (tags, matched), matched being the field
+    names found on the page; words already tagged are not retagged.
+    """
+    tags = ["O"] * len(words)
+    norm = [_norm(w) for w in words]
+    matched = set()
+    for name, values in fields.items():
+        for value in values:
+            target = _norm(value or "")
+            if not target:
+                continue
+            for start in range(len(words)):
+                if not norm[start] or not target.startswith(norm[start]) or tags[start] != "O":
+                    continue
+                end, spelled = start, ""
+                while end < len(words) and len(spelled) < len(target) and tags[end] == "O":
+                    spelled += norm[end]
+                    end += 1
+                if spelled != target:
+                    continue
+                tags[start] = f"B-{name}"
+                for i in range(start + 1, end):
+                    tags[i] = f"I-{name}"
+                matched.add(name)
+    return tags, matched
+
+
+def fields_fingerprint(fields: dict) -> str:
+    payload = json.dumps({k: sorted(v) for k, v in fields.items()}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def reviewed_documents(after_review_id: int, upto_review_id: int, skip_review_ids=()):
+    """Documents with a review id in (after_review_id, upto_review_id] other than skip_review_ids."""
+    q = select(reviews.c.document_id).where(reviews.c.id > after_review_id, reviews.c.id <= upto_review_id)
+    if skip_review_ids:
+        q = q.where(reviews.c.id.not_in(sorted(skip_review_ids)))
+    return q.distinct()
+
+
+def new_rows_query(after_review_id: int, upto_review_id: int, skip_review_ids=()):
+    return (
+        select(fields.c.upload_id, fields.c.field_name, fields.c.field_value, uploads.c.uploaded_at)
+        .join(uploads, uploads.c.id == fields.c.upload_id)
+        .where(uploads.c.processed == true())
+        .where(uploads.c.id.in_(reviewed_documents(after_review_id, upto_review_id, skip_review_ids)))
+        .order_by(fields.c.upload_id, fields.c.id)
+    )
+
+
+def _review_ids(conn, after_review_id: int, upto_review_id: int) -> set:
+    return set(conn.execute(
+        select(reviews.c.id).where(reviews.c.id > after_review_id, reviews.c.id <= upto_review_id)
+    ).scalars())
+
+
+def _iso(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
+class ShardStore:
+    def __init__(self, root: Path = SHARD_DIR):
+        self.root = Path(root)
+        self.manifest_path = self.root / "manifest.json"
+
+    @property
+    def pages_path(self) -> Path:
+        return self.root / "pages_reviewed.parquet"
+
+    @property
+    def page_dir(self) -> Path:
+        """Where rendered pages and their OCR JSON are kept, one directory per upload."""
+        return self.root / "pages"
+
+    def manifest(self) -> dict:
+        if not self.manifest_path.exists():
+            return {"shards": [], "watermark": dict(EMPTY_WATERMARK), "models": {}, "paged_shards": 0}
+        manifest = json.loads(self.manifest_path.read_text())
+        manifest.setdefault("paged_shards", 0)
+        return manifest
+
+    def _save(self, manifest: dict):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp, self.manifest_path)
+
+    @property
+    def watermark(self) -> dict:
+        return self.manifest()["watermark"]
+
+    def append(self, engine, chunk_size: int = STREAM_CHUNK) -> int:
+        """
+        Stream the rows of documents reviewed since the watermark into a new
+        shard and advance the watermark. Returns the number of rows added.
+        """
+        manifest = self.manifest()
+        wm = manifest["watermark"]
+        consumed = set(wm.get("recent_review_ids", []))
+        after = max(wm["review_id"] - REVIEW_OVERLAP, 0)
+        with engine.connect() as conn:
+            # fix the upper bound first so reviews landing mid-stream wait for the next run
+            upto = max(conn.execute(select(func.max(reviews.c.id))).scalar() or 0, wm["review_id"])
+            # ids at or below the watermark that were consumed already; the rest committed late
+            overlap = _review_ids(conn, after, wm["review_id"])
+            skip = consumed & overlap
+            if upto == wm["review_id"] and skip == overlap:
+                return 0
+            recent = _review_ids(conn, max(upto - REVIEW_OVERLAP, 0), upto)
+            self.root.mkdir(parents=True, exist_ok=True)
+            name = f"shard_{len(manifest['shards']):05d}_{wm['review_id']}_{upto}.parquet"
+            tmp = self.root / (name + ".tmp")
+            added, last_upload, last_at = 0, wm["upload_id"], wm["uploaded_at"]
+            result = conn.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(
+                new_rows_query(after, upto, skip)
+            )
+            with pq.ParquetWriter(tmp, SHARD_SCHEMA) as writer:
+                for chunk in result.partitions(chunk_size):
+                    writer.write_table(pa.Table.from_pydict({
+                        "upload_id": [r.upload_id for r in chunk],
+                        "field_name": [r.field_name for r in chunk],
+                        "field_value": [r.field_value for r in chunk],
+                    }, schema=SHARD_SCHEMA))
+                    added += len(chunk)
+                    tail = chunk[-1]
+                    if last_upload is None or tail.upload_id > last_upload:
+                        last_upload, last_at = tail.upload_id, _iso(tail.uploaded_at)
+
+        if added:
+            os.replace(tmp, self.root / name)
+            manifest["shards"].append({"file": name, "rows": added,
+                                       "review_ids": [wm["review_id"], upto]})
+        else:
+            tmp.unlink(missing_ok=True)
+        manifest["watermark"] = {"review_id": upto, "upload_id": last_upload, "uploaded_at": last_at,
+                                 "recent_review_ids": sorted(recent)}
+        self._save(manifest)
+        print(f"[retrain data] +{added} rows from reviews {wm['review_id']}..{upto} "
+              f"({sum(s['rows'] for s in manifest['shards'])} total in {len(manifest['shards'])} shards)")
+        return added
+
+    def rows(self, columns=("field_name", "field_value")) -> list:
+        """
+        All stored rows as tuples, oldest shard first; a document stored again
+        by a later review keeps only its newest shard's rows.
+        """
+        shards = [self.root / s["file"] for s in self.manifest()["shards"]]
+        if not shards:
+            return []
+        tables = [pq.read_table(p, columns=sorted({"upload_id", *columns})) for p in shards]
+        newest = {}
+        for i, t in enumerate(tables):
+            newest.update(dict.fromkeys(t.column("upload_id").to_pylist(), i))
+        out = []
+        for i, t in enumerate(tables):
+            cols = [t.column(c).to_pylist() for c in columns]
+            out.extend(row for upload_id, row in zip(t.column("upload_id").to_pylist(), zip(*cols))
+                       if newest[upload_id] == i)
+        return out
+
+    def pending_documents(self) -> dict:
+        """
+        {upload_id: {field_name: [values]}} for the shards not yet turned into
+        pages (see add_pages), the newest shard's copy of each document;
+        empty field values are left out.
+        """
+        manifest = self.manifest()
+        docs = {}
+        for shard in manifest["shards"][manifest["paged_shards"]:]:
+            table = pq.read_table(self.root / shard["file"])
+            shard_docs = defaultdict(lambda: defaultdict(list))
+            for upload_id, name, value in zip(*(table.column(c).to_pylist() for c in SHARD_SCHEMA.names)):
+                if value and value.strip():
+                    shard_docs[upload_id][name].append(value)
+            docs.update((upload_id, dict(fields)) for upload_id, fields in shard_docs.items())
+        return docs
+
+    def add_pages(self, rows: list, documents) -> int:
+        """
+        Add page rows (PAGE_SCHEMA dicts) to the reviewed-page table and mark
+        every pending shard as paged; rows of the same documents
+        (label_path "review:<upload_id>") are replaced. documents are the
+        upload ids that were processed. Returns the number of pages stored.
+        """
+        replaced = {f"review:{upload_id}" for upload_id in documents}
+        kept = []
+        if self.pages_path.exists():
+            kept = [r for r in pq.read_table(self.pages_path).to_pylist() if r["label_path"] not in replaced]
+        table = pa.Table.from_pylist(kept + list(rows), schema=PAGE_SCHEMA)
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.pages_path.with_suffix(".parquet.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, self.pages_path)
+        manifest = self.manifest()
+        manifest["paged_shards"] = len(manifest["shards"])
+        self._save(manifest)
+        return table.num_rows
+
+    def record_model(self, version: str, watermark: dict = None):
+        """Remember which data a model version was trained on."""
+        manifest = self.manifest()
+        manifest["models"][version] = dict(watermark or manifest["watermark"],
+                                           recorded_at=datetime.utcnow().isoformat())
+        self._save(manifest)
+
+    def reset(self):
+        """Drop every shard and page; the next append re-reads the full history."""
+        for s in self.manifest()["shards"]:
+            (self.root / s["file"]).unlink(missing_ok=True)
+        self.pages_path.unlink(missing_ok=True)
+        shutil.rmtree(self.page_dir, ignore_errors=True)
+        manifest = self.manifest()
+        self._save({"shards": [], "watermark": dict(EMPTY_WATERMARK), "models": manifest["models"],
+                    "paged_shards": 0})
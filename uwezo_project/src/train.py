@@ -1,17 +1,58 @@
 # src/train.py
+"""
+Fine-tune LayoutLMv3. UWEZO_TRAIN_MODE selects the batching:
+  padded   every page padded to 512 tokens, 2 pages per batch (original setup)
+  dynamic  per-batch padding, length-grouped batches under UWEZO_TOKEN_BUDGET
+Per-epoch tokens/sec and epoch time are written to <output_dir>/throughput_<mode>.json.
+
+Run as a script (python -m src.train) or call train() with extra Trainer
+callbacks, e.g. ProgressCallback for the background retrain job.
+
+train(extra_train=[...]) appends further page tables to the train split;
+the retrain job passes the pages built from reviewed documents.
+
+Warm start (UWEZO_WARM_START=1 or train(warm_start=True)) resumes from
+models/layoutlmv3_runs/checkpoint-best instead of the base model and
+fine-tunes on the pages that checkpoint has not seen plus a replay sample
+of the ones it has (UWEZO_REPLAY_RATIO x the new pages), for at most
+UWEZO_WARM_EPOCHS epochs with early stopping. UWEZO_FREEZE_LAYERS freezes
+the embeddings and that many of the lowest encoder layers. The report
+compares wall time and F1 with the full run recorded in the checkpoint.
+"""
+import json
+import os
+import random
+import time
 import numpy as np
 import evaluate
 from pathlib import Path
 from transformers import (
     AutoProcessor,
+    EarlyStoppingCallback,
     LayoutLMv3ForTokenClassification,
-    Trainer,
+    TrainerCallback,
     TrainingArguments,
 )
-from src.preprocessing import get_dataset
+from src.dynamic_batching import TOKEN_BUDGET, make_trainer
+from src.preprocessing import CACHE_DIR, SPLITS, get_dataset, page_keys
+
+TRAIN_MODE = os.getenv("UWEZO_TRAIN_MODE", "padded")
+if TRAIN_MODE not in ("padded", "dynamic"):
+    raise ValueError(f"UWEZO_TRAIN_MODE must be padded or dynamic, got {TRAIN_MODE!r}")
+DYNAMIC = TRAIN_MODE == "dynamic"
+RUNS_DIR = "models/layoutlmv3_runs"
+BEST_CHECKPOINT = os.path.join(RUNS_DIR, "checkpoint-best")  # served by src.layout_inference
+BASE_MODEL = "microsoft/layoutlmv3-base"
+EPOCHS = 10
+# checkpoint metadata: which pages it was trained on and what the run cost
+META_FILE = "training_meta.json"
 
-# Build dataset
-encoded, id2label, label2id, BIO_LABELS = get_dataset()
+WARM_START = os.getenv("UWEZO_WARM_START", "0") == "1"
+WARM_EPOCHS = float(os.getenv("UWEZO_WARM_EPOCHS", "3"))
+WARM_LR = float(os.getenv("UWEZO_WARM_LR", "2e-5"))
+REPLAY_RATIO = float(os.getenv("UWEZO_REPLAY_RATIO", "1.0"))
+FREEZE_LAYERS = int(os.getenv("UWEZO_FREEZE_LAYERS", "0"))
+EARLY_STOPPING_PATIENCE = int(os.getenv("UWEZO_EARLY_STOPPING_PATIENCE", "1"))
 
 metric = evaluate.load("seqeval")
 
@@ -29,50 +70,229 @@ def _align_predictions(predictions, labels, id2label):
         true_labels.append(tl)
     return true_preds, true_labels
 
-def compute_metrics(eval_pred):
-    predictions, labels = eval_pred
-    preds, refs = _align_predictions(predictions, labels, id2label)
-    res = metric.compute(predictions=preds, references=refs)
-    return {
-        "precision": res["overall_precision"],
-        "recall": res["overall_recall"],
-        "f1": res["overall_f1"],
-        "accuracy": res["overall_accuracy"],
-    }
+def metrics_fn(id2label):
+    def compute_metrics(eval_pred):
+        predictions, labels = eval_pred
+        preds, refs = _align_predictions(predictions, labels, id2label)
+        res = metric.compute(predictions=preds, references=refs)
+        return {
+            "precision": res["overall_precision"],
+            "recall": res["overall_recall"],
+            "f1": res["overall_f1"],
+            "accuracy": res["overall_accuracy"],
+        }
+    return compute_metrics
 
-num_labels = len(BIO_LABELS)
-processor = AutoProcessor.from_pretrained(
-    "microsoft/layoutlmv3-base", apply_ocr=False
-)
-model = LayoutLMv3ForTokenClassification.from_pretrained(
-    "microsoft/layoutlmv3-base",
-    num_labels=num_labels,
-    id2label=id2label,
-    label2id=label2id,
-)
 
-args = TrainingArguments(
-    output_dir="models/layoutlmv3_runs",
-    learning_rate=5e-5,
-    per_device_train_batch_size=2,
-    per_device_eval_batch_size=2,
-    num_train_epochs=10,
-    evaluation_strategy="epoch",
-    save_strategy="epoch",
-    logging_steps=50,
-    load_best_model_at_end=True,
-    metric_for_best_model="f1",
-    greater_is_better=True,
-)
+class ProgressCallback(TrainerCallback):
+    """
+    Forward epoch / step / loss / eval F1 to report(**fields). When report
+    returns False the run stops at the end of the current step.
+    """
 
-trainer = Trainer(
-    model=model,
-    args=args,
-    train_dataset=encoded["train"],
-    eval_dataset=encoded["validation"],
-    tokenizer=processor,
-    compute_metrics=compute_metrics,
-)
+    def __init__(self, report):
+        self.report = report
+        self.f1 = None
+        self.loss = None
 
-if __name__ == "__main__":
+    def _send(self, state, control, **extra):
+        keep_going = self.report(
+            epoch=round(state.epoch or 0.0, 3),
+            step=state.global_step,
+            max_steps=state.max_steps,
+            loss=self.loss,
+            f1=self.f1,
+            **extra,
+        )
+        if keep_going is False:
+            control.should_training_stop = True
+            control.should_save = False
+        return control
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        if logs and "loss" in logs:
+            self.loss = round(float(logs["loss"]), 4)
+
+    def on_step_end(self, args, state, control, **kwargs):
+        return self._send(state, control)
+
+    def on_evaluate(self, args, state, control, metrics=None, **kwargs):
+        if metrics and "eval_f1" in metrics:
+            self.f1 = round(float(metrics["eval_f1"]), 4)
+        return self._send(state, control, stage="evaluated")
+
+
+def read_meta(checkpoint: str) -> dict:
+    path = Path(checkpoint) / META_FILE
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def warm_start_indices(train_keys, seen: set, replay_ratio: float = REPLAY_RATIO, seed: int = 42):
+    """
+    Indices of the pages the checkpoint has not seen, plus a random replay
+    sample of replay_ratio x as many seen pages (so the model keeps what it
+    learnt); returns (indices, n_new, n_replay).
+    """
+    new = [i for i, k in enumerate(train_keys) if k not in seen]
+    old = [i for i, k in enumerate(train_keys) if k in seen]
+    n_replay = min(len(old), int(round(len(new) * replay_ratio)))
+    replay = random.Random(seed).sample(old, n_replay)
+    return sorted(new + replay), len(new), n_replay
+
+
+def freeze_lower_layers(model, n_layers: int) -> int:
+    """Freeze text/patch embeddings and the n lowest encoder layers; returns frozen parameter count."""
+    if n_layers <= 0:
+        return 0
+    backbone = model.layoutlmv3
+    modules = [backbone.embeddings, backbone.patch_embed] + list(backbone.encoder.layer[:n_layers])
+    frozen = 0
+    for module in modules:
+        for p in module.parameters():
+            p.requires_grad = False
+            frozen += p.numel()
+    return frozen
+
+
+def train(output_dir: str = RUNS_DIR, callbacks=(), mode: str = TRAIN_MODE,
+          epochs: float = None, warm_start: bool = WARM_START, base_checkpoint: str = BEST_CHECKPOINT,
+          replay_ratio: float = REPLAY_RATIO, freeze_layers: int = FREEZE_LAYERS, only_pages=None,
+          extra_train=()) -> dict:
+    """
+    Fine-tune from the base model, or from base_checkpoint when warm_start;
+    returns a report with the best checkpoint, its eval metrics, wall time
+    and per-epoch throughput. only_pages (page_keys) restricts a full run to
+    part of the train split, e.g. to hold pages back as "new" data.
+    extra_train: page tables appended to the train split (reviewed documents,
+    see src.retrain_data).
+    """
+    dynamic = mode == "dynamic"
+    encoded, id2label, label2id, BIO_LABELS = get_dataset(dynamic_padding=dynamic, extra_train=extra_train)
+    encoded = encoded.with_format("numpy")
+    train_keys = page_keys(SPLITS["train"], CACHE_DIR, extra_train)
+
+    num_labels = len(BIO_LABELS)
+    processor = AutoProcessor.from_pretrained(
+        BASE_MODEL, apply_ocr=False
+    )
+    extra_callbacks = list(callbacks)
+    warm = {}
+    train_dataset = encoded["train"]
+    if warm_start:
+        base_meta = read_meta(base_checkpoint)
+        if not Path(base_checkpoint).exists() or "train_pages" not in base_meta:
+            raise FileNotFoundError(
+                f"Warm start needs {base_checkpoint} with {META_FILE}; run a full training first"
+            )
+        model = LayoutLMv3ForTokenClassification.from_pretrained(base_checkpoint)
+        if {int(k): v for k, v in model.config.id2label.items()} != dict(id2label):
+            raise ValueError("Label set changed since the checkpoint; run a full training")
+        indices, n_new, n_replay = warm_start_indices(train_keys, set(base_meta["train_pages"]), replay_ratio)
+        warm = {
+            "base_checkpoint": base_checkpoint,
+            "new_pages": n_new,
+            "replay_pages": n_replay,
+            "frozen_params": freeze_lower_layers(model, freeze_layers),
+            "frozen_layers": max(freeze_layers, 0),
+        }
+        if n_new == 0:
+            return {"mode": mode, "warm_start": True, "skipped": True, "f1": None,
+                    "message": "No pages the checkpoint has not seen", **warm}
+        train_dataset = train_dataset.select(indices)
+        extra_callbacks.append(EarlyStoppingCallback(early_stopping_patience=EARLY_STOPPING_PATIENCE))
+        seen_pages = sorted(set(base_meta["train_pages"]) | set(train_keys))
+        epochs = epochs or WARM_EPOCHS
+        learning_rate = WARM_LR
+    else:
+        model = LayoutLMv3ForTokenClassification.from_pretrained(
+            BASE_MODEL,
+            num_labels=num_labels,
+            id2label=id2label,
+            label2id=label2id,
+        )
+        if only_pages is not None:
+            only_pages = set(only_pages)
+            train_dataset = train_dataset.select([i for i, k in enumerate(train_keys) if k in only_pages])
+            train_keys = [k for k in train_keys if k in only_pages]
+        seen_pages = sorted(train_keys)
+        epochs = epochs or EPOCHS
+        learning_rate = 5e-5
+
+    args = TrainingArguments(
+        output_dir=output_dir,
+        learning_rate=learning_rate,
+        per_device_train_batch_size=2,
+        per_device_eval_batch_size=2,
+        num_train_epochs=epochs,
+        evaluation_strategy="epoch",
+        save_strategy="epoch",
+        logging_steps=50,
+        load_best_model_at_end=True,
+        metric_for_best_model="f1",
+        greater_is_better=True,
+    )
+
+    trainer, throughput = make_trainer(
+        model=model,
+        args=args,
+        train_dataset=train_dataset,
+        eval_dataset=encoded["validation"],
+        processing_class=processor,
+        compute_metrics=metrics_fn(id2label),
+        dynamic=dynamic,
+        token_budget=TOKEN_BUDGET,
+    )
+    for cb in extra_callbacks:
+        trainer.add_callback(cb)
+
+    started = time.perf_counter()
     trainer.train()
+    wall = time.perf_counter() - started
+    report_path = Path(output_dir) / f"throughput_{mode}.json"
+    report_path.write_text(json.dumps(throughput.history, indent=2))
+    print(f"Throughput report -> {report_path}")
+
+    metrics = trainer.evaluate()
+    report = {
+        "mode": mode,
+        "warm_start": warm_start,
+        "f1": metrics.get("eval_f1"),
+        "eval": metrics,
+        "best_checkpoint": trainer.state.best_model_checkpoint,
+        "epochs": trainer.state.epoch,
+        "steps": trainer.state.global_step,
+        "train_pages": len(train_dataset),
+        "stopped_early": trainer.state.global_step < trainer.state.max_steps,
+        "wall_time_s": round(wall, 1),
+        "throughput": throughput.history,
+        **warm,
+    }
+    if warm_start:
+        full = base_meta.get("last_full_run") or {}
+        report["vs_full_retrain"] = {
+            "full_wall_time_s": full.get("wall_time_s"),
+            "wall_time_saved_s": round(full["wall_time_s"] - wall, 1) if full.get("wall_time_s") else None,
+            "speedup": round(full["wall_time_s"] / wall, 2) if full.get("wall_time_s") else None,
+            "base_f1": base_meta.get("f1"),
+            "full_f1": full.get("f1"),
+            "f1_delta_vs_full": round(report["f1"] - full["f1"], 4)
+            if report["f1"] is not None and full.get("f1") is not None else None,
+        }
+
+    if trainer.state.best_model_checkpoint:
+        this_run = {"wall_time_s": report["wall_time_s"], "f1": report["f1"], "train_pages": len(train_dataset)}
+        meta = {
+            "f1": report["f1"],
+            "warm_start": warm_start,
+            "train_pages": seen_pages,
+            # a full run is the yardstick later warm starts are measured against
+            "last_full_run": base_meta.get("last_full_run") if warm_start else this_run,
+            "run": this_run,
+        }
+        (Path(trainer.state.best_model_checkpoint) / META_FILE).write_text(json.dumps(meta))
+    print(json.dumps({k: v for k, v in report.items() if k not in ("throughput", "eval")}, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    train()
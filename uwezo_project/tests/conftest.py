@@ -0,0 +1,62 @@
+# tests/conftest.py
+"""
+The suite runs against a throwaway SQLite database (the sync engine through
+pysqlite, the async one through aiosqlite), so it needs no Postgres and
+none of the ML stack. The environment is set before anything from app/ is
+imported, because app.database and the services read it at import time.
+
+Run from uwezo_project/:
+    python -m pytest -q
+"""
+
+import os
+import tempfile
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix="uwezo_tests_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'uwezo_test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ["UWEZO_UPLOAD_DIR"] = os.path.join(_tmp, "uploads")
+# audit rows are written before the request returns, so tests can read them back
+os.environ["UWEZO_AUDIT_MODE"] = "sync"
+
+from app import models  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\0" * 256
+
+
+@pytest.fixture(autouse=True)
+def schema():
+    """A fresh, empty schema for every test."""
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    yield
+
+
+@pytest.fixture(autouse=True)
+def model_version(monkeypatch):
+    """Fixed result-cache version: computing the real one imports the inference stack."""
+    from app.services import result_cache
+
+    monkeypatch.setattr(result_cache, "current_model_version", lambda: "test-model")
+    return "test-model"
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as c:
+        yield c
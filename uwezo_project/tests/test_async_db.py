@@ -0,0 +1,196 @@
+# tests/test_async_db.py
+"""
+Async session path (database.get_async_db, the crud *_async functions and
+the endpoints built on them) against SQLite through aiosqlite, plus the
+engine / pool options for each backend.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, database, models, schemas
+from app.database import async_url, engine_options, get_async_db, get_async_engine
+from app.pagination import CURSOR_HEADER, PageParams
+
+
+@pytest.fixture(autouse=True)
+def schema():
+    """Overrides conftest.schema: build the schema through the aiosqlite engine."""
+    async def build():
+        async with get_async_engine().begin() as conn:
+            await conn.run_sync(models.Base.metadata.drop_all)
+            await conn.run_sync(models.Base.metadata.create_all)
+        # pooled connections belong to this loop; each test runs its own
+        await get_async_engine().dispose()
+
+    asyncio.run(build())
+    yield
+    asyncio.run(get_async_engine().dispose())
+
+
+def run(coro_fn):
+    """Run coro_fn(session) on a fresh loop with a session from get_async_db."""
+    async def main():
+        gen = get_async_db()
+        db = await gen.__anext__()
+        try:
+            return await coro_fn(db)
+        finally:
+            await gen.aclose()
+            await get_async_engine().dispose()
+
+    return asyncio.run(main())
+
+
+def page(limit=50, cursor=None):
+    return PageParams(limit=limit, cursor=cursor)
+
+
+# engine options
+
+def test_engine_options_postgres_pools_connections():
+    opts = engine_options("postgresql://u:p@db:5432/uwezo")
+    assert opts["pool_size"] == database.POOL_SIZE
+    assert opts["max_overflow"] == database.MAX_OVERFLOW
+    assert opts["pool_timeout"] == database.POOL_TIMEOUT
+    assert opts["pool_recycle"] == database.POOL_RECYCLE
+    assert opts["pool_pre_ping"] == database.POOL_PRE_PING
+    assert "connect_args" not in opts
+
+
+def test_engine_options_sqlite_has_no_server_pool():
+    for url in ("sqlite:///./uwezo_local.db", "sqlite+aiosqlite:///./uwezo_local.db"):
+        opts = engine_options(url)
+        assert opts["connect_args"] == {"check_same_thread": False}
+        assert not {"pool_size", "max_overflow", "pool_timeout", "pool_recycle"} & set(opts)
+
+
+def test_async_url_maps_sync_drivers():
+    assert async_url("postgresql://u:p@db/uwezo") == "postgresql+asyncpg://u:p@db/uwezo"
+    assert async_url("postgresql+psycopg2://u:p@db/uwezo") == "postgresql+asyncpg://u:p@db/uwezo"
+    assert async_url("sqlite:///./x.db") == "sqlite+aiosqlite:///./x.db"
+    assert async_url("postgresql+asyncpg://u:p@db/uwezo") == "postgresql+asyncpg://u:p@db/uwezo"
+
+
+def test_async_engine_uses_aiosqlite():
+    assert get_async_engine().url.drivername == "sqlite+aiosqlite"
+
+
+# get_async_db
+
+def test_get_async_db_yields_a_session_and_closes_it():
+    async def main():
+        gen = get_async_db()
+        db = await gen.__anext__()
+        assert isinstance(db, AsyncSession)
+        assert not db.sync_session.expire_on_commit
+        user = await crud.create_user_async(db, schemas.UserCreate(username="ada", role="analyst"))
+        with pytest.raises(StopAsyncIteration):
+            await gen.__anext__()
+        assert not db.in_transaction()
+        await get_async_engine().dispose()
+        return user
+
+    user = asyncio.run(main())
+    # expire_on_commit=False: attributes stay readable after the session is gone
+    assert (user.id, user.username) == (1, "ada")
+
+
+# crud *_async
+
+def test_users_async_create_filter_and_page():
+    async def main(db):
+        for i in range(5):
+            await crud.create_user_async(db, schemas.UserCreate(username=f"u{i}", role="admin" if i % 2 else "analyst"))
+        first = await crud.list_users_async(db, page(limit=2))
+        after = await crud.list_users_async(db, page(limit=2, cursor=4))
+        admins = await crud.list_users_async(db, page(), role="admin")
+        return [u.id for u in first], [u.id for u in after], [u.username for u in admins]
+
+    first, after, admins = run(main)
+    assert first == [5, 4, 3]  # newest first, plus the look-ahead row
+    assert after == [3, 2, 1]
+    assert admins == ["u3", "u1"]
+
+
+def test_audit_async_create_and_filter():
+    now = datetime(2025, 11, 1, 12, 0)
+
+    async def main(db):
+        for user_id, action, hours in ((1, "upload", 0), (1, "analyze", 1), (2, "upload", 2)):
+            await crud.create_audit_async(db, schemas.AuditTrailCreate(
+                action=action, details=f"{action} by {user_id}", user_id=user_id,
+                timestamp=now + timedelta(hours=hours)))
+        default_ts = await crud.create_audit_async(db, schemas.AuditTrailCreate(
+            action="review", details="no timestamp", user_id=3))
+        by_user = await crud.list_audit_async(db, page(), user_id=1)
+        by_action = await crud.list_audit_async(db, page(), action="upload")
+        window = await crud.list_audit_async(db, page(), since=now + timedelta(minutes=30),
+                                             until=now + timedelta(hours=2))
+        return default_ts, by_user, by_action, window
+
+    default_ts, by_user, by_action, window = run(main)
+    assert default_ts.timestamp is not None
+    assert [a.action for a in by_user] == ["analyze", "upload"]
+    assert [a.user_id for a in by_action] == [2, 1]
+    assert [a.action for a in window] == ["analyze"]
+
+
+def test_uploads_reviews_and_jobs_async():
+    async def main(db):
+        upload = await crud.create_upload_async(db, "s.pdf", None, "/tmp/s.pdf",
+                                                processing_purpose="analyze", content_hash="ab" * 32)
+        await crud.create_upload_async(db, "again.pdf", None, "/tmp/s.pdf", content_hash="ab" * 32)
+        by_hash = await crud.get_upload_by_hash_async(db, "ab" * 32)
+        missing = await crud.get_upload_by_hash_async(db, "cd" * 32)
+        review = await crud.log_review_async(db, upload.id, None, "looks fine", retrain_flag=True)
+        reviews = await crud.get_reviews_for_document_async(db, upload.id)
+        job = await crud.create_job_async(db, upload.id, upload.file_path)
+        fetched = await crud.get_job_async(db, job.id)
+        return upload, by_hash, missing, review, reviews, job, fetched, await crud.get_job_async(db, 999)
+
+    upload, by_hash, missing, review, reviews, job, fetched, none = run(main)
+    assert by_hash.id == upload.id and missing is None
+    assert review.retrain_flag and review.reviewed_at is not None
+    assert [r.comment for r in reviews] == ["looks fine"]
+    assert (job.kind, job.status, job.attempts, job.upload_id) == ("analyze", "queued", 0, upload.id)
+    assert fetched.id == job.id and none is None
+
+
+# endpoints
+
+def test_users_endpoints(client):
+    for name in ("ada", "grace", "linus"):
+        res = client.post("/users/", json={"username": name, "role": "analyst"})
+        assert res.status_code == 200
+    assert res.json() == {"username": "linus", "role": "analyst", "id": 3}
+
+    res = client.get("/users/?limit=2")
+    assert [u["username"] for u in res.json()] == ["linus", "grace"]
+    cursor = res.headers[CURSOR_HEADER]
+    res = client.get(f"/users/?limit=2&cursor={cursor}")
+    assert [u["username"] for u in res.json()] == ["ada"]
+    assert CURSOR_HEADER not in res.headers
+
+
+def test_audit_endpoints(client):
+    for action in ("upload", "analyze", "upload"):
+        res = client.post("/audit/", json={"action": action, "details": "d", "user_id": 7})
+        assert res.status_code == 200
+    assert res.json()["timestamp"] is not None
+
+    assert [a["id"] for a in client.get("/audit/?action=upload").json()] == [3, 1]
+    assert client.get("/audit/?user_id=8").json() == []
+    res = client.get("/audit/?limit=1")
+    assert res.headers[CURSOR_HEADER] == "3"
+
+
+def test_job_endpoint(client, db):
+    job = crud.create_job(db, None, "/tmp/s.png")
+    res = client.get(f"/jobs/{job.id}")
+    assert res.status_code == 200
+    assert (res.json()["job_id"], res.json()["status"]) == (job.id, "queued")
+    assert client.get("/jobs/999").status_code == 404
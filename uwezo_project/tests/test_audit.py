@@ -0,0 +1,173 @@
+# tests/test_audit.py
+"""
+The buffered AuditSink (with an injected session factory), and audit rows
+from async endpoints: synchronous writes leave the event loop, buffered ones
+do not.
+"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from app import models
+from app.services import audit
+from conftest import PNG
+
+
+class FakeSessions:
+    """session_factory stand-in recording the rows of each committed flush."""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def __call__(self):
+        return _FakeSession(self)
+
+    @property
+    def rows(self):
+        return [row["action"] for batch in self.batches for row in batch]
+
+
+class _FakeSession:
+    def __init__(self, owner):
+        self.owner, self.rows = owner, None
+
+    def execute(self, stmt, rows):
+        self.rows = list(rows)
+
+    def commit(self):
+        if self.owner.fail:
+            raise ConnectionError("database unavailable")
+        self.owner.batches.append(self.rows)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def sessions():
+    return FakeSessions()
+
+
+def _sink(sessions, **kw):
+    opts = dict(session_factory=sessions, flush_rows=1000, flush_interval=60.0, mode="buffered")
+    return audit.AuditSink(**{**opts, **kw})
+
+
+def _wait_for(cond, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return cond()
+
+
+def test_buffered_log_only_appends(sessions):
+    sink = _sink(sessions)
+    sink.log("a")
+    sink.log("b")
+    assert sessions.batches == [] and sink.pending() == 2
+    sink.shutdown()
+
+
+def test_flushes_when_the_buffer_reaches_flush_rows(sessions):
+    sink = _sink(sessions, flush_rows=3)
+    for action in "abc":
+        sink.log(action)
+    assert _wait_for(lambda: sessions.rows == ["a", "b", "c"])
+    assert len(sessions.batches) == 1  # one executemany for the three rows
+    sink.shutdown()
+
+
+def test_flushes_every_flush_interval(sessions):
+    sink = _sink(sessions, flush_interval=0.05)
+    sink.log("a")
+    assert _wait_for(lambda: sessions.rows == ["a"])
+    sink.shutdown()
+
+
+def test_shutdown_writes_what_is_left(sessions):
+    sink = _sink(sessions)
+    sink.log("a")
+    sink.log("b")
+    sink.shutdown()
+    assert sessions.rows == ["a", "b"] and sink.pending() == 0
+
+
+def test_failed_flush_requeues_and_drops_the_oldest_beyond_max_buffer(sessions):
+    sink = _sink(sessions, max_buffer=3)
+    sessions.fail = True
+    sink.log("a")
+    sink.log("b")
+    assert sink.flush() == 0 and sink.pending() == 2
+    sink.log("c")
+    sink.log("d")
+    assert sink.flush() == 0
+    assert (sink.pending(), sink.dropped) == (3, 1)
+
+    sessions.fail = False
+    assert sink.flush() == 3
+    assert sessions.rows == ["b", "c", "d"]
+    sink.shutdown()
+
+
+def test_sync_log_raises_and_keeps_the_row_when_the_write_fails(sessions):
+    sink = _sink(sessions)
+    sink.log("a")
+    sessions.fail = True
+    with pytest.raises(ConnectionError):
+        sink.log("b", sync=True)
+    assert sink.pending() == 2
+    sessions.fail = False
+    sink.log("c", sync=True)
+    assert sessions.rows == ["a", "b", "c"]
+
+
+def test_alog_appends_inline_in_buffered_mode(sessions, monkeypatch):
+    async def no_hop(*args, **kwargs):
+        raise AssertionError("buffered alog went through run_io")
+
+    monkeypatch.setattr(audit, "run_io", no_hop)
+    sink = _sink(sessions)
+    asyncio.run(sink.alog("a", 1, "details"))
+    assert sink.pending() == 1
+    sink.shutdown()
+    assert sessions.batches[0][0]["details"] == "details"
+
+
+def test_upload_audit_write_runs_off_the_event_loop(db, monkeypatch):
+    user = models.User(username="ada", role="analyst")
+    db.add(user)
+    db.commit()
+    # conftest sets UWEZO_AUDIT_MODE=sync, so every log() call commits
+    sink = audit.get_sink()
+    assert sink.mode == "sync"
+    writers = []
+    real_flush = sink.flush
+
+    def recording_flush(*args, **kwargs):
+        writers.append(threading.current_thread())
+        return real_flush(*args, **kwargs)
+
+    monkeypatch.setattr(sink, "flush", recording_flush)
+
+    async def main():
+        from app.main import app
+
+        loop_thread = threading.current_thread()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            res = await client.post("/upload/", files={"file": ("s.png", PNG, "image/png")},
+                                     data={"user_id": str(user.id)})
+        return loop_thread, res
+
+    loop_thread, res = asyncio.run(main())
+    assert res.status_code == 200, res.text
+    assert writers and loop_thread not in writers
+    assert [(a.action, a.user_id) for a in db.query(models.AuditTrail)] == [("upload", user.id)]
@@ -0,0 +1,77 @@
+# tests/test_event_loop.py
+"""
+GET / stays responsive while analyses are in flight: extraction runs on the
+CPU pool (services/executor.run_cpu), not on the event loop.
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.routes import analyze
+from app.services import executor, tasks
+from conftest import PNG
+
+IN_FLIGHT = 4
+ANALYSIS_S = 2.0
+# spinning pool threads still compete for the GIL, so allow some slack
+LATENCY_BOUND_S = 0.5
+
+
+def _busy_extract(file_path: str) -> dict:
+    # holds the CPU (and the GIL, between switch intervals) like a real extraction
+    deadline = time.perf_counter() + ANALYSIS_S
+    while time.perf_counter() < deadline:
+        sum(i * i for i in range(200))
+    return {"fields": {"file": file_path}, "flagging": {"status": "ok", "risk_score": 0.0}}
+
+
+@pytest.fixture
+def thread_cpu_pool(monkeypatch):
+    executor.shutdown()
+    monkeypatch.setattr(executor, "CPU_POOL", "thread")
+    monkeypatch.setattr(executor, "CPU_WORKERS", IN_FLIGHT)
+    monkeypatch.setattr(tasks, "extract_file", _busy_extract)
+    monkeypatch.setattr(analyze, "extract_file", _busy_extract)
+    yield
+    executor.shutdown()
+
+
+async def _health_latency_under_load():
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def timed_root():
+            started = time.perf_counter()
+            res = await client.get("/")
+            assert res.status_code == 200
+            return time.perf_counter() - started
+
+        idle = [await timed_root() for _ in range(5)]
+        posts = [
+            asyncio.create_task(client.post(
+                "/analyze/", files={"file": (f"s{i}.png", PNG + bytes([i]), "image/png")}
+            ))
+            for i in range(IN_FLIGHT)
+        ]
+        await asyncio.sleep(0.2)  # let every upload reach the CPU pool
+        loaded = []
+        for _ in range(8):
+            loaded.append(await timed_root())
+            await asyncio.sleep(0.05)
+        in_flight = sum(not p.done() for p in posts)
+        responses = await asyncio.gather(*posts)
+    return idle, loaded, in_flight, responses
+
+
+def test_health_latency_stays_flat_during_analyses(thread_cpu_pool):
+    idle, loaded, in_flight, responses = asyncio.run(_health_latency_under_load())
+
+    # the samples were taken while all analyses were still running
+    assert in_flight == IN_FLIGHT
+    assert [r.status_code for r in responses] == [200] * IN_FLIGHT
+    # on the event loop, a single analysis would hold GET / for ANALYSIS_S
+    assert max(loaded) < LATENCY_BOUND_S, (idle, loaded)
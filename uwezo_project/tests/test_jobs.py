@@ -0,0 +1,150 @@
+# tests/test_jobs.py
+"""Job queue (app/services/jobs.py) and the ?mode=job analyze flow."""
+
+import threading
+from datetime import datetime, timedelta
+
+from app import crud, models
+from app.database import SessionLocal
+from app.services import jobs
+from conftest import PNG
+
+
+def _queue(db, n, kind="analyze"):
+    return [crud.create_job(db, None, f"/tmp/doc-{i}.png", kind=kind).id for i in range(n)]
+
+
+def test_claim_returns_oldest_queued_job_of_its_kind(db):
+    retrain = crud.create_job(db, None, None, kind="retrain")
+    first, second = _queue(db, 2)
+
+    job = jobs.claim_next_job(db, "w0")
+    assert job.id == first
+    assert (job.status, job.worker_id, job.attempts) == ("running", "w0", 1)
+    assert job.started_at is not None
+    assert jobs.claim_next_job(db, "w0").id == second
+    assert jobs.claim_next_job(db, "w0") is None
+    assert db.get(models.Job, retrain.id).status == "queued"
+
+
+def test_two_claimers_never_get_the_same_job(db):
+    ids = _queue(db, 40)
+    claimed = {0: [], 1: []}
+    start = threading.Barrier(2)
+
+    def claimer(n):
+        session = SessionLocal()
+        try:
+            start.wait()
+            while (job := jobs.claim_next_job(session, f"w{n}")) is not None:
+                claimed[n].append(job.id)
+        finally:
+            session.close()
+
+    threads = [threading.Thread(target=claimer, args=(n,)) for n in claimed]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+
+    assert not set(claimed[0]) & set(claimed[1])
+    assert sorted(claimed[0] + claimed[1]) == ids
+    assert {j.attempts for j in db.query(models.Job)} == {1}
+
+
+def test_claim_skips_a_job_another_worker_took_first(db, monkeypatch):
+    first, second = _queue(db, 2)
+    other = SessionLocal()
+    real_query = db.query
+    raced = []
+
+    def racing_query(*entities):
+        # the rival claims `first` between our SELECT and our conditional UPDATE
+        if entities[0] is models.Job and not raced:
+            raced.append(jobs.claim_next_job(other, "rival").id)
+        return real_query(*entities)
+
+    monkeypatch.setattr(db, "query", racing_query)
+    try:
+        job = jobs.claim_next_job(db, "w0")
+    finally:
+        other.close()
+    assert raced == [first]
+    assert job.id == second
+    db.expire_all()
+    assert db.get(models.Job, first).worker_id == "rival"
+
+
+def test_retries_stop_at_max_attempts(db, monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_ATTEMPTS", 2)
+    (job_id,) = _queue(db, 1)
+
+    job = jobs.claim_next_job(db, "w0")
+    jobs.fail_job(db, job, "boom 1")
+    assert (job.status, job.attempts, job.worker_id) == ("queued", 1, None)
+
+    job = jobs.claim_next_job(db, "w0")
+    jobs.fail_job(db, job, "boom 2")
+    assert (job.status, job.attempts, job.error) == ("failed", 2, "boom 2")
+    assert job.finished_at is not None
+    assert jobs.claim_next_job(db, "w0") is None
+
+
+def test_stale_running_jobs_are_requeued(db):
+    stale_id, fresh_id = _queue(db, 2)
+    stale = jobs.claim_next_job(db, "dead-worker")
+    fresh = jobs.claim_next_job(db, "live-worker")
+    stale.started_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+
+    assert jobs.requeue_stale_jobs(db, stale_after=timedelta(minutes=15)) == 1
+    db.expire_all()
+    stale, fresh = db.get(models.Job, stale_id), db.get(models.Job, fresh_id)
+    assert stale.status == "queued" and stale.worker_id is None
+    assert "dead-worker timed out" in stale.error
+    assert fresh.status == "running"
+    # the next claim picks the requeued job up again
+    assert jobs.claim_next_job(db, "w1").id == stale_id
+
+
+def test_stale_job_out_of_attempts_fails(db, monkeypatch):
+    monkeypatch.setattr(jobs, "MAX_ATTEMPTS", 1)
+    (job_id,) = _queue(db, 1)
+    job = jobs.claim_next_job(db, "dead-worker")
+    job.started_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+
+    jobs.requeue_stale_jobs(db, stale_after=timedelta(minutes=15))
+    db.expire_all()
+    assert db.get(models.Job, job_id).status == "failed"
+
+
+def test_analyze_job_mode_then_poll_status(client, db):
+    res = client.post("/analyze/?mode=job", files={"file": ("statement.png", PNG, "image/png")})
+    assert res.status_code == 202
+    body = res.json()
+    assert body["status"] == "queued"
+    assert body["status_url"] == f"/jobs/{body['job_id']}"
+
+    status = client.get(body["status_url"]).json()
+    assert (status["job_id"], status["upload_id"], status["status"]) == (body["job_id"], body["id"], "queued")
+    assert status["result"] is None
+
+    # a worker picks it up and finishes it
+    job = jobs.claim_next_job(db, "w0")
+    assert job.id == body["job_id"]
+    assert client.get(body["status_url"]).json()["status"] == "running"
+    result = {"fields": {"account_name": "A. Tester"}, "flagging": {"status": "ok", "risk_score": 0.1}}
+    jobs.complete_job(db, job, result)
+
+    status = client.get(body["status_url"]).json()
+    assert status["status"] == "done"
+    assert status["result"] == result
+    assert status["finished_at"] is not None
+    upload = db.get(models.Upload, body["id"])
+    assert upload.processed
+    assert [(f.field_name, f.field_value) for f in upload.fields] == [("account_name", "A. Tester")]
+
+
+def test_unknown_job_is_404(client):
+    assert client.get("/jobs/999").status_code == 404
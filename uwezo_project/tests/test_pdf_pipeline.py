@@ -0,0 +1,78 @@
+# tests/test_pdf_pipeline.py
+"""Render pool and cleanup of services/pdf_pipeline.iter_pdf_analysis."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services import executor, pdf_pipeline
+
+N_PAGES = 6
+
+
+def test_render_pool_is_one_shared_spawn_pool():
+    executor.shutdown()
+    try:
+        pool = executor.render_pool()
+        assert executor.render_pool() is pool
+        assert pool._mp_context.get_start_method() == "spawn"
+    finally:
+        executor.shutdown()
+
+
+@pytest.fixture
+def fake_pages(monkeypatch, tmp_path):
+    """Renders and analyses that need their page file for their whole run."""
+    seen = {"analysed": [], "missing": []}
+    lock = threading.Lock()
+
+    def render(pdf_path, index, out_dir, dpi):
+        img = out_dir / f"p{index}.png"
+        img.write_bytes(b"png")
+        time.sleep(0.05)
+        return img, out_dir / f"p{index}.json"
+
+    def analyze(index, img, ocr):
+        time.sleep(0.2)
+        with lock:
+            seen["analysed" if img.exists() else "missing"].append(index)
+        return {"type": "page", "page": index + 1, "fields": {}}
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(pdf_pipeline, "render_pool", lambda: pool)
+    monkeypatch.setattr(pdf_pipeline, "page_count", lambda path: N_PAGES)
+    monkeypatch.setattr(pdf_pipeline, "render_and_ocr_page", render)
+    monkeypatch.setattr(pdf_pipeline, "analyze_page", analyze)
+    monkeypatch.setattr(pdf_pipeline, "document_summary", lambda pages: {"type": "document", "pages": len(pages)})
+    yield seen, tmp_path / "work"
+    pool.shutdown()
+
+
+def test_closing_the_stream_waits_for_running_pages_before_deleting_files(fake_pages, monkeypatch):
+    seen, work_dir = fake_pages
+    removed = []
+    real_rmtree = pdf_pipeline.shutil.rmtree
+    monkeypatch.setattr(pdf_pipeline.shutil, "rmtree",
+                        lambda path, **kw: (removed.append(list(seen["analysed"])), real_rmtree(path, **kw)))
+    monkeypatch.setattr(pdf_pipeline.tempfile, "mkdtemp", lambda prefix: str(work_dir.mkdir() or work_dir))
+
+    items = pdf_pipeline.iter_pdf_analysis("statement.pdf", render_workers=2, page_workers=1)
+    first = next(items)
+    items.close()  # the client disconnected after the first page
+
+    assert first["type"] == "page"
+    assert seen["missing"] == []
+    assert len(seen["analysed"]) < N_PAGES  # queued pages were dropped
+    assert removed == [seen["analysed"]]  # nothing was still running when the directory went
+    assert not work_dir.exists()
+
+
+def test_all_pages_then_summary(fake_pages):
+    seen, work_dir = fake_pages
+    items = list(pdf_pipeline.iter_pdf_analysis("statement.pdf", work_dir=work_dir.mkdir() or work_dir))
+
+    assert sorted(p["page"] for p in items[:-1]) == list(range(1, N_PAGES + 1))
+    assert items[-1] == {"type": "document", "pages": N_PAGES}
+    assert work_dir.exists()
@@ -0,0 +1,90 @@
+# tests/test_persistence.py
+"""Analysis results -> extractedfields / cases / authenticitychecks (app/services/persistence.py)."""
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import models
+from app.database import engine
+from app.services.persistence import persist_result, persist_results
+
+
+@pytest.fixture
+def fk_db():
+    """A session with SQLite foreign keys enforced, as they are on Postgres."""
+    with engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+        db = Session(bind=conn)
+        try:
+            yield db
+        finally:
+            db.close()
+            conn.rollback()
+            conn.exec_driver_sql("PRAGMA foreign_keys=OFF")
+
+
+def _result(balance, status="ok"):
+    return {
+        "fields": {"opening_balance": balance, "bank_name": "Equity"},
+        "flagging": {"status": status, "risk_score": 0.8 if status == "suspicious" else 0.1,
+                     "numeric_check": {"consistency_score": 0.5}, "tamper_check": {}},
+    }
+
+
+def _uploads(db, n):
+    uploads = [models.Upload(filename=f"s{i}.png") for i in range(n)]
+    db.add_all(uploads)
+    db.commit()
+    return [u.id for u in uploads]
+
+
+def _fields(db, upload_id):
+    return dict(db.execute(
+        select(models.ExtractedField.field_name, models.ExtractedField.field_value)
+        .where(models.ExtractedField.upload_id == upload_id)
+    ).all())
+
+
+def test_reanalysis_updates_the_case_that_reviewer_rows_point_at(fk_db):
+    db = fk_db
+    [upload_id] = _uploads(db, 1)
+    persist_result(db, upload_id, _result("100"))
+    case = db.scalars(select(models.Case)).one()
+    db.add_all([models.EvidenceBundle(case_id=case.id, pdf_path="bundle.pdf"),
+                models.DecisionLabel(case_id=case.id, label="fraud")])
+    db.commit()
+
+    persist_result(db, upload_id, _result("250", status="suspicious"))
+
+    db.expire_all()
+    [again] = db.scalars(select(models.Case)).all()
+    assert (again.id, again.flagged, again.confidence_score) == (case.id, True, 0.8)
+    assert _fields(db, upload_id) == {"opening_balance": "250", "bank_name": "Equity"}
+    assert db.scalars(select(models.AuthenticityCheck.action_taken)).all() == ["flagged"]
+    assert db.scalars(select(models.EvidenceBundle.case_id)).all() == [case.id]
+
+
+def test_error_result_writes_nothing_and_keeps_the_previous_analysis(db):
+    [upload_id] = _uploads(db, 1)
+    assert persist_result(db, upload_id, {"error": "OCR failed"}) == 0
+    assert db.scalars(select(models.Case)).all() == []
+
+    persist_result(db, upload_id, _result("100"))
+    assert persist_result(db, upload_id, {"error": "OCR failed"}) == 0
+    assert _fields(db, upload_id) == {"opening_balance": "100", "bank_name": "Equity"}
+    assert len(db.scalars(select(models.Case)).all()) == 1
+
+
+def test_bulk_commits_once_per_batch(db, monkeypatch):
+    ids = _uploads(db, 5)
+    commits = []
+    real_commit = db.commit
+    monkeypatch.setattr(db, "commit", lambda: (commits.append(1), real_commit()))
+
+    written = persist_results(db, ((i, _result(str(i))) for i in ids), batch_docs=2)
+
+    assert written == 5 * (2 + 1 + 1)  # two fields, one case, one check per document
+    assert len(commits) == 3
+    assert {_fields(db, i)["opening_balance"] for i in ids} == {str(i) for i in ids}
+    assert all(u.processed for u in db.scalars(select(models.Upload)))
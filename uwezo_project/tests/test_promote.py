@@ -0,0 +1,41 @@
+# tests/test_promote.py
+"""Checkpoint promotion (app/services/retrain.promote_checkpoint)."""
+
+import os
+
+from app.services.retrain import promote_checkpoint
+
+
+def _checkpoint(root, name, weights):
+    ckpt = root / name
+    ckpt.mkdir()
+    (ckpt / "model.safetensors").write_text(weights)
+    return str(ckpt)
+
+
+def test_promotion_swaps_a_symlink_to_a_versioned_copy(tmp_path):
+    target = str(tmp_path / "checkpoint-best")
+    promote_checkpoint(_checkpoint(tmp_path, "run1", "v1"), target)
+    first = os.path.realpath(target)
+    promote_checkpoint(_checkpoint(tmp_path, "run2", "v2"), target)
+
+    assert os.path.islink(target)
+    assert os.path.realpath(target) != first
+    assert open(os.path.join(target, "model.safetensors")).read() == "v2"
+    assert open(os.path.join(first, "model.safetensors")).read() == "v1"  # previous version kept
+
+    promote_checkpoint(_checkpoint(tmp_path, "run3", "v3"), target)
+    assert not os.path.exists(first)  # only the newest two versions stay
+    assert len(list(tmp_path.glob("checkpoint-best-*"))) == 2
+    assert open(os.path.join(target, "model.safetensors")).read() == "v3"
+
+
+def test_checkpoint_served_from_a_plain_directory_becomes_a_version(tmp_path):
+    target = tmp_path / "checkpoint-best"
+    _checkpoint(tmp_path, "checkpoint-best", "legacy")
+    promote_checkpoint(_checkpoint(tmp_path, "run1", "v1"), str(target))
+
+    assert target.is_symlink()
+    assert (target / "model.safetensors").read_text() == "v1"
+    [legacy] = [p for p in tmp_path.glob("checkpoint-best-*") if p.resolve() != target.resolve()]
+    assert (legacy / "model.safetensors").read_text() == "legacy"
@@ -0,0 +1,42 @@
+# tests/test_query_plans.py
+"""
+The hot queries use the indexes of migration 7c3e5a91d0f4, on a schema built
+by `alembic upgrade head` rather than from app.models, and the migrated
+schema matches the models. benchmarks/check_query_plans.py runs the same
+checks at full scale with timings.
+"""
+
+import pytest
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+
+from app import models
+from app.database import make_engine
+from benchmarks.check_query_plans import build_schema, hot_queries, plan_problems, seed
+
+# 4k uploads, 10k audit rows: enough rows for ANALYZE to favour the indexes
+SCALE = 0.02
+
+
+@pytest.fixture(scope="module")
+def migrated(tmp_path_factory):
+    engine = make_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}")
+    build_schema(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_migrations_match_the_models(migrated):
+    with migrated.connect() as conn:
+        assert compare_metadata(MigrationContext.configure(conn), models.Base.metadata) == []
+
+
+def test_hot_queries_use_their_indexes(migrated):
+    with migrated.connect() as conn:
+        counts = seed(conn, SCALE)
+        problems = {}
+        for name, stmt, expect, no_scan in hot_queries(counts):
+            plan, wrong = plan_problems(conn, stmt, expect, no_scan)
+            if wrong:
+                problems[name] = wrong + plan
+    assert problems == {}
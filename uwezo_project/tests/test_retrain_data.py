@@ -0,0 +1,124 @@
+# tests/test_retrain_data.py
+"""Reviewed documents -> shard store -> training pages (app/services/retrain.py)."""
+
+import json
+
+import pyarrow.parquet as pq
+
+from app import models
+from app.database import engine
+from app.services import retrain
+from src.retrain_data import ShardStore, label_words
+
+# what the re-OCR of every stored upload reads
+OCR_WORDS = ["Statement", "Equity", "Bank", "Ltd", "Account:", "0123-456", "Period", "Jan", "2024"]
+
+
+def _reviewed_upload(db, tmp_path, fields):
+    path = tmp_path / f"doc-{len(fields)}.png"
+    path.write_bytes(b"png")
+    upload = models.Upload(filename=path.name, file_path=str(path), processed=True)
+    db.add(upload)
+    db.flush()
+    db.add_all(models.ExtractedField(upload_id=upload.id, field_name=k, field_value=v) for k, v in fields.items())
+    db.add(models.Review(document_id=upload.id))
+    db.commit()
+    return upload.id
+
+
+def _upload(db, fields, processed=True):
+    upload = models.Upload(filename="doc.png", processed=processed)
+    db.add(upload)
+    db.flush()
+    db.add_all(models.ExtractedField(upload_id=upload.id, field_name=k, field_value=v) for k, v in fields.items())
+    db.commit()
+    return upload
+
+
+def _review(db, upload_id, **kw):
+    db.add(models.Review(document_id=upload_id, **kw))
+    db.commit()
+
+
+def _fake_ocr(file_path, out_dir):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    words = [{"text": w, "bbox": [10 * i, 10, 10 * i + 8, 20], "score": 90} for i, w in enumerate(OCR_WORDS)]
+    ocr_json = out_dir / "page_001.json"
+    ocr_json.write_text(json.dumps({"image_path": file_path, "width": 100, "height": 50, "words": words}))
+    return [(file_path, ocr_json)]
+
+
+def test_label_words_tags_spans_that_spell_a_value():
+    tags, matched = label_words(OCR_WORDS, {"bank_name": ["EQUITY BANK LTD."], "currency": ["KES"]})
+    assert tags[1:4] == ["B-bank_name", "I-bank_name", "I-bank_name"]
+    assert tags.count("O") == len(OCR_WORDS) - 3
+    assert matched == {"bank_name"}
+
+
+def test_reviewed_documents_become_train_pages_once(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(retrain, "ocr_document", _fake_ocr)
+    monkeypatch.setattr(retrain, "MIN_FIELD_MATCH", 0.5)
+    store = ShardStore(tmp_path / "retrain")
+    good = _reviewed_upload(db, tmp_path, {"bank_name": "Equity Bank Ltd", "account_number": "0123 456"})
+    bad = _reviewed_upload(db, tmp_path, {"bank_name": "KCB", "account_number": "999", "currency": "USD"})
+
+    stats = retrain.load_training_data(store)
+
+    assert stats["new_rows"] == 5
+    assert (stats["documents"], stats["skipped_documents"], stats["pages"]) == (1, 1, 1)
+    [page] = pq.read_table(store.pages_path).to_pylist()
+    assert page["label_path"] == f"review:{good}"
+    assert page["words"] == OCR_WORDS
+    assert page["boxes"][1] == [100, 200, 180, 400]
+    from src.preprocessing import id2label
+    assert [id2label[i] for i in page["labels"][1:6]] == [
+        "B-bank_name", "I-bank_name", "I-bank_name", "O", "B-account_number"]
+    assert not (store.page_dir / str(bad)).exists()
+    assert store.pending_documents() == {}
+
+    # nothing newly reviewed: no new pages, the stored ones stay
+    stats = retrain.load_training_data(store)
+    assert (stats["new_rows"], stats["documents"], stats["total_pages"]) == (0, 0, 1)
+
+
+def test_later_review_brings_back_a_document_reviewed_before_processing(db, tmp_path):
+    store = ShardStore(tmp_path / "retrain")
+    upload = _upload(db, {"bank_name": "Equity"}, processed=False)
+    _review(db, upload.id)
+    assert store.append(engine) == 0
+
+    upload.processed = True
+    db.commit()
+    _review(db, upload.id, retrain_flag=True)
+    assert store.append(engine) == 1
+    assert store.pending_documents() == {upload.id: {"bank_name": ["Equity"]}}
+
+
+def test_new_review_replaces_the_stored_copy_of_a_document(db, tmp_path):
+    store = ShardStore(tmp_path / "retrain")
+    upload = _upload(db, {"bank_name": "Equty"})
+    _review(db, upload.id)
+    store.append(engine)
+
+    db.query(models.ExtractedField).update({"field_value": "Equity"})
+    db.commit()
+    _review(db, upload.id)
+    assert store.append(engine) == 1
+    assert store.rows() == [("bank_name", "Equity")]
+    assert store.pending_documents() == {upload.id: {"bank_name": ["Equity"]}}
+    assert store.append(engine) == 0
+
+
+def test_review_committing_below_the_watermark_is_not_lost(db, tmp_path):
+    store = ShardStore(tmp_path / "retrain")
+    first, late = _upload(db, {"bank_name": "Equity"}), _upload(db, {"bank_name": "KCB"})
+    _review(db, first.id, id=1)
+    _review(db, first.id, id=3)
+    store.append(engine)
+    assert store.watermark["review_id"] == 3
+
+    # id 2 was handed out before id 3 but its transaction commits only now
+    _review(db, late.id, id=2)
+    assert store.append(engine) == 1
+    assert set(store.pending_documents()) == {first.id, late.id}
+    assert store.append(engine) == 0
@@ -0,0 +1,80 @@
+# tests/test_to_bio.py
+"""
+The vectorised src.preprocessing.to_bio gives exactly the labels of the
+original word x field loop: on every OCR'd page under processed/ocr (against
+its YOLO labels, or random field boxes when a page has none) and on a
+synthetic dense page.
+"""
+
+import json
+import random
+
+import pytest
+
+from src import preprocessing
+from src.preprocessing import CLASSES, PROC_OCR, YOLO_ROOT, center_in, load_yolo, to_bio
+
+OCR_PAGES = sorted(PROC_OCR.glob("*/*.json"))
+
+
+def to_bio_reference(words, fields):
+    """The original O(words x fields) implementation."""
+    tags = ["O"] * len(words)
+    for i, w in enumerate(words):
+        x1, y1, x2, y2 = w["bbox"]
+        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+        hit = None
+        for f in fields:
+            if center_in(f["bbox"], cx, cy):
+                hit = f["name"]
+                break
+        if hit:
+            prev = tags[i - 1] if i > 0 else "O"
+            prefix = "I-" if prev.endswith(hit) else "B-"
+            tags[i] = f"{prefix}{hit}"
+    return tags
+
+
+def _random_fields(rng, W, H, n=12):
+    out = []
+    for _ in range(n):
+        x1, y1 = rng.randrange(0, max(W, 1)), rng.randrange(0, max(H, 1))
+        x2 = min(W - 1, x1 + rng.randrange(10, max(11, W // 2)))
+        y2 = min(H - 1, y1 + rng.randrange(5, max(6, H // 4)))
+        c = rng.randrange(len(CLASSES))
+        out.append({"cid": c, "name": CLASSES[c], "bbox": [x1, y1, x2, y2]})
+    return out
+
+
+@pytest.mark.skipif(not OCR_PAGES, reason=f"no OCR'd pages under {PROC_OCR}")
+def test_matches_reference_on_every_ocr_page():
+    rng = random.Random(0)
+    mismatched = []
+    for jp in OCR_PAGES:
+        data = json.loads(jp.read_text())
+        W, H = data["width"], data["height"]
+        words = [w for w in data["words"] if w.get("text", "").strip()]
+        lbl = YOLO_ROOT / "labels" / jp.parent.name / (jp.stem + ".txt")
+        fields = load_yolo(lbl, W, H) if lbl.exists() else _random_fields(rng, W, H)
+        if to_bio(words, fields) != to_bio_reference(words, fields):
+            mismatched.append(str(jp))
+    assert mismatched == []
+
+
+def test_matches_reference_on_a_dense_page(monkeypatch):
+    # small chunks so the words are matched against the fields in several slices
+    monkeypatch.setattr(preprocessing, "MAX_PAIRS_PER_CHUNK", 10_000)
+    rng = random.Random(1)
+    W, H = 2480, 3508
+    words = []
+    for _ in range(4000):
+        x, y = rng.randrange(W - 60), rng.randrange(H - 20)
+        words.append({"text": "w", "bbox": [x, y, x + rng.randrange(1, 60), y + rng.randrange(1, 20)]})
+    # many overlapping and adjacent fields, including the same class twice in a row
+    fields = _random_fields(rng, W, H, n=300)
+
+    tags = to_bio(words, fields)
+    assert tags == to_bio_reference(words, fields)
+    assert {t[:2] for t in tags} == {"O", "B-", "I-"}
+    assert to_bio(words, []) == to_bio_reference(words, []) == ["O"] * len(words)
+    assert to_bio([], fields) == []